@@ -0,0 +1,254 @@
+import asyncio
+import logging
+from typing import Optional
+from solders.compute_budget import set_compute_unit_limit, set_compute_unit_price  # type: ignore
+from solders.message import MessageV0  # type: ignore
+from solders.transaction import VersionedTransaction  # type: ignore
+from spl.token.instructions import get_associated_token_address
+from constants import SOL_DECIMAL, WSOL
+from engine import current_engine
+from fees import with_compute_budget
+from instrumentation import span, timed
+from layouts import ACCOUNT_LAYOUT
+from raydium import (
+    calc_buy_minimum_out,
+    calc_sell_minimum_out,
+    make_buy_instructions,
+    make_sell_instructions,
+)
+from swap_templates import SwapTemplate
+from utils import PoolKeys, swap_templates
+from async_utils import (
+    async_confirm_txn,
+    async_fetch_pool_keys,
+    async_get_reserves,
+)
+
+logger = logging.getLogger(__name__)
+
+# Same pipeline as raydium.buy/sell, but every RPC that does not depend on a previous
+# result is issued together, so a trade costs roughly: pool keys -> one fan-out -> send.
+# The blockhash comes from async_blockhash_provider, which refreshes in the background.
+
+@timed("buy")
+async def async_buy(pair_address: str, sol_in: float = .01, slippage: int = 5, reserve_stream=None) -> bool:
+    engine = current_engine()
+    try:
+        logger.info("Starting buy transaction for pair address: %s", pair_address)
+
+        logger.debug("Fetching pool keys...")
+        with span("pool_keys"):
+            pool_keys = await async_fetch_pool_keys(pair_address)
+        if pool_keys is None:
+            logger.warning("No pool keys found...")
+            return False
+        logger.debug("Pool keys fetched successfully.")
+
+        mint = pool_keys.base_mint if pool_keys.base_mint != WSOL else pool_keys.quote_mint
+
+        logger.debug("Fetching reserves, token account and rent...")
+        with span("reserves"):  # the wallet and rent lookups overlap with it
+            reserves, token_account, balance_needed = await asyncio.gather(
+                async_get_reserves(pool_keys, reserve_stream),
+                engine.wallet_state.async_token_account(engine.async_client, mint),
+                _async_temporary_wsol_rent(engine),
+            )
+        if reserves is None:
+            logger.warning("No reserves found...")
+            return False
+
+        logger.debug("Calculating transaction amounts...")
+        amount_in = int(sol_in * SOL_DECIMAL)
+        with span("quote"):
+            minimum_amount_out = calc_buy_minimum_out(pool_keys, amount_in, slippage, reserves)
+        logger.debug("Amount In: %s | Minimum Amount Out: %s", amount_in, minimum_amount_out)
+
+        existing_token_account = token_account.address if token_account else None
+
+        wsol_setup, top_up = [], 0
+        if engine.persistent_wsol:
+            with span("wallet"):
+                if engine.wsol_account.needs_refresh(amount_in):
+                    await engine.wsol_account.async_refresh(engine.async_client)
+                wsol_setup, top_up = engine.wsol_account.prepare_buy(amount_in)
+
+        confirmed = None
+        try:
+            if engine.persistent_wsol and not wsol_setup and existing_token_account:
+                with span("build"):
+                    template = swap_templates.get(engine.payer_keypair, pool_keys, engine.wsol_account.address, existing_token_account)
+                confirmed = await async_send_template_and_confirm(template, amount_in, minimum_amount_out, pool_keys)
+            else:
+                with span("build"):
+                    instructions = make_buy_instructions(
+                        pool_keys, mint, amount_in, minimum_amount_out, existing_token_account, balance_needed,
+                        engine.wsol_account if engine.persistent_wsol else None, wsol_setup,
+                    )
+                confirmed = await async_send_and_confirm(instructions, pool_keys)
+        finally:
+            if engine.persistent_wsol:
+                engine.wsol_account.settle_buy(amount_in, top_up, confirmed, engine.wsol_account.creates(wsol_setup))
+            engine.wallet_state.settle_buy(
+                mint, existing_token_account or get_associated_token_address(engine.payer_keypair.pubkey(), mint),
+                minimum_amount_out, confirmed,
+            )
+        return confirmed
+
+    except Exception as e:
+        logger.error("Error occurred during transaction: %s", e)
+        return False
+
+@timed("sell")
+async def async_sell(pair_address: str, percentage: int = 100, slippage: int = 5, reserve_stream=None) -> bool:
+    engine = current_engine()
+    try:
+        logger.info("Starting sell transaction for pair address: %s", pair_address)
+        if not (1 <= percentage <= 100):
+            logger.warning("Percentage must be between 1 and 100.")
+            return False
+
+        logger.debug("Fetching pool keys...")
+        with span("pool_keys"):
+            pool_keys = await async_fetch_pool_keys(pair_address)
+        if pool_keys is None:
+            logger.warning("No pool keys found...")
+            return False
+        logger.debug("Pool keys fetched successfully.")
+
+        mint = pool_keys.base_mint if pool_keys.base_mint != WSOL else pool_keys.quote_mint
+
+        logger.debug("Fetching token balance, reserves and rent...")
+        with span("reserves"):  # the wallet and rent lookups overlap with it
+            token_account, reserves, balance_needed = await asyncio.gather(
+                engine.wallet_state.async_token_account(engine.async_client, mint, exact=True),
+                async_get_reserves(pool_keys, reserve_stream),
+                _async_temporary_wsol_rent(engine),
+            )
+        token_balance = token_account.amount if token_account else 0
+        logger.debug("Token Balance: %s", token_balance)
+
+        if token_balance == 0:
+            logger.warning("No token balance available to sell.")
+            return False
+        if reserves is None:
+            logger.warning("No reserves found...")
+            return False
+
+        amount_in = token_balance * percentage // 100
+        logger.debug("Selling %s%% of the token balance, adjusted balance: %s", percentage, amount_in)
+
+        logger.debug("Calculating transaction amounts...")
+        with span("quote"):
+            minimum_amount_out = calc_sell_minimum_out(pool_keys, amount_in, slippage, reserves)
+        logger.debug("Amount In: %s | Minimum Amount Out: %s", amount_in, minimum_amount_out)
+
+        wsol_setup = engine.wsol_account.prepare_sell() if engine.persistent_wsol else []
+        confirmed = None
+        try:
+            if engine.persistent_wsol and not wsol_setup and percentage != 100:
+                with span("build"):
+                    template = swap_templates.get(engine.payer_keypair, pool_keys, token_account.address, engine.wsol_account.address)
+                confirmed = await async_send_template_and_confirm(template, amount_in, minimum_amount_out, pool_keys)
+            else:
+                with span("build"):
+                    instructions = make_sell_instructions(
+                        pool_keys, token_account.address, amount_in, minimum_amount_out, percentage == 100, balance_needed,
+                        engine.wsol_account if engine.persistent_wsol else None, wsol_setup,
+                    )
+                confirmed = await async_send_and_confirm(instructions, pool_keys)
+        finally:
+            if engine.persistent_wsol:
+                engine.wsol_account.settle_sell(minimum_amount_out, confirmed, engine.wsol_account.creates(wsol_setup))
+            engine.wallet_state.settle_sell(mint, amount_in, percentage == 100, confirmed)
+        return confirmed
+
+    except Exception as e:
+        logger.error("Error occurred during transaction: %s", e)
+        return False
+
+async def _async_temporary_wsol_rent(engine) -> int:
+    # Rent for the WSOL account a trade creates and closes again; with PERSISTENT_WSOL there
+    # is none, so nothing is fetched.
+    if engine.persistent_wsol:
+        return 0
+    return await engine.cluster_constants.async_rent_exempt_minimum(engine.async_client, ACCOUNT_LAYOUT.sizeof())
+
+@timed("unwrap")
+async def async_unwrap_wsol() -> bool:
+    engine = current_engine()
+    try:
+        logger.info("Unwrapping WSOL account: %s", engine.wsol_account.address)
+        confirmed = None
+        try:
+            confirmed = await async_send_and_confirm([
+                set_compute_unit_limit(engine.unit_budget),
+                set_compute_unit_price(engine.unit_price),
+                *engine.wsol_account.unwrap_instructions(),
+            ])
+        finally:
+            engine.wsol_account.settle_unwrap(confirmed)
+        return confirmed
+
+    except Exception as e:
+        logger.error("Error occurred during transaction: %s", e)
+        return False
+
+async def async_send_and_confirm(instructions: list, pool_keys: Optional[PoolKeys] = None) -> Optional[bool]:
+    engine = current_engine()
+    logger.debug("Compiling transaction message...")
+    with span("compile"):
+        blockhash, last_valid_block_height = await engine.async_blockhash_provider.get_with_height()
+        with span("fees"):
+            budget = await engine.async_fee_policy.budget(engine.async_client, engine.payer_keypair, instructions, blockhash, pool_keys)
+        compiled_message = MessageV0.try_compile(
+            engine.payer_keypair.pubkey(),
+            with_compute_budget(instructions, budget.unit_limit, budget.unit_price),
+            [],
+            blockhash,
+        )
+        txn = VersionedTransaction(compiled_message, [engine.payer_keypair])
+
+    logger.debug("Sending transaction...")
+    with span("send"):
+        txn_sig = await engine.async_broadcaster.send(bytes(txn))
+    logger.info("Transaction Signature: %s", txn_sig)
+
+    logger.debug("Confirming transaction...")
+    confirmed = None
+    try:
+        with span("confirm"):
+            confirmed = await async_confirm_txn(txn_sig, last_valid_block_height=last_valid_block_height)
+    finally:
+        engine.async_broadcaster.finish(txn_sig, confirmed)  # stops the rebroadcasts
+        engine.async_fee_policy.observe(engine.async_client, txn_sig, budget, confirmed)
+
+    logger.info("Transaction confirmed: %s", confirmed)
+    return confirmed
+
+async def async_send_template_and_confirm(
+    template: SwapTemplate, amount_in: int, minimum_amount_out: int, pool_keys: Optional[PoolKeys] = None,
+) -> Optional[bool]:
+    engine = current_engine()
+    logger.debug("Patching swap template...")
+    with span("compile"):
+        blockhash, last_valid_block_height = await engine.async_blockhash_provider.get_with_height()
+        with span("fees"):
+            budget = await engine.async_fee_policy.template_budget(engine.async_client, template, amount_in, minimum_amount_out, blockhash, pool_keys)
+        raw_txn = template.render(amount_in, minimum_amount_out, blockhash, budget.unit_limit, budget.unit_price)
+
+    logger.debug("Sending transaction...")
+    with span("send"):
+        txn_sig = await engine.async_broadcaster.send(raw_txn)
+    logger.info("Transaction Signature: %s", txn_sig)
+
+    logger.debug("Confirming transaction...")
+    confirmed = None
+    try:
+        with span("confirm"):
+            confirmed = await async_confirm_txn(txn_sig, last_valid_block_height=last_valid_block_height)
+    finally:
+        engine.async_broadcaster.finish(txn_sig, confirmed)  # stops the rebroadcasts
+        engine.async_fee_policy.observe(engine.async_client, txn_sig, budget, confirmed)
+
+    logger.info("Transaction confirmed: %s", confirmed)
+    return confirmed
@@ -0,0 +1,141 @@
+import asyncio
+import logging
+from typing import Optional
+from solana.rpc.commitment import Processed
+from solana.rpc.types import TokenAccountOpts
+from solana.transaction import Signature
+from solders.pubkey import Pubkey  # type: ignore
+from config import RESERVE_STREAM_MAX_AGE
+from engine import current_engine
+from fast_layouts import LIQUIDITY_STATE_V4
+from reserves import Reserves, async_fetch_reserves
+from utils import (
+    PoolKeys,
+    decode_pool_keys,
+    get_shared_pool_table,
+    parse_token_reserves,
+    pool_index,
+    pool_keys_cache,
+)
+
+logger = logging.getLogger(__name__)
+
+_ENGINE_ATTRIBUTES = ("async_client", "async_blockhash_provider", "async_confirmation_tracker")
+
+def __getattr__(name: str):
+    if name in _ENGINE_ATTRIBUTES:
+        return getattr(current_engine(), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+async def async_fetch_pool_keys(pair_address: str, use_cache: bool = True) -> Optional[PoolKeys]:
+    if use_cache:
+        pool_keys = pool_keys_cache.get(pair_address)
+        if pool_keys is not None:
+            return pool_keys
+
+    try:
+        shared_table = get_shared_pool_table() if use_cache else None
+        if shared_table is not None:
+            pool_keys = shared_table.pool_keys(pair_address)
+            if pool_keys is not None:
+                return pool_keys
+
+        async_client = current_engine().async_client
+        amm_id = Pubkey.from_string(pair_address)
+        amm_data = (await async_client.get_account_info_json_parsed(amm_id, commitment=Processed)).value.data
+        marketId = Pubkey.from_bytes(LIQUIDITY_STATE_V4.read(amm_data, "serumMarket"))
+        marketInfo = (await async_client.get_account_info_json_parsed(marketId, commitment=Processed)).value.data
+        pool_keys = decode_pool_keys(amm_id, amm_data, marketInfo)
+        # Both write their files; keep that off the event loop.
+        await asyncio.get_running_loop().run_in_executor(None, _store_pool_keys, pool_keys, use_cache)
+        return pool_keys
+    except Exception as e:
+        logger.warning("Error fetching pool keys: %s", e)
+        return None
+
+def _store_pool_keys(pool_keys: PoolKeys, use_cache: bool) -> None:
+    pool_index.add_pool_keys(pool_keys)
+    if use_cache:
+        pool_keys_cache.put(pool_keys)
+
+async def async_get_pair_address_from_rpc(token_address: str) -> Optional[str]:
+    pair_addresses = await async_get_pair_addresses_from_rpc(token_address)
+    return pair_addresses[0] if pair_addresses else None
+
+async def async_get_pair_addresses_from_rpc(token_address: str) -> list:
+    mint = Pubkey.from_string(token_address)
+    pair_addresses = pool_index.pairs(mint)
+    if pair_addresses:
+        return pair_addresses
+
+    # Both orientations are scanned at once.
+    logger.debug("Getting pair address from RPC...")
+    try:
+        await pool_index.async_refresh_mint(current_engine().async_client, token_address)
+    except Exception as e:
+        logger.warning("Error fetching AMM ID: %s", e)
+    return pool_index.pairs(mint)
+
+async def async_get_token_balance(mint_str: str) -> float | None:
+    try:
+        engine = current_engine()
+        mint = Pubkey.from_string(mint_str)
+        response = await engine.async_client.get_token_accounts_by_owner_json_parsed(
+            engine.payer_keypair.pubkey(),
+            TokenAccountOpts(mint=mint),
+            commitment=Processed
+        )
+
+        accounts = response.value
+        if accounts:
+            token_amount = accounts[0].account.data.parsed['info']['tokenAmount']['uiAmount']
+            if token_amount:
+                return float(token_amount)
+        return None
+    except Exception as e:
+        logger.warning("Error fetching token balance: %s", e)
+        return None
+
+async def async_confirm_txn(
+    txn_sig: Signature,
+    max_retries: Optional[int] = None,
+    retry_interval: float = 3,
+    *,
+    last_valid_block_height: Optional[int] = None,
+) -> Optional[bool]:
+    # Waits max_retries * retry_interval seconds if given, else until the tracker gives up.
+    tracker = current_engine().async_confirmation_tracker
+    timeout = max_retries * retry_interval if max_retries is not None else 2 * tracker.max_wait
+    confirmed = await tracker.wait(txn_sig, last_valid_block_height, timeout)
+    if confirmed:
+        logger.info("Transaction confirmed.")
+    elif confirmed is False:
+        logger.warning("Transaction failed.")
+    else:
+        logger.warning("Blockhash expired. Transaction confirmation failed.")
+    return confirmed
+
+async def async_get_reserves(pool_keys: PoolKeys, reserve_stream=None) -> Optional[Reserves]:
+    try:
+        reserves = None
+        if reserve_stream is None:
+            reserve_stream = get_shared_pool_table()
+        if reserve_stream is not None:
+            reserves = reserve_stream.get(str(pool_keys.amm_id), RESERVE_STREAM_MAX_AGE)
+        if reserves is None:
+            reserves = (await async_fetch_reserves(current_engine().async_client, [pool_keys])).get(str(pool_keys.amm_id))
+        return reserves
+
+    except Exception as e:
+        logger.warning("Error occurred: %s", e)
+        return None
+
+async def async_get_token_reserves(pool_keys: PoolKeys, reserve_stream=None) -> tuple:
+    return parse_token_reserves(pool_keys, await async_get_reserves(pool_keys, reserve_stream))
+
+async def async_get_token_reserves_bulk(pools: list) -> dict:
+    try:
+        return await async_fetch_reserves(current_engine().async_client, pools)
+    except Exception as e:
+        logger.warning("Error fetching reserves: %s", e)
+        return {}
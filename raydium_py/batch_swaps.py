@@ -0,0 +1,428 @@
+import asyncio
+import logging
+from dataclasses import dataclass, field, replace
+from typing import Optional, Sequence
+from solana.rpc.commitment import Processed
+from solders.message import MessageV0, to_bytes_versioned  # type: ignore
+from solders.pubkey import Pubkey  # type: ignore
+from solders.transaction import VersionedTransaction  # type: ignore
+from spl.token.instructions import (
+    CloseAccountParams,
+    close_account,
+    create_idempotent_associated_token_account,
+    get_associated_token_address,
+)
+from async_utils import async_fetch_pool_keys
+from constants import SOL_DECIMAL, TOKEN_PROGRAM_ID, WSOL
+from engine import current_engine
+from fees import MAX_UNITS, with_compute_budget
+from instrumentation import span, timed
+from quote import quote_pool_base_in
+from lookup_tables import STATIC_ADDRESSES, pool_addresses
+from raydium import calc_buy_minimum_out, calc_sell_minimum_out
+from reserves import Reserves, async_fetch_reserves, fetch_reserves
+from utils import PoolKeys, fetch_pool_keys, make_swap_instruction
+
+logger = logging.getLogger(__name__)
+
+# Many buys and sells of one wallet packed into as few v0 transactions as possible, e.g. to
+# rebalance a portfolio across pools with a handful of signatures, fees and confirmations
+# instead of one per trade.
+#
+#   results = batch_swap([("sell", pair_a, 100, 5), ("buy", pair_b, .5, 5), ...])
+#
+# Amounts are as for buy/sell: SOL in for a buy, the percentage of the balance for a sell.
+# A swap names 18 accounts, so without lookup tables a second one rarely fits in the
+# 1232-byte packet.
+# The token program, RAY_AUTHORITY_V4, OPEN_BOOK_PROGRAM, every pool's accounts and the
+# wallet's token accounts are therefore kept in the wallet's address lookup tables
+# (lookup_tables.py), extended on first use of a pool, and a transaction references them by
+# index. pack() then fills each transaction until the next swap would push it over the
+# packet size or the account lock limit; with the tables it is the lock limit, at four or
+# five swaps per transaction.
+#
+# Swaps pay from and into the persistent WSOL account (wsol.py) whatever PERSISTENT_WSOL
+# says; the top-up for all buys rides in the first transaction, which is confirmed before the
+# rest are sent together. Each trade's result is that of its transaction.
+
+MAX_TRANSACTION_SIZE = 1232  # bytes, signatures included
+MAX_ACCOUNT_LOCKS = 64  # accounts per transaction, looked up ones included
+SIDES = ("buy", "sell")
+
+@dataclass
+class BatchSwap:
+    index: int  # position in the trades passed to batch_swap
+    side: str
+    pool_keys: PoolKeys
+    mint: Pubkey
+    token_account: Pubkey
+    amount_in: int
+    minimum_amount_out: int
+    closes: bool = False
+    instructions: list = field(default_factory=list)
+
+@dataclass
+class BatchTransaction:
+    swaps: list
+    instructions: list  # without the compute budget
+
+def transaction_fits(
+    payer: Pubkey, instructions: Sequence, lookup_tables: Sequence, blockhash, max_account_locks: int = MAX_ACCOUNT_LOCKS,
+) -> bool:
+    # Compiled with a placeholder budget: its two instructions have a fixed size.
+    try:
+        message = MessageV0.try_compile(payer, with_compute_budget(instructions, MAX_UNITS, 0), lookup_tables, blockhash)
+    except Exception:
+        return False  # e.g. more than 256 accounts
+    size = len(to_bytes_versioned(message)) + 1 + 64 * message.header.num_required_signatures
+    locks = len(message.account_keys) + sum(
+        len(lookup.writable_indexes) + len(lookup.readonly_indexes) for lookup in message.address_table_lookups
+    )
+    return size <= MAX_TRANSACTION_SIZE and locks <= max_account_locks
+
+def pack(
+    payer: Pubkey,
+    swaps: Sequence[BatchSwap],
+    lookup_tables: Sequence,
+    blockhash,
+    setup: Sequence = (),
+    max_account_locks: int = MAX_ACCOUNT_LOCKS,
+) -> list:
+    # First fit in order: a swap joins the open transaction if that still fits, else starts
+    # the next one. setup goes at the start of the first transaction.
+    transactions = []
+    current = BatchTransaction([], list(setup))
+    for swap in swaps:
+        candidate = current.instructions + swap.instructions
+        if transaction_fits(payer, candidate, lookup_tables, blockhash, max_account_locks):
+            current.swaps.append(swap)
+            current.instructions = candidate
+            continue
+        if not current.swaps:
+            raise ValueError(f"Swap on {swap.pool_keys.amm_id} does not fit in a transaction")
+        transactions.append(current)
+        current = BatchTransaction([swap], list(swap.instructions))
+        if not transaction_fits(payer, current.instructions, lookup_tables, blockhash, max_account_locks):
+            raise ValueError(f"Swap on {swap.pool_keys.amm_id} does not fit in a transaction")
+    if current.swaps:
+        transactions.append(current)
+    return transactions
+
+def lookup_addresses(swaps: Sequence[BatchSwap], wsol_address: Pubkey) -> list:
+    addresses = [*STATIC_ADDRESSES, wsol_address]
+    for swap in swaps:
+        addresses.extend(pool_addresses(swap.pool_keys))
+        addresses.extend((swap.mint, swap.token_account))
+    return addresses
+
+def plan_swaps(engine, trades: Sequence[tuple], pools: dict, reserves: dict, accounts: dict) -> list:
+    # BatchSwaps for the trades that can be built, sells first. pools are keyed by pair
+    # address, reserves by str(amm_id), accounts (TokenAccountState or None) by str(mint).
+    # Trades are quoted in the order they execute, each against its pool's reserves after
+    # the swaps planned on that pool before it.
+    payer = engine.payer_keypair
+    wsol_address = engine.wsol_account.address
+    remaining = {mint: state.amount for mint, state in accounts.items() if state is not None}
+    bought = {str(_mint(pools[pair_address])) for side, pair_address, _, _ in trades if side == "buy" and pools.get(pair_address)}
+    reserves = dict(reserves)
+    sells, buys = [], []
+    for index, (side, pair_address, amount, slippage) in sorted(enumerate(trades), key=lambda trade: trade[1][0] != "sell"):
+        pool_keys = pools.get(pair_address)
+        pool_reserves = reserves.get(str(pool_keys.amm_id)) if pool_keys else None
+        if pool_keys is None or pool_reserves is None:
+            logger.warning("No pool keys or reserves for %s; skipping.", pair_address)
+            continue
+        mint = _mint(pool_keys)
+        state = accounts.get(str(mint))
+
+        if side == "sell":
+            balance = remaining.get(str(mint), 0)
+            amount_in = balance * amount // 100 if 1 <= amount <= 100 else 0
+            if amount_in == 0:
+                logger.warning("Nothing to sell on %s; skipping.", pair_address)
+                continue
+            remaining[str(mint)] = balance - amount_in
+            swap = BatchSwap(
+                index, side, pool_keys, mint, state.address, amount_in,
+                calc_sell_minimum_out(pool_keys, amount_in, slippage, pool_reserves),
+                closes=balance == amount_in and str(mint) not in bought,  # a buy may land in the account first
+            )
+            swap.instructions.append(make_swap_instruction(
+                amount_in, swap.minimum_amount_out, state.address, wsol_address, pool_keys, payer,
+            ))
+            if swap.closes:
+                swap.instructions.append(close_account(
+                    CloseAccountParams(TOKEN_PROGRAM_ID, state.address, payer.pubkey(), payer.pubkey())
+                ))
+            sells.append(swap)
+        else:
+            amount_in = int(amount * SOL_DECIMAL)
+            token_account = state.address if state else get_associated_token_address(payer.pubkey(), mint)
+            swap = BatchSwap(
+                index, side, pool_keys, mint, token_account, amount_in,
+                calc_buy_minimum_out(pool_keys, amount_in, slippage, pool_reserves),
+            )
+            if state is None:
+                # Idempotent: another buy of the batch may create it as well.
+                swap.instructions.append(create_idempotent_associated_token_account(payer.pubkey(), payer.pubkey(), mint))
+            swap.instructions.append(make_swap_instruction(
+                amount_in, swap.minimum_amount_out, wsol_address, token_account, pool_keys, payer,
+            ))
+            buys.append(swap)
+        reserves[str(pool_keys.amm_id)] = _after_swap(pool_keys, pool_reserves, side, amount_in)
+    return sells + buys
+
+def _after_swap(pool_keys: PoolKeys, reserves: Reserves, side: str, amount_in: int) -> Reserves:
+    # The pool's reserves once a swap of amount_in has gone through, rounded like the program.
+    if (side == "sell") == (pool_keys.base_mint != WSOL):
+        amount_out = quote_pool_base_in(pool_keys, amount_in, reserves.base, reserves.quote)
+        return replace(reserves, base=reserves.base + amount_in, quote=reserves.quote - amount_out)
+    amount_out = quote_pool_base_in(pool_keys, amount_in, reserves.quote, reserves.base)
+    return replace(reserves, base=reserves.base - amount_out, quote=reserves.quote + amount_in)
+
+def settle(engine, swaps: Sequence[BatchSwap], setup: Sequence, top_up: int, setup_confirmed: Optional[bool], confirmed: dict) -> None:
+    # confirmed: swap index -> result of its transaction (False if it was never sent).
+    engine.wsol_account.settle_buy(0, top_up, setup_confirmed, engine.wsol_account.creates(setup))
+    for swap in swaps:
+        result = confirmed.get(swap.index, False)
+        if swap.side == "buy":
+            engine.wsol_account.settle_buy(swap.amount_in, 0, result)
+            engine.wallet_state.settle_buy(swap.mint, swap.token_account, swap.minimum_amount_out, result)
+        else:
+            engine.wsol_account.settle_sell(swap.minimum_amount_out, result)
+            engine.wallet_state.settle_sell(swap.mint, swap.amount_in, swap.closes, result)
+
+def _mint(pool_keys: PoolKeys) -> Pubkey:
+    return pool_keys.base_mint if pool_keys.base_mint != WSOL else pool_keys.quote_mint
+
+def _check(trades: Sequence[tuple]) -> None:
+    for trade in trades:
+        if trade[0] not in SIDES:
+            raise ValueError(f"Unknown side: {trade[0]}")
+
+@timed("batch_swap")
+def batch_swap(trades: Sequence[tuple], use_lookup_tables: bool = True) -> list:
+    # trades: (side, pair_address, amount, slippage). Returns one result per trade.
+    engine = current_engine()
+    results = [False] * len(trades)
+    try:
+        _check(trades)
+        logger.info("Starting batch of %s swaps", len(trades))
+        with span("pool_keys"):
+            pools = {pair_address: fetch_pool_keys(pair_address) for _, pair_address, _, _ in trades}
+        found = list({str(pool_keys.amm_id): pool_keys for pool_keys in pools.values() if pool_keys}.values())
+        with span("reserves"):
+            reserves = fetch_reserves(engine.client, found) if found else {}
+
+        with span("wallet"):
+            accounts = {}
+            for side, pair_address, _, _ in trades:
+                pool_keys = pools.get(pair_address)
+                if pool_keys is not None:
+                    mint = _mint(pool_keys)
+                    accounts[str(mint)] = engine.wallet_state.token_account(engine.client, mint, exact=side == "sell")
+            swaps = plan_swaps(engine, trades, pools, reserves, accounts)
+            if not swaps:
+                return results
+            spend = sum(swap.amount_in for swap in swaps if swap.side == "buy")
+            if engine.wsol_account.needs_refresh(spend):
+                engine.wsol_account.refresh(engine.client)
+            setup, top_up = engine.wsol_account.prepare_buy(spend) if spend else (engine.wsol_account.prepare_sell(), 0)
+
+        setup_confirmed, confirmed = not setup, {}
+        try:
+            with span("lookup_tables"):
+                addresses = lookup_addresses(swaps, engine.wsol_account.address)
+                lookup_tables = ensure_lookup_tables(addresses) if use_lookup_tables else []
+            with span("build"):
+                blockhash = engine.blockhash_provider.get()
+                transactions = pack(engine.payer_keypair.pubkey(), swaps, lookup_tables, blockhash, setup)
+            logger.info("Packed %s swaps into %s transactions", len(swaps), len(transactions))
+
+            if setup:
+                # Everything else spends what the first transaction wraps.
+                setup_confirmed = _send_all(transactions[:1], lookup_tables, confirmed)[0]
+                transactions = transactions[1:] if setup_confirmed else []
+            _send_all(transactions, lookup_tables, confirmed)
+        finally:
+            settle(engine, swaps, setup, top_up, setup_confirmed, confirmed)
+            for index, result in confirmed.items():
+                results[index] = result
+        return results
+
+    except Exception as e:
+        logger.error("Error occurred during batch: %s", e)
+        return results
+
+def ensure_lookup_tables(addresses: Sequence[Pubkey]) -> list:
+    # The wallet's lookup tables covering addresses, extended first if some are missing. The
+    # first extension (which may create the table) lands before the others are sent together;
+    # those append in whatever order they land, so the contents are read back afterwards.
+    engine = current_engine()
+    registry = engine.lookup_tables
+    if not registry.synced:
+        registry.sync(engine.client)
+    if registry.missing(addresses):
+        recent_slot = engine.client.get_slot(Processed).value
+        extensions = registry.extend_instructions(engine.payer_keypair.pubkey(), addresses, recent_slot)
+        if _send_all([BatchTransaction([], extensions[0][2])], [], {})[0]:
+            registry.record(*extensions[0][:2])
+            results = _send_all([BatchTransaction([], instructions) for _, _, instructions in extensions[1:]], [], {})
+            for (table, added, _), result in zip(extensions[1:], results):
+                if result:
+                    registry.record(table, added)
+            if len(extensions) > 1:
+                registry.sync(engine.client)
+        if registry.missing(addresses):
+            logger.warning("Could not add every account to the lookup tables; packing without them.")
+    return registry.cover(addresses)
+
+def _send_all(transactions: Sequence[BatchTransaction], lookup_tables: list, confirmed: dict) -> list:
+    # Sends the transactions, then waits for all of them; records each swap's result.
+    engine = current_engine()
+    payer = engine.payer_keypair
+    blockhash, last_valid_block_height = engine.blockhash_provider.get_with_height()
+    sent = []
+    try:
+        for batch in transactions:
+            pools = [swap.pool_keys for swap in batch.swaps]
+            with span("fees"):
+                budget = engine.fee_policy.batch_budget(engine.client, payer, batch.instructions, lookup_tables, blockhash, pools)
+            message = MessageV0.try_compile(
+                payer.pubkey(), with_compute_budget(batch.instructions, budget.unit_limit, budget.unit_price),
+                lookup_tables, blockhash,
+            )
+            with span("send"):
+                signature = engine.broadcaster.send(bytes(VersionedTransaction(message, [payer])))
+            logger.info("Transaction Signature: %s (%s swaps)", signature, len(batch.swaps))
+            sent.append((batch, signature, budget, engine.confirmation_tracker.track(signature, last_valid_block_height)))
+    finally:
+        with span("confirm"):
+            results = []
+            for batch, signature, budget, future in sent:
+                result = None
+                try:
+                    result = future.result()
+                finally:
+                    engine.broadcaster.finish(signature, result)
+                    engine.fee_policy.observe(engine.client, signature, budget, result)
+                for swap in batch.swaps:
+                    confirmed[swap.index] = result
+                results.append(result)
+    return results
+
+@timed("batch_swap")
+async def async_batch_swap(trades: Sequence[tuple], use_lookup_tables: bool = True) -> list:
+    engine = current_engine()
+    results = [False] * len(trades)
+    try:
+        _check(trades)
+        logger.info("Starting batch of %s swaps", len(trades))
+        with span("pool_keys"):
+            addresses = list(dict.fromkeys(pair_address for _, pair_address, _, _ in trades))
+            pools = dict(zip(addresses, await asyncio.gather(*(async_fetch_pool_keys(address) for address in addresses))))
+        found = list({str(pool_keys.amm_id): pool_keys for pool_keys in pools.values() if pool_keys}.values())
+        with span("reserves"):
+            reserves = await async_fetch_reserves(engine.async_client, found) if found else {}
+
+        with span("wallet"):
+            accounts = {}
+            for side, pair_address, _, _ in trades:
+                pool_keys = pools.get(pair_address)
+                if pool_keys is not None:
+                    mint = _mint(pool_keys)
+                    accounts[str(mint)] = await engine.wallet_state.async_token_account(
+                        engine.async_client, mint, exact=side == "sell",
+                    )
+            swaps = plan_swaps(engine, trades, pools, reserves, accounts)
+            if not swaps:
+                return results
+            spend = sum(swap.amount_in for swap in swaps if swap.side == "buy")
+            if engine.wsol_account.needs_refresh(spend):
+                await engine.wsol_account.async_refresh(engine.async_client)
+            setup, top_up = engine.wsol_account.prepare_buy(spend) if spend else (engine.wsol_account.prepare_sell(), 0)
+
+        setup_confirmed, confirmed = not setup, {}
+        try:
+            with span("lookup_tables"):
+                addresses = lookup_addresses(swaps, engine.wsol_account.address)
+                lookup_tables = await async_ensure_lookup_tables(addresses) if use_lookup_tables else []
+            with span("build"):
+                blockhash = await engine.async_blockhash_provider.get()
+                transactions = pack(engine.payer_keypair.pubkey(), swaps, lookup_tables, blockhash, setup)
+            logger.info("Packed %s swaps into %s transactions", len(swaps), len(transactions))
+
+            if setup:
+                setup_confirmed = (await _async_send_all(transactions[:1], lookup_tables, confirmed))[0]
+                transactions = transactions[1:] if setup_confirmed else []
+            await _async_send_all(transactions, lookup_tables, confirmed)
+        finally:
+            settle(engine, swaps, setup, top_up, setup_confirmed, confirmed)
+            for index, result in confirmed.items():
+                results[index] = result
+        return results
+
+    except Exception as e:
+        logger.error("Error occurred during batch: %s", e)
+        return results
+
+async def async_ensure_lookup_tables(addresses: Sequence[Pubkey]) -> list:
+    engine = current_engine()
+    registry = engine.lookup_tables
+    if not registry.synced:
+        await registry.async_sync(engine.async_client)
+    if registry.missing(addresses):
+        recent_slot = (await engine.async_client.get_slot(Processed)).value
+        extensions = registry.extend_instructions(engine.payer_keypair.pubkey(), addresses, recent_slot)
+        if (await _async_send_all([BatchTransaction([], extensions[0][2])], [], {}))[0]:
+            registry.record(*extensions[0][:2])
+            results = await _async_send_all([BatchTransaction([], instructions) for _, _, instructions in extensions[1:]], [], {})
+            for (table, added, _), result in zip(extensions[1:], results):
+                if result:
+                    registry.record(table, added)
+            if len(extensions) > 1:
+                await registry.async_sync(engine.async_client)
+        if registry.missing(addresses):
+            logger.warning("Could not add every account to the lookup tables; packing without them.")
+    return registry.cover(addresses)
+
+async def _async_send_all(transactions: Sequence[BatchTransaction], lookup_tables: list, confirmed: dict) -> list:
+    engine = current_engine()
+    payer = engine.payer_keypair
+    blockhash, last_valid_block_height = await engine.async_blockhash_provider.get_with_height()
+
+    async def send(batch: BatchTransaction) -> tuple:
+        pools = [swap.pool_keys for swap in batch.swaps]
+        with span("fees"):
+            budget = await engine.async_fee_policy.batch_budget(
+                engine.async_client, payer, batch.instructions, lookup_tables, blockhash, pools,
+            )
+        message = MessageV0.try_compile(
+            payer.pubkey(), with_compute_budget(batch.instructions, budget.unit_limit, budget.unit_price),
+            lookup_tables, blockhash,
+        )
+        with span("send"):
+            signature = await engine.async_broadcaster.send(bytes(VersionedTransaction(message, [payer])))
+        logger.info("Transaction Signature: %s (%s swaps)", signature, len(batch.swaps))
+        return signature, budget
+
+    async def confirm(batch: BatchTransaction, signature, budget) -> Optional[bool]:
+        result = None
+        try:
+            result = await engine.async_confirmation_tracker.track(signature, last_valid_block_height)
+        finally:
+            engine.async_broadcaster.finish(signature, result)
+            engine.async_fee_policy.observe(engine.async_client, signature, budget, result)
+            for swap in batch.swaps:
+                confirmed[swap.index] = result
+        return result
+
+    sent = await asyncio.gather(*(send(batch) for batch in transactions), return_exceptions=True)
+    with span("confirm"):
+        results = await asyncio.gather(*(
+            confirm(batch, *outcome) for batch, outcome in zip(transactions, sent) if not isinstance(outcome, BaseException)
+        ))
+    for outcome in sent:
+        if isinstance(outcome, BaseException):
+            raise outcome
+    return list(results)
@@ -0,0 +1,122 @@
+import argparse
+import asyncio
+import time
+from solders.keypair import Keypair  # type: ignore
+from bench_pipeline import install_config
+from constants import WSOL
+from mock_rpc import MockRpcNode
+
+# A portfolio rebalance against a local MockRpcNode: the wallet sells all of its tokens in
+# HOLDINGS pools and buys into TARGETS other pools, paying from and into its WSOL account,
+# which already holds enough wrapped SOL. Each mode starts from the same state:
+#
+#   sequential          buy/sell one trade after another, one transaction each
+#   concurrent          async_buy/async_sell all at once, one transaction each
+#   batch, no tables    batch_swap without lookup tables (rarely two swaps per transaction)
+#   batch, cold tables  batch_swap on a wallet without lookup tables: creates and extends them first
+#   batch, warm tables  batch_swap with the tables of the previous run, read back from the chain
+#
+#   python bench_batch_swaps.py                          # defaults below
+#   python bench_batch_swaps.py --holdings 20 --targets 20
+
+HOLDINGS = 8
+TARGETS = 8
+LATENCY = 0.02  # seconds per RPC round trip
+CONFIRM_DELAY = 0.4  # seconds from send until a transaction reports confirmed
+SEED = 0
+SOL_IN = .01
+SLIPPAGE = 5
+ENGINE_SETTINGS = dict(persistent_wsol=True, rebroadcast_interval=None, unit_budget=100_000, unit_price=100_000)
+
+def start_node(args) -> tuple:
+    from spl.token.instructions import get_associated_token_address
+
+    node = MockRpcNode(SEED, args.latency, 0.0, args.confirm_delay).start()
+    payer = Keypair.from_seed(bytes([SEED % 256]) * 32)
+    node.add_token_account(get_associated_token_address(payer.pubkey(), WSOL), WSOL, payer.pubkey(), 10**12)
+    trades = []
+    for i in range(args.holdings + args.targets):
+        pool = node.add_pool()
+        if i < args.holdings:
+            node.add_token_account(get_associated_token_address(payer.pubkey(), pool.mint), pool.mint, payer.pubkey(), 10**9)
+            trades.append(("sell", str(pool.amm_id), 100, SLIPPAGE))
+        else:
+            trades.append(("buy", str(pool.amm_id), SOL_IN, SLIPPAGE))
+    return node, payer, trades
+
+def run_sequential(engine, trades: list) -> list:
+    import raydium
+
+    sides = {"buy": raydium.buy, "sell": raydium.sell}
+    with engine.use():
+        return [sides[side](pair_address, amount, slippage) for side, pair_address, amount, slippage in trades]
+
+def run_concurrent(engine, trades: list) -> list:
+    from async_raydium import async_buy, async_sell
+
+    sides = {"buy": async_buy, "sell": async_sell}
+
+    async def run() -> list:
+        with engine.use():
+            results = await asyncio.gather(*(
+                sides[side](pair_address, amount, slippage) for side, pair_address, amount, slippage in trades
+            ))
+        await engine.aclose()
+        return results
+
+    return asyncio.run(run())
+
+def run_batch(engine, trades: list, use_lookup_tables: bool) -> list:
+    from batch_swaps import batch_swap
+
+    with engine.use():
+        return batch_swap(trades, use_lookup_tables)
+
+def measure(node, engine, run, *args) -> tuple:
+    node.reset_counters()
+    started = time.perf_counter()
+    results = run(engine, *args)
+    elapsed = time.perf_counter() - started
+    engine.close()
+    return results, elapsed, len(node.budgets), sum(limit * price for limit, price, _ in node.budgets) / 1e6
+
+def report(name: str, trades: list, results: list, elapsed: float, transactions: int, fees: float) -> None:
+    print(
+        f"{name:<20} {sum(1 for result in results if result):>4}/{len(trades):<4} {transactions:>6} "
+        f"{elapsed * 1000:9.0f} {fees:12.0f}"
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark one transaction per swap against batched swaps on a mock RPC.")
+    parser.add_argument("--holdings", type=int, default=HOLDINGS, help="pools to sell out of")
+    parser.add_argument("--targets", type=int, default=TARGETS, help="pools to buy into")
+    parser.add_argument("--latency", type=float, default=LATENCY, help="seconds per RPC round trip")
+    parser.add_argument("--confirm-delay", type=float, default=CONFIRM_DELAY)
+    args = parser.parse_args()
+
+    install_config()
+    from engine import Engine
+
+    print(
+        f"rebalance: sell {args.holdings} holdings, buy {args.targets} targets, {args.latency * 1000:.0f} ms RTT, "
+        f"confirmation after {args.confirm_delay * 1000:.0f} ms\n"
+    )
+    print(f"{'mode':<20} {'landed':>9} {'txs':>6} {'total ms':>9} {'prio lamports':>12}")
+    modes = {
+        "sequential": (run_sequential,),
+        "concurrent": (run_concurrent,),
+        "batch, no tables": (run_batch, False),
+    }
+    for name, (run, *extra) in modes.items():
+        node, payer, trades = start_node(args)
+        report(name, trades, *measure(node, Engine(node.url, payer, **ENGINE_SETTINGS), run, trades, *extra))
+        node.stop()
+
+    node, payer, trades = start_node(args)
+    for name in ("batch, cold tables", "batch, warm tables"):
+        # A fresh engine each time: its wallet state and lookup tables are read from the node.
+        report(name, trades, *measure(node, Engine(node.url, payer, **ENGINE_SETTINGS), run_batch, trades, True))
+    node.stop()
+
+if __name__ == "__main__":
+    main()
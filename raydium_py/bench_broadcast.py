@@ -0,0 +1,117 @@
+import argparse
+import asyncio
+import time
+from solders.keypair import Keypair  # type: ignore
+from bench_pipeline import install_config, percentile
+from mock_rpc import MockRpcNode
+
+# Landing rate and latency of buys when the RPC path to the leader loses transactions.
+# Local MockRpcNodes built from one seed share a ledger, so they act as endpoints of one
+# cluster: the primary drops DROP_RATE of what it is sent, a second endpoint never drops but
+# forwards slowly, a third drops most of it. The nodes run in this process, so every extra
+# send also costs the client CPU time. Each mode runs the same concurrent buys:
+#
+#   send once    primary only, no rebroadcast (a dropped buy waits out its blockhash)
+#   rebroadcast  primary only, re-sent every interval until it lands
+#   fan-out      all endpoints at once, re-sent every interval, with probes ranking them
+#
+#   python bench_broadcast.py                          # defaults below
+#   python bench_broadcast.py --trades 100 --drop-rate .5
+
+TRADES = 30
+LATENCY = 0.02  # seconds per RPC round trip
+CONFIRM_DELAY = 0.4  # seconds from send until a transaction reports confirmed
+DROP_RATE = 0.3  # share of transactions the primary endpoint loses
+SLOW_FORWARD = 0.3  # extra seconds the second endpoint takes to land a transaction
+BAD_DROP_RATE = 0.8  # share of transactions the third endpoint loses
+INTERVAL = 1.0  # seconds between rebroadcasts; well below the observed landing time only adds load
+PROBE_RATE = 0.3  # high, so a short run ranks every endpoint
+BLOCKHASH_VALIDITY = 20  # slots, ~8 s, so lost transactions expire quickly
+SEED = 0
+SOL_IN = .01
+SLIPPAGE = 5
+
+def start_nodes(args) -> tuple:
+    ledger, nodes, pool = {}, [], None
+    for i, (drop_rate, forward_delay) in enumerate(
+        ((args.drop_rate, 0.0), (0.0, args.slow_forward), (args.bad_drop_rate, 0.0))
+    ):
+        node = MockRpcNode(SEED, args.latency, 0.0, args.confirm_delay, ledger, drop_rate, forward_delay)
+        node.drop_rng.seed(SEED + 10 + i)
+        node.blockhash_validity = BLOCKHASH_VALIDITY
+        pool = node.add_pool()
+        nodes.append(node.start())
+    return nodes, str(pool.amm_id)
+
+async def run_mode(engine, trades: int, pair_address: str) -> tuple:
+    from async_raydium import async_buy
+
+    async def timed_buy() -> tuple:
+        started = time.perf_counter()
+        result = await async_buy(pair_address, SOL_IN, SLIPPAGE)
+        return result, time.perf_counter() - started
+
+    with engine.use():
+        await timed_buy()  # warms pool keys, blockhash and cluster constants
+        outcomes = await asyncio.gather(*(timed_buy() for _ in range(trades)))
+    broadcaster = engine.async_broadcaster
+    await engine.aclose()
+    return outcomes, broadcaster
+
+def report(name: str, outcomes: list, nodes: list, broadcaster) -> None:
+    landed = [elapsed for result, elapsed in outcomes if result]
+    sends = sum(node.calls.get("sendTransaction", 0) for node in nodes)
+    p50 = percentile(landed, 50) * 1000 if landed else 0
+    p90 = percentile(landed, 90) * 1000 if landed else 0
+    print(
+        f"{name:<12} {len(landed):>4}/{len(outcomes):<4} {p50:9.0f} {p90:9.0f} "
+        f"{max(elapsed for _, elapsed in outcomes) * 1000:9.0f} {sends / (len(outcomes) + 1):10.2f} {broadcaster.rebroadcasts:>6}"
+    )
+
+def report_endpoints(broadcaster, nodes: list) -> None:
+    names = {node.url: f"node {i} (drop {node.drop_rate:.0%}, +{node.forward_delay * 1000:.0f} ms)" for i, node in enumerate(nodes)}
+    print(f"\nendpoint ranking (fan-out probes)\n{'endpoint':<28} {'landed':>6} {'missed':>6} {'landing p50 ms':>14} {'ack p50 ms':>10}")
+    for stats in broadcaster.ranked():
+        print(
+            f"{names.get(stats.endpoint, stats.endpoint):<28} {stats.landed:>6} {stats.missed:>6} "
+            f"{stats.landing.percentile(50) * 1000:14.0f} {stats.ack.percentile(50) * 1000:10.1f}"
+        )
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark send-once against fan-out and rebroadcast on lossy mock RPC nodes.")
+    parser.add_argument("--trades", type=int, default=TRADES)
+    parser.add_argument("--latency", type=float, default=LATENCY, help="seconds per RPC round trip")
+    parser.add_argument("--confirm-delay", type=float, default=CONFIRM_DELAY)
+    parser.add_argument("--drop-rate", type=float, default=DROP_RATE)
+    parser.add_argument("--slow-forward", type=float, default=SLOW_FORWARD)
+    parser.add_argument("--bad-drop-rate", type=float, default=BAD_DROP_RATE)
+    parser.add_argument("--interval", type=float, default=INTERVAL, help="seconds between rebroadcasts")
+    parser.add_argument("--probe-rate", type=float, default=PROBE_RATE)
+    args = parser.parse_args()
+
+    install_config()
+    from engine import Engine
+
+    payer = Keypair.from_seed(bytes(32))
+    print(
+        f"{args.trades} concurrent buys, primary drops {args.drop_rate:.0%}, {args.latency * 1000:.0f} ms RTT, "
+        f"confirmation after {args.confirm_delay * 1000:.0f} ms\n"
+    )
+    print(f"{'mode':<12} {'landed':>9} {'p50 ms':>9} {'p90 ms':>9} {'max ms':>9} {'sends/tx':>10} {'rebro':>6}")
+    modes = {
+        "send once": lambda urls: Engine(urls[0], payer, send_endpoints=[], rebroadcast_interval=None),
+        "rebroadcast": lambda urls: Engine(urls[0], payer, send_endpoints=[], rebroadcast_interval=args.interval),
+        "fan-out": lambda urls: Engine(
+            urls[0], payer, send_endpoints=urls[1:], rebroadcast_interval=args.interval, probe_rate=args.probe_rate,
+        ),
+    }
+    for name, make_engine in modes.items():
+        nodes, pair_address = start_nodes(args)
+        outcomes, broadcaster = asyncio.run(run_mode(make_engine([node.url for node in nodes]), args.trades, pair_address))
+        report(name, outcomes, nodes, broadcaster)
+        for node in nodes:
+            node.stop()
+    report_endpoints(broadcaster, nodes)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+import json
+import random
+import statistics
+import threading
+import time
+from types import SimpleNamespace
+from solders.signature import Signature  # type: ignore
+from solders.transaction_status import TransactionConfirmationStatus, TransactionStatus  # type: ignore
+from confirmation import ConfirmationTracker
+
+# Time-to-confirm and RPC call counts for many in-flight trades: the old per-signature
+# getTransaction loop (fixed 3 s sleep) vs ConfirmationTracker's batched status polls.
+# Runs against an in-process simulated RPC, no network needed: python bench_confirmation.py
+
+TRADES = 50
+RTT = 0.05  # seconds per simulated RPC round trip
+LAND_DELAY = (0.4, 1.6)  # seconds from send until the transaction is processed
+CONFIRM_DELAY = 0.4  # seconds from processed to confirmed
+SEND_SPREAD = 1.0  # trades are sent over this many seconds
+
+class SimulatedRpc:
+    def __init__(self):
+        self.calls = {}
+        self.landed = {}  # str(signature) -> processed_at
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+
+    def send(self, signature: Signature) -> None:
+        self.landed[str(signature)] = time.monotonic() + random.uniform(*LAND_DELAY)
+
+    def _call(self, method: str) -> float:
+        with self._lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+        time.sleep(RTT)
+        return time.monotonic()
+
+    def _status(self, signature: Signature, now: float):
+        processed_at = self.landed.get(str(signature))
+        if processed_at is None or now < processed_at:
+            return None
+        level = TransactionConfirmationStatus.Confirmed if now >= processed_at + CONFIRM_DELAY else TransactionConfirmationStatus.Processed
+        return TransactionStatus(1, None, None, None, level)
+
+    def get_block_height(self, commitment=None):
+        now = self._call("getBlockHeight")
+        return SimpleNamespace(value=int((now - self._started) / 0.4))
+
+    def get_signature_statuses(self, signatures: list):
+        now = self._call("getSignatureStatuses")
+        return SimpleNamespace(value=[self._status(signature, now) for signature in signatures])
+
+    def get_transaction(self, signature: Signature, **kwargs):
+        now = self._call("getTransaction")
+        status = self._status(signature, now)
+        if status is None or status.confirmation_status != TransactionConfirmationStatus.Confirmed:
+            return SimpleNamespace(value=None)
+        meta = SimpleNamespace(to_json=lambda: json.dumps({"err": None}))
+        return SimpleNamespace(value=SimpleNamespace(transaction=SimpleNamespace(meta=meta)))
+
+def legacy_confirm(client, txn_sig: Signature, max_retries: int = 20, retry_interval: int = 3) -> bool:
+    # The confirm_txn loop this tracker replaced.
+    retries = 1
+    while retries < max_retries:
+        try:
+            txn_res = client.get_transaction(txn_sig, encoding="json", max_supported_transaction_version=0)
+            txn_json = json.loads(txn_res.value.transaction.meta.to_json())
+            if txn_json['err'] is None:
+                return True
+            if txn_json['err']:
+                return False
+        except Exception:
+            retries += 1
+            time.sleep(retry_interval)
+    return None
+
+def run(label: str, make_confirm) -> None:
+    rpc = SimulatedRpc()
+    confirm, close = make_confirm(rpc)
+    latencies = []
+    lock = threading.Lock()
+
+    def trade() -> None:
+        signature = Signature.new_unique()
+        rpc.send(signature)
+        confirm(signature)
+        confirmed_at = time.monotonic()
+        with lock:
+            latencies.append(confirmed_at - (rpc.landed[str(signature)] + CONFIRM_DELAY))
+
+    started = time.monotonic()
+    threads = []
+    for _ in range(TRADES):
+        thread = threading.Thread(target=trade)
+        thread.start()
+        threads.append(thread)
+        time.sleep(SEND_SPREAD / TRADES)
+    for thread in threads:
+        thread.join()
+    close()
+
+    calls = sum(rpc.calls.values())
+    print(f"\n{label}")
+    print(f"  wall time                         {time.monotonic() - started:8.2f} s")
+    print(f"  delay after confirmation (mean)   {statistics.mean(latencies) * 1000:8.0f} ms")
+    print(f"  delay after confirmation (max)    {max(latencies) * 1000:8.0f} ms")
+    print(f"  RPC calls                         {calls:8d}  {rpc.calls}")
+
+def main():
+    print(f"{TRADES} trades sent over {SEND_SPREAD} s, {RTT * 1000:.0f} ms RTT")
+
+    def legacy(rpc):
+        return lambda signature: legacy_confirm(rpc, signature), lambda: None
+
+    def tracked(rpc):
+        tracker = ConfirmationTracker(rpc)
+        return lambda signature: tracker.wait(signature, last_valid_block_height=10**9), tracker.stop
+
+    run("getTransaction loop (3 s sleep)", legacy)
+    run("ConfirmationTracker (batched getSignatureStatuses)", tracked)
+
+if __name__ == "__main__":
+    main()
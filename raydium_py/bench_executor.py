@@ -0,0 +1,114 @@
+import argparse
+import asyncio
+import time
+from solders.keypair import Keypair  # type: ignore
+from bench_pipeline import install_config
+from mock_rpc import MockRpcNode
+
+# Wall time of a buy and a sell for every wallet of a pool of wallets, against local
+# MockRpcNodes: one trade at a time, as a script looping over wallets would do it, versus
+# TradeExecutor with one ordered worker per wallet spread over the endpoints. All nodes are
+# built from one seed, so they serve the same pool; every wallet starts with a token balance.
+#
+#   python bench_executor.py                          # defaults below
+#   python bench_executor.py --wallets 200 --endpoints 4 --skip-sequential
+
+WALLETS = 20
+ENDPOINTS = 2
+MAX_CONCURRENCY = 16
+LATENCY = 0.02  # seconds per RPC round trip
+CONFIRM_DELAY = 0.4  # seconds from send until a transaction reports confirmed
+SEED = 0
+SOL_IN = .01
+SLIPPAGE = 5
+SELL_PERCENTAGE = 50
+
+def make_wallets(count: int) -> list:
+    return [Keypair.from_seed(i.to_bytes(4, "little") + bytes(28)) for i in range(1, count + 1)]
+
+def start_nodes(count: int, wallets: list, latency: float, confirm_delay: float) -> tuple:
+    nodes, pool = [], None
+    for _ in range(count):
+        node = MockRpcNode(SEED, latency, 0.0, confirm_delay).start()
+        pool = node.add_pool()
+        nodes.append(node)
+    from spl.token.instructions import get_associated_token_address
+    for node in nodes:
+        for wallet in wallets:
+            token_account = get_associated_token_address(wallet.pubkey(), pool.mint)
+            node.add_token_account(token_account, pool.mint, wallet.pubkey(), 10**12)
+    return nodes, str(pool.amm_id)
+
+def trades(wallets: list, pair_address: str) -> list:
+    return [
+        trade
+        for wallet in wallets
+        for trade in (
+            ("buy", wallet.pubkey(), pair_address, SOL_IN, SLIPPAGE),
+            ("sell", wallet.pubkey(), pair_address, SELL_PERCENTAGE, SLIPPAGE),
+        )
+    ]
+
+async def run_sequential(wallets: list, url: str, pair_address: str) -> tuple:
+    from async_raydium import async_buy, async_sell
+    from engine import Engine
+
+    base = Engine(url)
+    started, results = time.perf_counter(), []
+    for wallet in wallets:
+        with base.with_payer(wallet).use():
+            results.append(await async_buy(pair_address, SOL_IN, SLIPPAGE))
+            results.append(await async_sell(pair_address, SELL_PERCENTAGE, SLIPPAGE))
+    elapsed = time.perf_counter() - started
+    await base.aclose()
+    return elapsed, results
+
+async def run_executor(wallets: list, urls: list, pair_address: str, max_concurrency: int) -> tuple:
+    from executor import TradeExecutor
+
+    started = time.perf_counter()
+    async with TradeExecutor(wallets, urls, max_concurrency) as executor:
+        results = await executor.run(trades(wallets, pair_address))
+    return time.perf_counter() - started, results
+
+def report(name: str, elapsed: float, results: list, nodes: list) -> None:
+    calls = sum(sum(node.calls.values()) for node in nodes)
+    requests = sum(node.requests for node in nodes)
+    print(
+        f"{name:<12} {elapsed:9.2f} {len(results) / elapsed:10.1f} {results.count(True):>4}/{len(results):<4} "
+        f"{calls / len(results):9.2f} {requests / len(results):9.2f}"
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark multi-wallet trading against local mock RPC nodes.")
+    parser.add_argument("--wallets", type=int, default=WALLETS)
+    parser.add_argument("--endpoints", type=int, default=ENDPOINTS)
+    parser.add_argument("--max-concurrency", type=int, default=MAX_CONCURRENCY, help="trades in flight per endpoint")
+    parser.add_argument("--latency", type=float, default=LATENCY, help="seconds per RPC round trip")
+    parser.add_argument("--confirm-delay", type=float, default=CONFIRM_DELAY)
+    parser.add_argument("--skip-sequential", action="store_true")
+    args = parser.parse_args()
+
+    install_config()
+    wallets = make_wallets(args.wallets)
+    print(
+        f"{args.wallets} wallets x (buy + sell), {args.endpoints} endpoint(s), {args.latency * 1000:.0f} ms RTT, "
+        f"confirmation after {args.confirm_delay * 1000:.0f} ms\n"
+    )
+    print(f"{'mode':<12} {'wall s':>9} {'trades/s':>10} {'ok':>9} {'rpc/trade':>9} {'http/trade':>9}")
+
+    if not args.skip_sequential:
+        nodes, pair_address = start_nodes(1, wallets, args.latency, args.confirm_delay)
+        elapsed, results = asyncio.run(run_sequential(wallets, nodes[0].url, pair_address))
+        report("sequential", elapsed, results, nodes)
+        for node in nodes:
+            node.stop()
+
+    nodes, pair_address = start_nodes(args.endpoints, wallets, args.latency, args.confirm_delay)
+    elapsed, results = asyncio.run(run_executor(wallets, [node.url for node in nodes], pair_address, args.max_concurrency))
+    report("executor", elapsed, results, nodes)
+    for node in nodes:
+        node.stop()
+
+if __name__ == "__main__":
+    main()
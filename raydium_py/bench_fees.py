@@ -0,0 +1,96 @@
+import argparse
+import statistics
+import time
+from solders.keypair import Keypair  # type: ignore
+from bench_pipeline import install_config, percentile
+from mock_rpc import MockRpcNode
+
+# What the compute budget costs and how fast trades land with the fixed budget from
+# config.py, a fixed budget with a cheap price, and the adaptive fee policy, against a local
+# MockRpcNode with a fee market: recent priority fees scatter around MARKET_FEE, and a
+# transaction priced below it lands UNDERPRICED_DELAY seconds later. Every mode runs the same
+# buys and 50% sells of one wallet (the mock charges compute per program, see mock_rpc.py).
+#
+#   python bench_fees.py                          # defaults below
+#   python bench_fees.py --market-fee 2000000
+
+ITERATIONS = 10
+LATENCY = 0.02  # seconds per RPC round trip
+CONFIRM_DELAY = 0.4  # seconds from send until a transaction reports confirmed
+MARKET_FEE = 200_000  # micro-lamports per compute unit
+UNDERPRICED_DELAY = 2.0
+UNIT_BUDGET = 100_000  # the config.py defaults
+UNIT_PRICE = 1_000_000
+CHEAP_UNIT_PRICE = 10_000
+SEED = 0
+SOL_IN = .01
+SLIPPAGE = 5
+SELL_PERCENTAGE = 50
+
+def run_mode(args, **engine_settings) -> tuple:
+    import raydium
+    from engine import Engine
+    from spl.token.instructions import get_associated_token_address
+
+    node = MockRpcNode(SEED, args.latency, 0.0, args.confirm_delay).start()
+    node.market_fee = args.market_fee
+    node.underpriced_delay = args.underpriced_delay
+    pool = node.add_pool()
+    payer = Keypair.from_seed(bytes([SEED % 256]) * 32)
+    node.add_token_account(get_associated_token_address(payer.pubkey(), pool.mint), pool.mint, payer.pubkey(), 10**12)
+    pair_address = str(pool.amm_id)
+
+    engine = Engine(node.url, payer, rebroadcast_interval=None, **engine_settings)
+    outcomes = []
+    with engine.use():
+        for _ in range(args.iterations):
+            for trade, amount in ((raydium.buy, SOL_IN), (raydium.sell, SELL_PERCENTAGE)):
+                started = time.perf_counter()
+                result = trade(pair_address, amount, SLIPPAGE)
+                outcomes.append((result, time.perf_counter() - started))
+    engine.close()
+    node.stop()
+    return outcomes, node
+
+def report(name: str, outcomes: list, node: MockRpcNode) -> None:
+    landed = [elapsed for result, elapsed in outcomes if result]
+    limits = [unit_limit for unit_limit, _, _ in node.budgets]
+    prices = [unit_price for _, unit_price, _ in node.budgets]
+    used = [units for _, _, units in node.budgets]
+    fees = [unit_limit * unit_price / 1e6 for unit_limit, unit_price, _ in node.budgets]
+    extra_calls = sum(node.calls.get(method, 0) for method in ("simulateTransaction", "getRecentPrioritizationFees", "getTransaction"))
+    print(
+        f"{name:<16} {len(landed):>4}/{len(outcomes):<4} {percentile(landed, 50) * 1000 if landed else 0:9.0f} "
+        f"{statistics.mean(limits):9.0f} {statistics.mean(used):9.0f} {statistics.mean(prices):11.0f} "
+        f"{statistics.mean(fees):12.0f} {extra_calls / len(outcomes):9.2f}"
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark fixed against adaptive compute budgets on a mock fee market.")
+    parser.add_argument("--iterations", type=int, default=ITERATIONS, help="buy + sell pairs per mode")
+    parser.add_argument("--latency", type=float, default=LATENCY, help="seconds per RPC round trip")
+    parser.add_argument("--confirm-delay", type=float, default=CONFIRM_DELAY)
+    parser.add_argument("--market-fee", type=int, default=MARKET_FEE, help="micro-lamports per compute unit")
+    parser.add_argument("--underpriced-delay", type=float, default=UNDERPRICED_DELAY)
+    args = parser.parse_args()
+
+    install_config()
+    print(
+        f"{args.iterations} x (buy + sell), market fee {args.market_fee:,} micro-lamports/CU, "
+        f"underpriced transactions land {args.underpriced_delay:.1f} s later\n"
+    )
+    print(
+        f"{'mode':<16} {'landed':>9} {'p50 ms':>9} {'CU limit':>9} {'CU used':>9} {'price':>11} "
+        f"{'prio lamports':>12} {'extra rpc':>9}"
+    )
+    modes = {
+        "fixed": dict(unit_budget=UNIT_BUDGET, unit_price=UNIT_PRICE),
+        "fixed, cheap": dict(unit_budget=UNIT_BUDGET, unit_price=CHEAP_UNIT_PRICE),
+        "adaptive": dict(unit_budget=UNIT_BUDGET, unit_price=UNIT_PRICE, adaptive_fees=True),
+    }
+    for name, settings in modes.items():
+        outcomes, node = run_mode(args, **settings)
+        report(name, outcomes, node)
+
+if __name__ == "__main__":
+    main()
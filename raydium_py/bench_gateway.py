@@ -0,0 +1,121 @@
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from solders.keypair import Keypair  # type: ignore
+from bench_pipeline import install_config, percentile
+from mock_rpc import MockRpcNode
+
+# Bursts of TRADERS threads that all start trading the same POOLS pools at once, against a
+# local MockRpcNode that answers HTTP 429 above RATE_LIMIT calls per second. Each trader does
+# what buy/sell do before building a transaction: fetch_pool_keys (cache emptied before each
+# burst), get_reserves and a fresh blockhash. Meanwhile a scanner thread keeps running
+# getProgramAccounts, like a pool discovery loop.
+#
+#   no gateway          calls go straight to the node; 429s fail the lookup
+#   gateway             singleflight and 429 retries, no rate limit of our own
+#   gateway + limit     the same with rate_limit set to the node's limit: throttled locally
+#                       instead of rejected, sends and confirmations ahead of the scanner
+#
+#   python bench_gateway.py                     # defaults below
+#   python bench_gateway.py --traders 50 --rate-limit 50
+
+TRADERS = 20
+POOLS = 4
+BURSTS = 10
+RATE_LIMIT = 100  # calls per second the node accepts
+LATENCY = 0.01  # seconds per RPC round trip
+SCAN_INTERVAL = 0.05  # seconds between the scanner's getProgramAccounts
+SEED = 0
+
+def trade_lookups(amm_id: str) -> tuple:
+    from engine import current_engine
+    from utils import fetch_pool_keys, get_reserves
+
+    started = time.perf_counter()
+    pool_keys = fetch_pool_keys(amm_id)
+    ok = pool_keys is not None and get_reserves(pool_keys) is not None
+    if ok:
+        try:
+            current_engine().client.get_latest_blockhash()
+        except Exception:
+            ok = False
+    return ok, time.perf_counter() - started
+
+def scan(engine, stop: threading.Event, counts: list) -> None:
+    from solana.rpc.types import MemcmpOpts
+    from constants import RAY_V4, WSOL
+
+    while not stop.is_set():
+        try:
+            engine.client.get_program_accounts(RAY_V4, filters=[MemcmpOpts(offset=432, bytes=str(WSOL))])
+            counts[0] += 1
+        except Exception:
+            counts[1] += 1
+        stop.wait(SCAN_INTERVAL)
+
+def run(node, engine, amm_ids: list, traders: int, bursts: int) -> tuple:
+    import utils
+
+    stop, scans = threading.Event(), [0, 0]
+    scanner = threading.Thread(target=scan, args=(engine, stop, scans))
+    results = []
+    with engine.use():
+        scanner.start()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(traders) as pool:
+            for _ in range(bursts):
+                utils.pool_keys_cache.clear()
+                jobs = [
+                    pool.submit(engine.use()(trade_lookups), amm_ids[i % len(amm_ids)]) for i in range(traders)
+                ]
+                results.extend(job.result() for job in jobs)
+        elapsed = time.perf_counter() - started
+        stop.set()
+        scanner.join()
+    return results, elapsed, scans
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the RPC gateway against a rate-limited mock RPC.")
+    parser.add_argument("--traders", type=int, default=TRADERS)
+    parser.add_argument("--pools", type=int, default=POOLS)
+    parser.add_argument("--bursts", type=int, default=BURSTS)
+    parser.add_argument("--rate-limit", type=float, default=RATE_LIMIT, help="calls per second the node accepts")
+    parser.add_argument("--latency", type=float, default=LATENCY, help="seconds per RPC round trip")
+    args = parser.parse_args()
+
+    install_config()
+    from engine import Engine
+
+    print(
+        f"{args.bursts} bursts of {args.traders} traders on {args.pools} pools, node limit {args.rate_limit:.0f} calls/s, "
+        f"{args.latency * 1000:.0f} ms RTT\n"
+    )
+    print(
+        f"{'mode':<16} {'ok':>9} {'total s':>8} {'p50 ms':>8} {'p99 ms':>8} {'node calls':>10} {'429s':>6} "
+        f"{'deduped':>8} {'throttled':>9} {'retried':>8} {'scans':>6}"
+    )
+    modes = {
+        "no gateway": dict(use_gateway=False),
+        "gateway": dict(use_gateway=True, rate_limit=None),
+        "gateway + limit": dict(use_gateway=True, rate_limit=args.rate_limit),
+    }
+    for name, settings in modes.items():
+        node = MockRpcNode(SEED, args.latency, rate_limit=args.rate_limit).start()
+        amm_ids = [str(node.add_pool().amm_id) for _ in range(args.pools)]
+        engine = Engine(node.url, Keypair(), batch_window=None, **settings)
+        time.sleep(1)  # let the node's allowance fill up
+        results, elapsed, scans = run(node, engine, amm_ids, args.traders, args.bursts)
+        latencies = [seconds for _, seconds in results]
+        stats = engine.gateway.stats() if engine.gateway is not None else {}
+        print(
+            f"{name:<16} {sum(ok for ok, _ in results):>4}/{len(results):<4} {elapsed:8.2f} "
+            f"{percentile(latencies, 50) * 1000:8.1f} {percentile(latencies, 99) * 1000:8.1f} "
+            f"{sum(node.calls.values()):>10} {node.rate_limited:>6} {stats.get('deduplicated', '-'):>8} "
+            f"{stats.get('throttled', '-'):>9} {stats.get('retried', '-'):>8} {scans[0]:>6}"
+        )
+        engine.close()
+        node.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+import argparse
+import json
+import pathlib
+import statistics
+import subprocess
+import sys
+import time
+
+# Startup cost of what a short-lived worker imports. Every case runs in a fresh interpreter
+# (after one discarded warm-up run, so bytecode caches are hot) and reports the median
+# import time measured inside the child, the median wall time of the whole process, and
+# which of the heavy third-party modules ended up loaded. The last case pays for the
+# first RPC client, which the engine only builds on first use.
+#
+#   python bench_imports.py
+#   python bench_imports.py --json after.json --baseline before.json
+#   python bench_imports.py --importtime raydium     # python -X importtime, slowest first
+
+REPEATS = 9
+TOLERANCE = 0.2  # allowed median slowdown against a baseline
+HEAVY_MODULES = ("numpy", "httpx", "requests", "solana.rpc.api", "solana.rpc.async_api", "websockets")
+
+CASES = {
+    "interpreter": "pass",
+    "import layouts": "import layouts",
+    "import fast_layouts": "import fast_layouts",
+    "import quote": "import quote",
+    "import engine": "import engine",
+    "import utils": "import utils",
+    "import raydium": "import raydium",
+    "import async_raydium": "import async_raydium",
+    "raydium + first client": "import raydium\nfrom engine import Engine\nEngine('http://127.0.0.1:8899').client",
+}
+
+PROBE = """
+import sys, time
+started = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - started
+print(elapsed, " ".join(name for name in {heavy!r} if name in sys.modules))
+"""
+
+def measure(statement: str, repeats: int) -> dict:
+    probe = PROBE.format(statement=statement, heavy=HEAVY_MODULES)
+    directory = pathlib.Path(__file__).parent
+    imports, walls, loaded = [], [], ""
+    for i in range(repeats + 1):
+        started = time.perf_counter()
+        output = subprocess.run(
+            [sys.executable, "-c", probe], cwd=directory, capture_output=True, text=True, check=True,
+        ).stdout.split(maxsplit=1)
+        wall = time.perf_counter() - started
+        if i:
+            imports.append(float(output[0]))
+            walls.append(wall)
+            loaded = output[1].strip() if len(output) > 1 else ""
+    return {
+        "import_ms": statistics.median(imports) * 1000,
+        "process_ms": statistics.median(walls) * 1000,
+        "heavy_modules": loaded,
+    }
+
+def importtime(module: str, top: int = 25) -> None:
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=pathlib.Path(__file__).parent, capture_output=True, text=True, check=True,
+    ).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if self_us.strip().isdigit():  # skip the header row
+            rows.append((int(cumulative_us), int(self_us), name.strip()))
+    print(f"{'cumulative ms':>13} {'self ms':>9}  module")
+    for cumulative_us, self_us, name in sorted(rows, reverse=True)[:top]:
+        print(f"{cumulative_us / 1000:13.1f} {self_us / 1000:9.1f}  {name}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark module import and worker startup time.")
+    parser.add_argument("--repeats", type=int, default=REPEATS)
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="compare against results written earlier with --json")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--importtime", metavar="MODULE", help="list the slowest imports under MODULE and exit")
+    args = parser.parse_args()
+
+    if args.importtime:
+        importtime(args.importtime)
+        return
+
+    baseline = json.loads(pathlib.Path(args.baseline).read_text()) if args.baseline else {}
+    results, regressions = {}, []
+    print(f"{'case':<24} {'import ms':>10} {'process ms':>11}  vs baseline  heavy modules loaded")
+    for case, statement in CASES.items():
+        stats = results[case] = measure(statement, args.repeats)
+        change = ""
+        reference = baseline.get(case)
+        if reference and reference["import_ms"] > 0:
+            ratio = stats["import_ms"] / reference["import_ms"] - 1
+            change = f"{ratio:+7.1%}"
+            if ratio > args.tolerance and stats["import_ms"] - reference["import_ms"] > 5:  # under 5 ms is noise
+                change += " REGRESSION"
+                regressions.append(case)
+        print(f"{case:<24} {stats['import_ms']:10.1f} {stats['process_ms']:11.1f}  {change:<11}  {stats['heavy_modules'] or '-'}")
+
+    if args.json:
+        pathlib.Path(args.json).write_text(json.dumps(results, indent=2))
+    if regressions:
+        print(f"\n{len(regressions)} case(s) slower than the baseline by more than {args.tolerance:.0%}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+import os
+import random
+import timeit
+from fast_layouts import (
+    ACCOUNT,
+    AMM_POOL_KEYS,
+    LIQUIDITY_STATE_V4,
+    MARKET_POOL_KEYS,
+    MARKET_STATE_V3,
+    OPEN_ORDERS,
+    TOKEN_ACCOUNT_AMOUNT,
+)
+from layouts import (
+    ACCOUNT_LAYOUT,
+    LIQUIDITY_STATE_LAYOUT_V4,
+    MARKET_STATE_LAYOUT_V3,
+    OPEN_ORDERS_LAYOUT,
+)
+
+# Microbenchmark: construct parsing vs the precompiled decoders in fast_layouts.py.
+# Run from this directory: python bench_layouts.py
+
+NUMBER = 20_000
+
+def random_account(fast_layout, layout) -> bytes:
+    data = bytearray(os.urandom(layout.sizeof()))
+    if "account_flags" in fast_layout.offsets:
+        # The flag bit-struct requires the 57 high bits to be zero.
+        offset = fast_layout.offsets["account_flags"]
+        data[offset:offset + 8] = bytes([random.randrange(128)]) + bytes(7)
+    return bytes(data)
+
+def check_compatible(fast_layout, layout, data: bytes) -> None:
+    expected = layout.parse(data)
+    decoded = fast_layout.parse(memoryview(data))
+    for name, value in decoded.items():
+        reference = expected[name]
+        if name == "account_flags":
+            reference = {k: v for k, v in reference.items() if not k.startswith("_")}
+        if value != reference:
+            raise AssertionError(f"{name}: {value!r} != {reference!r}")
+
+def bench(label: str, func) -> float:
+    seconds = min(timeit.repeat(func, number=NUMBER, repeat=3))
+    per_call = seconds / NUMBER * 1e6
+    print(f"{label:<48} {per_call:9.2f} us/op")
+    return per_call
+
+def main():
+    layouts = [
+        ("LIQUIDITY_STATE_LAYOUT_V4", LIQUIDITY_STATE_V4, LIQUIDITY_STATE_LAYOUT_V4, AMM_POOL_KEYS),
+        ("MARKET_STATE_LAYOUT_V3", MARKET_STATE_V3, MARKET_STATE_LAYOUT_V3, MARKET_POOL_KEYS),
+        ("OPEN_ORDERS_LAYOUT", OPEN_ORDERS, OPEN_ORDERS_LAYOUT, None),
+        ("ACCOUNT_LAYOUT", ACCOUNT, ACCOUNT_LAYOUT, TOKEN_ACCOUNT_AMOUNT),
+    ]
+
+    for name, fast_layout, layout, subset in layouts:
+        data = random_account(fast_layout, layout)
+        for _ in range(100):
+            check_compatible(fast_layout, layout, random_account(fast_layout, layout))
+
+        print(f"\n{name} ({layout.sizeof()} bytes, byte-for-byte compatible)")
+        baseline = bench("construct parse (all fields)", lambda: layout.parse(data))
+        fast = bench("fast unpack (all fields)", lambda: fast_layout.unpack(data))
+        if subset is not None:
+            subset_time = bench(f"fast unpack ({len(subset.names)} fields used)", lambda: subset.unpack(data))
+        else:
+            subset_time = fast
+        field = fast_layout.names[-1]
+        view = fast_layout.view(data)
+        bench(f"lazy view, one field ({field})", lambda: getattr(view, field))
+        print(f"{'speedup':<48} {baseline / fast:9.1f}x all fields, {baseline / subset_time:.1f}x used fields")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+import argparse
+import json
+import pathlib
+import re
+import sys
+import time
+import types
+from solders.keypair import Keypair  # type: ignore
+from solders.message import MessageV0  # type: ignore
+from solders.transaction import VersionedTransaction  # type: ignore
+import instrumentation
+from mock_rpc import MockRpcNode
+
+# End-to-end and per-phase latency of the buy/sell pipeline against a local MockRpcNode,
+# fully offline and seeded, so runs are comparable. For every phase it reports p50/p99
+# wall time, mean CPU time of the calling thread and RPC calls per iteration (background
+# threads, e.g. the blockhash refresher, are included in the call counts). The spans that
+# buy() and sell() record through instrumentation are listed after the phase table.
+#
+#   python bench_pipeline.py                          # defaults below
+#   python bench_pipeline.py --json after.json --baseline before.json
+#
+# With --baseline, phases whose p50 got slower than the tolerance allows are listed and
+# the script exits with status 1.
+
+ITERATIONS = 20
+LATENCY = 0.02  # seconds per RPC round trip
+JITTER = 0.005
+CONFIRM_DELAY = 0.4  # seconds from send until a transaction reports confirmed
+SEED = 0
+TOLERANCE = 0.2  # allowed p50 slowdown against a baseline
+SOL_IN = .01
+SLIPPAGE = 5
+SELL_PERCENTAGE = 50
+
+def install_config() -> None:
+    # The shared caches read their paths from config at import; keep them in memory.
+    source = pathlib.Path(__file__).with_name("config.py").read_text()
+    overrides = {
+        "POOL_KEYS_CACHE_PATH": "None",
+        "CLUSTER_CONSTANTS_PATH": "None",
+        "POOL_INDEX_PATH": "None",
+        "LOOKUP_TABLES_PATH": "None",
+    }
+    for name, value in overrides.items():
+        source = re.sub(rf"^{name} = .*$", f"{name} = {value}", source, count=1, flags=re.MULTILINE)
+    config = types.ModuleType("config")
+    exec(compile(source, "config.py", "exec"), config.__dict__)
+    sys.modules["config"] = config
+
+def percentile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(q / 100 * len(ordered) + 0.5) - 1))]
+
+class PhaseTimer:
+    def __init__(self, node: MockRpcNode):
+        self.node = node
+        self.samples = {}  # phase -> list of (wall, cpu, rpc calls)
+
+    def measure(self, phase: str, func, *args, **kwargs):
+        calls = sum(self.node.calls.values())
+        cpu, started = time.thread_time(), time.perf_counter()
+        result = func(*args, **kwargs)
+        wall, cpu = time.perf_counter() - started, time.thread_time() - cpu
+        self.samples.setdefault(phase, []).append((wall, cpu, sum(self.node.calls.values()) - calls))
+        return result
+
+    def summary(self) -> dict:
+        results = {}
+        for phase, samples in self.samples.items():
+            walls = [wall for wall, _, _ in samples]
+            results[phase] = {
+                "p50_ms": percentile(walls, 50) * 1000,
+                "p99_ms": percentile(walls, 99) * 1000,
+                "cpu_ms": sum(cpu for _, cpu, _ in samples) / len(samples) * 1000,
+                "rpc_calls": sum(calls for _, _, calls in samples) / len(samples),
+            }
+        return results
+
+def run(iterations: int, latency: float, jitter: float, confirm_delay: float, seed: int) -> tuple:
+    node = MockRpcNode(seed, latency, jitter, confirm_delay).start()
+    pool = node.add_pool()
+    payer = Keypair.from_seed(bytes([seed % 256]) * 32)
+    install_config()
+
+    import raydium
+    import utils
+    from engine import Engine, set_default_engine
+    from spl.token.instructions import get_associated_token_address
+
+    engine = Engine(node.url, payer)
+    set_default_engine(engine)
+
+    token_account = get_associated_token_address(payer.pubkey(), pool.mint)
+    node.add_token_account(token_account, pool.mint, payer.pubkey(), 10**12)
+    pair_address = str(pool.amm_id)
+    timer = PhaseTimer(node)
+
+    # Warm-up: imports, blockhash thread, wallet state, rent constant.
+    raydium.buy(pair_address, SOL_IN, SLIPPAGE)
+    node.reset_counters()
+    metrics = instrumentation.enable()
+
+    for i in range(iterations):
+        print(f"iteration {i + 1}/{iterations}", file=sys.stderr, end="\r")
+        pool_keys = timer.measure("fetch_pool_keys (cold)", utils.fetch_pool_keys, pair_address, use_cache=False)
+        timer.measure("fetch_pool_keys (cached)", utils.fetch_pool_keys, pair_address)
+        reserves = timer.measure("get_reserves", utils.get_reserves, pool_keys)
+        timer.measure("get_token_reserves (float)", utils.get_token_reserves, pool_keys)
+
+        amount_in = int(SOL_IN * 10**9)
+        minimum_amount_out = timer.measure(
+            "quote (calc_buy_minimum_out)", raydium.calc_buy_minimum_out, pool_keys, amount_in, SLIPPAGE, reserves
+        )
+        timer.measure("quote (calc_sell_minimum_out)", raydium.calc_sell_minimum_out, pool_keys, 10**9, SLIPPAGE, reserves)
+        existing = timer.measure("wallet_state.token_account", engine.wallet_state.token_account, engine.client, pool.mint)
+
+        balance_needed = engine.cluster_constants.rent_exempt_minimum(engine.client, 165)
+        instructions = timer.measure(
+            "make_buy_instructions", raydium.make_buy_instructions,
+            pool_keys, pool.mint, amount_in, minimum_amount_out, existing.address, balance_needed,
+        )
+        blockhash, last_valid_block_height = timer.measure("blockhash", engine.blockhash_provider.get_with_height)
+        transaction = timer.measure("compile + sign", lambda: VersionedTransaction(
+            MessageV0.try_compile(payer.pubkey(), instructions, [], blockhash), [payer]
+        ))
+        signature = timer.measure("send_transaction", lambda: engine.client.send_raw_transaction(bytes(transaction)).value)
+        timer.measure("confirm_txn", utils.confirm_txn, signature, last_valid_block_height=last_valid_block_height)
+
+        timer.measure("buy() end-to-end", raydium.buy, pair_address, SOL_IN, SLIPPAGE)
+        timer.measure("sell() end-to-end", raydium.sell, pair_address, SELL_PERCENTAGE, SLIPPAGE)
+
+    engine.close()
+    node.stop()
+    print(file=sys.stderr)
+    instrumentation.disable()
+    return timer.summary(), metrics.snapshot()
+
+def report(results: dict, baseline: dict, tolerance: float) -> list:
+    regressions = []
+    print(f"{'phase':<32} {'p50 ms':>9} {'p99 ms':>9} {'cpu ms':>9} {'rpc/iter':>9}  vs baseline")
+    for phase, stats in results.items():
+        line = f"{phase:<32} {stats['p50_ms']:9.2f} {stats['p99_ms']:9.2f} {stats['cpu_ms']:9.3f} {stats['rpc_calls']:9.2f}"
+        reference = baseline.get(phase)
+        if reference and reference["p50_ms"] > 0:
+            change = stats["p50_ms"] / reference["p50_ms"] - 1
+            line += f"  {change:+7.1%}"
+            if change > tolerance:
+                line += "  REGRESSION"
+                regressions.append(phase)
+        print(line)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the buy/sell pipeline against a local mock RPC node.")
+    parser.add_argument("--iterations", type=int, default=ITERATIONS)
+    parser.add_argument("--latency", type=float, default=LATENCY, help="seconds per RPC round trip")
+    parser.add_argument("--jitter", type=float, default=JITTER)
+    parser.add_argument("--confirm-delay", type=float, default=CONFIRM_DELAY)
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="compare against results written earlier with --json")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    args = parser.parse_args()
+
+    print(
+        f"{args.iterations} iterations, {args.latency * 1000:.0f} ms RTT (+0-{args.jitter * 1000:.0f} ms), "
+        f"confirmation after {args.confirm_delay * 1000:.0f} ms, seed {args.seed}\n"
+    )
+    results, spans = run(args.iterations, args.latency, args.jitter, args.confirm_delay, args.seed)
+    baseline = json.loads(pathlib.Path(args.baseline).read_text()) if args.baseline else {}
+    regressions = report(results, baseline, args.tolerance)
+
+    print(f"\n{'span inside buy()/sell()':<32} {'count':>9} {'~p50 ms':>9} {'~p99 ms':>9} {'rpc/span':>9}")
+    for name, stats in spans.items():
+        print(
+            f"{name:<32} {stats['count']:9d} {stats['p50_s'] * 1000:9.2f} {stats['p99_s'] * 1000:9.2f} "
+            f"{stats['rpc_calls'] / stats['count']:9.2f}"
+        )
+
+    if args.json:
+        pathlib.Path(args.json).write_text(json.dumps(results, indent=2))
+    if regressions:
+        print(f"\n{len(regressions)} phase(s) slower than the baseline by more than {args.tolerance:.0%}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
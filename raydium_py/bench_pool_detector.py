@@ -0,0 +1,101 @@
+import argparse
+import base64
+import json
+import time
+from solders.keypair import Keypair  # type: ignore
+from bench_pipeline import install_config, percentile
+from mock_rpc import MockRpcNode
+
+# Time from a new pool showing up to its PoolKeys being ready, for POOLS pools created on a
+# local MockRpcNode:
+#
+#   stream            PoolDetector.handle on the pool's programNotification, market cached
+#                     from the market subscription: one decode, no RPC
+#   stream + fetch    the same without the market notification: one getAccountInfo
+#   fetch_pool_keys   the pool address known some other way, then fetch_pool_keys: two
+#                     getAccountInfo round trips
+#
+# The stand-in stream is the JSON text the websocket would deliver, so json.loads and the
+# base64 decode are part of the detector's time.
+#
+#   python bench_pool_detector.py                  # defaults below
+#   python bench_pool_detector.py --latency 0.08
+
+POOLS = 200
+LATENCY = 0.02  # seconds per RPC round trip
+SEED = 0
+
+def notification(subscription: int, pubkey, data: bytes, slot: int) -> str:
+    return json.dumps({
+        "jsonrpc": "2.0",
+        "method": "programNotification",
+        "params": {"subscription": subscription, "result": {
+            "context": {"slot": slot},
+            "value": {"pubkey": str(pubkey), "account": {
+                "data": [base64.b64encode(data).decode(), "base64"], "executable": False,
+                "lamports": 6_124_800, "owner": "", "rentEpoch": 0, "space": len(data),
+            }},
+        }},
+    })
+
+def run_stream(pools: list, engine, with_markets: bool) -> list:
+    from pool_detector import PoolDetector
+
+    ready = {}
+    detector = PoolDetector("", lambda pool: ready.setdefault(str(pool.pool_keys.amm_id), time.perf_counter()), engine.client)
+    latencies = []
+    for slot, pool in enumerate(pools):
+        if with_markets:
+            detector.handle(json.loads(notification(2, pool.market, pool.market_data, slot)))
+        message = notification(1, pool.amm_id, pool.amm_data, slot)
+        started = time.perf_counter()
+        detector.handle(json.loads(message))
+        latencies.append(ready[str(pool.amm_id)] - started)
+    return latencies
+
+def run_fetch(pools: list, engine) -> list:
+    from utils import fetch_pool_keys
+
+    latencies = []
+    with engine.use():
+        for pool in pools:
+            started = time.perf_counter()
+            if fetch_pool_keys(str(pool.amm_id), use_cache=False) is None:
+                raise SystemExit(f"fetch_pool_keys failed for {pool.amm_id}")
+            latencies.append(time.perf_counter() - started)
+    return latencies
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark new-pool detection from a stream against fetching pool keys.")
+    parser.add_argument("--pools", type=int, default=POOLS)
+    parser.add_argument("--latency", type=float, default=LATENCY, help="seconds per RPC round trip")
+    args = parser.parse_args()
+
+    install_config()
+    from engine import Engine
+    import utils
+
+    node = MockRpcNode(SEED, args.latency).start()
+    pools = [node.add_pool() for _ in range(args.pools)]
+    engine = Engine(node.url, Keypair.from_seed(bytes([SEED % 256]) * 32))
+    print(f"{args.pools} new pools, {args.latency * 1000:.0f} ms RTT\n")
+    print(f"{'mode':<18} {'mean ms':>9} {'p50 ms':>9} {'p99 ms':>9} {'rpc/pool':>9}")
+    modes = {
+        "stream": lambda: run_stream(pools, engine, True),
+        "stream + fetch": lambda: run_stream(pools, engine, False),
+        "fetch_pool_keys": lambda: run_fetch(pools, engine),
+    }
+    for name, run in modes.items():
+        utils.pool_keys_cache.clear()
+        node.reset_counters()
+        latencies = run()
+        calls = sum(node.calls.values()) / len(pools)
+        print(
+            f"{name:<18} {sum(latencies) / len(latencies) * 1000:9.3f} {percentile(latencies, 50) * 1000:9.3f} "
+            f"{percentile(latencies, 99) * 1000:9.3f} {calls:9.1f}"
+        )
+    engine.close()
+    node.stop()
+
+if __name__ == "__main__":
+    main()
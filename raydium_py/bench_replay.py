@@ -0,0 +1,140 @@
+import argparse
+import hashlib
+import os
+import random
+import struct
+import tempfile
+import time
+from solders.pubkey import Pubkey  # type: ignore
+from constants import RAY_AUTHORITY_V4, WSOL
+from fast_layouts import ACCOUNT
+from mock_rpc import MockPool, token_account_data
+from quote import quote_base_in
+from replay import Replay
+from snapshots import SnapshotRecorder
+
+# Records a deterministic synthetic history of POOLS pools over SLOTS slots (every slot, a
+# seeded random share of the pools trades and both of its vaults change) into a snapshot
+# file, then replays it offline:
+#
+#   record   SnapshotRecorder.record per account update, and file bytes per update
+#   load     Replay(path): decode pool keys, gather every vault amount into reserve series
+#   batch    quote_buy over every series point for AMOUNTS trade sizes, through numpy
+#   scalar   quote_base_in per point, the same quotes one Python call at a time
+#   events   Replay.events(), every pool's updates merged in slot order
+#
+# The same seed gives the same file byte for byte and the same quote checksum, so a file
+# written by this script also serves as a fixture for comparing replay or quote changes.
+#
+#   python bench_replay.py                      # defaults below
+#   python bench_replay.py --slots 200000 --keep pools.snap
+
+POOLS = 50
+SLOTS = 20_000
+ACTIVE_SHARE = 0.3  # of the pools trading in each slot
+AMOUNTS = (10**6, 10**8, 10**9, 10**10)  # lamports in, per quote
+SCALAR_SAMPLE = 50_000
+SEED = 0
+AMOUNT_OFFSET = ACCOUNT.offsets["amount"]
+
+def generate(path: str, pools: int, slots: int, seed: int) -> tuple:
+    # Returns (updates recorded, seconds spent in the recorder, final reserves by amm id).
+    rng = random.Random(seed)
+    mock_pools = [MockPool(rng, rng.randrange(10**12, 10**15), rng.randrange(10**11, 10**13)) for _ in range(pools)]
+    templates = {}  # vault -> token account bytes, with the amount patched in per update
+    for pool in mock_pools:
+        templates[pool.base_vault] = bytearray(token_account_data(pool.mint, RAY_AUTHORITY_V4, 0))
+        templates[pool.quote_vault] = bytearray(token_account_data(WSOL, RAY_AUTHORITY_V4, 0))
+
+    def vault_data(vault: Pubkey, amount: int) -> bytes:
+        data = templates[vault]
+        struct.pack_into("<Q", data, AMOUNT_OFFSET, amount)
+        return bytes(data)
+
+    updates, elapsed = 0, 0.0
+    with SnapshotRecorder(path) as recorder:
+        started = time.perf_counter()
+        for pool in mock_pools:
+            recorder.record(pool.amm_id, 0, pool.amm_data)
+            recorder.record(pool.market, 0, pool.market_data)
+            recorder.record(pool.base_vault, 0, vault_data(pool.base_vault, pool.token_reserve))
+            recorder.record(pool.quote_vault, 0, vault_data(pool.quote_vault, pool.sol_reserve))
+        elapsed += time.perf_counter() - started
+        for slot in range(1, slots + 1):
+            rows = []
+            for pool in rng.sample(mock_pools, max(1, int(pools * ACTIVE_SHARE))):
+                # A trade of up to 1% of the pool either way, roughly keeping the product.
+                change = rng.uniform(-0.01, 0.01)
+                pool.sol_reserve = max(1, int(pool.sol_reserve * (1 + change)))
+                pool.token_reserve = max(1, int(pool.token_reserve / (1 + change)))
+                rows.append((pool.base_vault, slot, vault_data(pool.base_vault, pool.token_reserve)))
+                rows.append((pool.quote_vault, slot, vault_data(pool.quote_vault, pool.sol_reserve)))
+            started = time.perf_counter()
+            for vault, slot, data in rows:
+                recorder.record(vault, slot, data)
+            elapsed += time.perf_counter() - started
+            updates += len(rows)
+    final = {str(pool.amm_id): (pool.token_reserve, pool.sol_reserve) for pool in mock_pools}
+    return updates + 4 * pools, elapsed, final
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark snapshot recording and offline replay of pool reserves.")
+    parser.add_argument("--pools", type=int, default=POOLS)
+    parser.add_argument("--slots", type=int, default=SLOTS)
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--keep", help="write the snapshot file here instead of a temporary file")
+    args = parser.parse_args()
+
+    path = args.keep or os.path.join(tempfile.mkdtemp(), "bench.snap")
+    if os.path.exists(path):
+        os.remove(path)
+    updates, elapsed, final = generate(path, args.pools, args.slots, args.seed)
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()[:16]
+    print(f"{args.pools} pools, {args.slots} slots, {updates} account updates, seed {args.seed}, file sha256 {digest}\n")
+    print(f"record   {updates / elapsed:14,.0f} updates/s  {size / updates:6.1f} bytes/update ({size / 2**20:.1f} MiB)")
+
+    started = time.perf_counter()
+    replay = Replay(path)
+    elapsed = time.perf_counter() - started
+    print(f"load     {replay.rows / elapsed:14,.0f} updates/s  {len(replay.pools)} pools")
+    for amm_id, (token_reserve, sol_reserve) in final.items():
+        last = replay.series(amm_id)
+        if (int(last.base[-1]), int(last.quote[-1])) != (token_reserve, sol_reserve):
+            raise SystemExit(f"final reserves of {amm_id} do not match the recording")
+
+    amounts = [[amount] for amount in AMOUNTS]
+    started = time.perf_counter()
+    results = {amm_id: replay.quote_buy(amm_id, amounts) for amm_id in replay.pools}
+    elapsed = time.perf_counter() - started
+    quotes = sum(result.size for result in results.values())
+    checksum = sum(int(result.sum(dtype="uint64")) for result in results.values()) % 2**64
+    print(f"batch    {quotes / elapsed:14,.0f} quotes/s   {quotes} quotes, checksum {checksum:016x}")
+
+    points = [
+        (amm_id, i, j) for amm_id, result in results.items() for i in range(len(AMOUNTS)) for j in range(result.shape[1])
+    ]
+    sample = random.Random(args.seed).sample(points, min(SCALAR_SAMPLE, len(points)))
+    started = time.perf_counter()
+    for amm_id, i, j in sample:
+        pool_keys, series = replay.pools[amm_id], replay.series(amm_id)
+        expected = quote_base_in(
+            AMOUNTS[i], int(series.quote[j]), int(series.base[j]), pool_keys.swap_fee_numerator, pool_keys.swap_fee_denominator,
+        )
+        if expected != int(results[amm_id][i, j]):
+            raise SystemExit(f"batch quote differs from quote_base_in for {amm_id} at {j}")
+    elapsed = time.perf_counter() - started
+    print(f"scalar   {len(sample) / elapsed:14,.0f} quotes/s   {len(sample)} quotes, all equal to batch")
+
+    started = time.perf_counter()
+    events = sum(1 for _ in replay.events())
+    elapsed = time.perf_counter() - started
+    print(f"events   {events / elapsed:14,.0f} events/s   {events} events")
+
+    if not args.keep:
+        os.remove(path)
+        os.rmdir(os.path.dirname(path))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+import argparse
+import multiprocessing
+import threading
+import time
+from solders.keypair import Keypair  # type: ignore
+from bench_pipeline import install_config
+from mock_rpc import MockRpcNode
+
+# WORKERS processes each look up pool keys and reserves for the same POOLS pools ROUNDS
+# times, the way buy/sell do, against a local MockRpcNode:
+#
+#   rpc           every worker fetches for itself: pool keys once per pool (then from its
+#                 own cache), reserves on every lookup
+#   shared table  this process feeds a SharedPoolTable (run_feeder, polling every INTERVAL
+#                 seconds) and the workers read it through SHARED_POOL_TABLE
+#
+# Then a seqlock check: one writer thread rewrites every record as fast as it can with base,
+# quote and slot all equal, while reader processes use get() and reserve_arrays() and count
+# records that come back mixed.
+#
+#   python bench_shared_tables.py                   # defaults below
+#   python bench_shared_tables.py --workers 8 --rounds 50
+
+WORKERS = 4
+POOLS = 50
+ROUNDS = 20
+LATENCY = 0.002  # seconds per RPC round trip
+INTERVAL = 0.4  # seconds between feeder polls
+CHECK_SECONDS = 2.0
+SEED = 0
+TABLE_NAME = "raydium_bench_pools"
+
+def lookup_worker(url: str, table_name, amm_ids: list, rounds: int, results) -> None:
+    install_config()
+    import config
+    config.SHARED_POOL_TABLE = table_name
+    from engine import Engine
+    from utils import fetch_pool_keys, get_reserves
+
+    engine = Engine(url, Keypair())
+    failed = 0
+    with engine.use():
+        started = time.perf_counter()
+        for _ in range(rounds):
+            for amm_id in amm_ids:
+                pool_keys = fetch_pool_keys(amm_id)
+                if pool_keys is None or get_reserves(pool_keys) is None:
+                    failed += 1
+        elapsed = time.perf_counter() - started
+    engine.close()
+    results.put((elapsed, rounds * len(amm_ids), failed))
+
+def check_worker(table_name: str, amm_ids: list, seconds: float, results) -> None:
+    from shared_tables import SharedPoolTable
+
+    reads = torn = 0
+    with SharedPoolTable(table_name) as table:
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            for amm_id in amm_ids:
+                reserves = table.get(amm_id)
+                reads += 1
+                if reserves is None or not reserves.base == reserves.quote == reserves.slot:
+                    torn += 1
+            base, quote, slot = table.reserve_arrays(amm_ids)
+            reads += len(amm_ids)
+            torn += int(((base != quote) | (quote != slot)).sum())
+    results.put((reads, torn))
+
+def run_workers(context, target, count: int, *args) -> list:
+    results = context.Queue()
+    processes = [context.Process(target=target, args=(*args, results)) for _ in range(count)]
+    for process in processes:
+        process.start()
+    collected = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    return collected
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-process RPC lookups against a shared-memory pool table.")
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--pools", type=int, default=POOLS)
+    parser.add_argument("--rounds", type=int, default=ROUNDS)
+    parser.add_argument("--latency", type=float, default=LATENCY, help="seconds per RPC round trip")
+    args = parser.parse_args()
+
+    install_config()
+    from engine import Engine
+    from reserves import Reserves
+    from shared_tables import SharedPoolTable, run_feeder
+    from utils import fetch_pool_keys
+
+    context = multiprocessing.get_context("spawn")
+    node = MockRpcNode(SEED, args.latency).start()
+    amm_ids = [str(node.add_pool().amm_id) for _ in range(args.pools)]
+    print(f"{args.workers} workers x {args.rounds} rounds x {args.pools} pools, {args.latency * 1000:.0f} ms RTT\n")
+    print(f"{'mode':<14} {'lookups/s':>12} {'us/lookup':>10} {'rpc calls':>10} {'failed':>7}")
+
+    for name in ("rpc", "shared table"):
+        stop = threading.Event()
+        table = feeder = None
+        if name == "shared table":
+            table = SharedPoolTable(TABLE_NAME, create=True)
+            engine = Engine(node.url, Keypair())
+            with engine.use():
+                for amm_id in amm_ids:
+                    table.put_pool_keys(fetch_pool_keys(amm_id))
+            feeder = threading.Thread(target=run_feeder, args=(table, engine.client), kwargs=dict(interval=INTERVAL, stop=stop))
+            feeder.start()
+        node.reset_counters()
+        started = time.perf_counter()
+        results = run_workers(
+            context, lookup_worker, args.workers, node.url, TABLE_NAME if table else None, amm_ids, args.rounds,
+        )
+        elapsed = time.perf_counter() - started
+        calls = sum(node.calls.values())
+        stop.set()
+        if feeder is not None:
+            feeder.join()
+            engine.close()
+            table.close()
+        lookups = sum(count for _, count, _ in results)
+        per_lookup = sum(seconds for seconds, _, _ in results) / lookups
+        print(
+            f"{name:<14} {lookups / elapsed:12,.0f} {per_lookup * 1e6:10.1f} {calls:10} "
+            f"{sum(failed for _, _, failed in results):7}"
+        )
+
+    table = SharedPoolTable(TABLE_NAME, create=True)
+    engine = Engine(node.url, Keypair())
+    with engine.use():
+        for amm_id in amm_ids:
+            table.put_pool_keys(fetch_pool_keys(amm_id))
+    for i, amm_id in enumerate(amm_ids):
+        table.put_reserves(amm_id, Reserves(1, 1, 1))
+    stop = threading.Event()
+    writes = [0]
+
+    def write() -> None:
+        value = 1
+        while not stop.is_set():
+            value += 1
+            for amm_id in amm_ids:
+                table.put_reserves(amm_id, Reserves(value, value, value))
+            writes[0] += len(amm_ids)
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    results = run_workers(context, check_worker, args.workers, TABLE_NAME, amm_ids, CHECK_SECONDS)
+    stop.set()
+    writer.join()
+    table.close()
+    engine.close()
+    node.stop()
+    reads, torn = sum(r for r, _ in results), sum(t for _, t in results)
+    print(f"\nseqlock check: {writes[0]:,} writes, {reads:,} reads in {args.workers} processes, {torn} torn")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import os
+import random
+import timeit
+from solders.compute_budget import set_compute_unit_limit, set_compute_unit_price  # type: ignore
+from solders.hash import Hash  # type: ignore
+from solders.keypair import Keypair  # type: ignore
+from solders.message import MessageV0  # type: ignore
+from solders.pubkey import Pubkey  # type: ignore
+from solders.transaction import VersionedTransaction  # type: ignore
+from pool_keys import PoolKeys
+from swap_templates import SwapTemplate
+from utils import make_swap_instruction
+
+# Build+sign time per trade: make_swap_instruction + MessageV0.try_compile + VersionedTransaction
+# (the current path) vs patching a precompiled SwapTemplate. Needs no RPC, but imports the
+# repo's utils, so config.py must hold a valid private key: python bench_swap_templates.py
+
+NUMBER = 2_000
+UNIT_LIMIT = 100_000
+UNIT_PRICE = 1_000_000
+
+def random_pool_keys() -> PoolKeys:
+    pubkeys = {name: Pubkey(os.urandom(32)) for name in (
+        "amm_id", "base_mint", "quote_mint", "open_orders", "target_orders", "base_vault", "quote_vault",
+        "market_id", "market_authority", "market_base_vault", "market_quote_vault", "bids", "asks", "event_queue",
+    )}
+    return PoolKeys(base_decimals=6, quote_decimals=9, **pubkeys)
+
+def compiled_path(payer, pool_keys, token_account_in, token_account_out, amount_in, minimum_amount_out, blockhash) -> bytes:
+    instructions = [
+        set_compute_unit_limit(UNIT_LIMIT),
+        set_compute_unit_price(UNIT_PRICE),
+        make_swap_instruction(amount_in, minimum_amount_out, token_account_in, token_account_out, pool_keys, payer),
+    ]
+    message = MessageV0.try_compile(payer.pubkey(), instructions, [], blockhash)
+    return bytes(VersionedTransaction(message, [payer]))
+
+def main():
+    payer = Keypair()
+    pool_keys = random_pool_keys()
+    token_account_in, token_account_out = Pubkey(os.urandom(32)), Pubkey(os.urandom(32))
+    template = SwapTemplate(payer, pool_keys, token_account_in, token_account_out, make_swap_instruction)
+
+    for _ in range(200):
+        amount_in, minimum_amount_out = random.randrange(2**64), random.randrange(2**64)
+        blockhash = Hash(os.urandom(32))
+        expected = compiled_path(payer, pool_keys, token_account_in, token_account_out, amount_in, minimum_amount_out, blockhash)
+        patched = template.render(amount_in, minimum_amount_out, blockhash, UNIT_LIMIT, UNIT_PRICE)
+        if patched != expected:
+            raise AssertionError("Template output differs from the compiled transaction")
+    print(f"Template output byte-for-byte identical to the compiled path ({len(expected)} bytes)\n")
+
+    blockhash = Hash(os.urandom(32))
+    results = {}
+    for label, func in (
+        ("compile + sign (current path)", lambda: compiled_path(
+            payer, pool_keys, token_account_in, token_account_out, 1_000_000, 900_000, blockhash
+        )),
+        ("template patch + sign", lambda: template.render(1_000_000, 900_000, blockhash, UNIT_LIMIT, UNIT_PRICE)),
+        ("template build (once per wallet/pool/direction)", lambda: SwapTemplate(
+            payer, pool_keys, token_account_in, token_account_out, make_swap_instruction
+        )),
+    ):
+        seconds = min(timeit.repeat(func, number=NUMBER, repeat=3))
+        results[label] = seconds / NUMBER * 1e6
+        print(f"{label:<50} {results[label]:9.2f} us/trade")
+
+    speedup = results["compile + sign (current path)"] / results["template patch + sign"]
+    print(f"{'speedup':<50} {speedup:9.1f}x")
+
+if __name__ == "__main__":
+    main()
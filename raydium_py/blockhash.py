@@ -0,0 +1,118 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Optional
+from solders.hash import Hash  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+class BlockhashProvider:
+    def __init__(self, client, refresh_interval: float = 2.0, max_age: float = 30.0):
+        self.client = client
+        self.refresh_interval = refresh_interval
+        self.max_age = max_age
+        self.cached_hits = 0
+        self.sync_fetches = 0
+        self._latest = None  # (blockhash, last_valid_block_height, fetched_at)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="blockhash-provider", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def refresh(self) -> tuple:
+        resp = self.client.get_latest_blockhash()
+        latest = (resp.value.blockhash, resp.value.last_valid_block_height, time.monotonic())
+        self._latest = latest
+        return latest
+
+    def get(self) -> Hash:
+        return self.get_with_height()[0]
+
+    def get_with_height(self) -> tuple:
+        if self._thread is None:
+            self.start()
+
+        latest = self._latest
+        if latest is not None and time.monotonic() - latest[2] <= self.max_age:
+            self.cached_hits += 1
+            return latest[0], latest[1]
+
+        # Background refresh is behind (or has not run yet); fetch on the caller's thread.
+        self.sync_fetches += 1
+        latest = self.refresh()
+        return latest[0], latest[1]
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.warning("Error refreshing blockhash: %s", e)
+            self._stop.wait(self.refresh_interval)
+
+class AsyncBlockhashProvider:
+    def __init__(self, client, refresh_interval: float = 2.0, max_age: float = 30.0):
+        self.client = client
+        self.refresh_interval = refresh_interval
+        self.max_age = max_age
+        self.cached_hits = 0
+        self.sync_fetches = 0
+        self._latest = None  # (blockhash, last_valid_block_height, fetched_at)
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def refresh(self) -> tuple:
+        resp = await self.client.get_latest_blockhash()
+        latest = (resp.value.blockhash, resp.value.last_valid_block_height, time.monotonic())
+        self._latest = latest
+        return latest
+
+    async def get(self) -> Hash:
+        return (await self.get_with_height())[0]
+
+    async def get_with_height(self) -> tuple:
+        if self._task is None or self._task.done():
+            self.start()
+
+        latest = self._latest
+        if latest is not None and time.monotonic() - latest[2] <= self.max_age:
+            self.cached_hits += 1
+            return latest[0], latest[1]
+
+        self.sync_fetches += 1
+        latest = await self.refresh()
+        return latest[0], latest[1]
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.warning("Error refreshing blockhash: %s", e)
+            await asyncio.sleep(self.refresh_interval)
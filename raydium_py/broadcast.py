@@ -0,0 +1,361 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Optional
+from solana.rpc.types import TxOpts
+from solders.signature import Signature  # type: ignore
+from instrumentation import Histogram
+
+logger = logging.getLogger(__name__)
+
+# Sends each signed transaction to every configured RPC endpoint at once, then re-sends it
+# every interval seconds until the caller reports how it ended (finish()), so a transaction
+# dropped on one endpoint's path to the leader still lands through another endpoint or on a
+# later attempt instead of waiting out its blockhash. While rebroadcasting, endpoints are
+# asked not to retry on their own (max_retries=0): the schedule replaces it. With interval
+# None the endpoints keep their own retries, as a plain send would. send() returns as soon as
+# the first endpoint accepts the transaction; the other sends finish in the background.
+#
+# Per-endpoint stats: the round trip of every send (ack), errors, and the landing latency
+# of transactions that endpoint alone carried. With one endpoint that is every transaction.
+# With several, nothing can tell which endpoint a fanned-out transaction landed through, so
+# a probe_rate share of transactions goes to a single endpoint (round robin) for its first
+# probe_sends sends and fans out from there; a probe that has not landed by then is a miss
+# for that endpoint. ranked() orders the endpoints by miss rate, then median landing
+# latency; drop() and prune() remove the bad ones (never the last one).
+
+SEND_OPTS = TxOpts(skip_preflight=True)
+REBROADCAST_SEND_OPTS = TxOpts(skip_preflight=True, max_retries=0)
+MAX_AGE = 90.0  # seconds a transaction nobody finished keeps being rebroadcast
+
+@dataclass
+class EndpointStats:
+    endpoint: str
+    sends: int = 0
+    errors: int = 0
+    landed: int = 0
+    missed: int = 0
+    ack: Histogram = field(default_factory=Histogram)
+    landing: Histogram = field(default_factory=Histogram)
+
+    @property
+    def miss_rate(self) -> float:
+        outcomes = self.landed + self.missed
+        return self.missed / outcomes if outcomes else 0.0
+
+    def snapshot(self) -> dict:
+        return {
+            "endpoint": self.endpoint,
+            "sends": self.sends,
+            "errors": self.errors,
+            "landed": self.landed,
+            "missed": self.missed,
+            "miss_rate": self.miss_rate,
+            "ack_p50_s": self.ack.percentile(50),
+            "landing_p50_s": self.landing.percentile(50),
+            "landing_p90_s": self.landing.percentile(90),
+        }
+
+class _Broadcast:
+    __slots__ = ("signature", "raw", "sent_at", "next_send", "sends", "accepted", "probe")
+
+    def __init__(self, signature: Signature, raw: bytes, probe: Optional[str]):
+        self.signature = signature
+        self.raw = raw
+        self.sent_at = time.monotonic()
+        self.next_send = float("inf")
+        self.sends = 1
+        self.accepted = set()  # endpoints that acknowledged a send
+        self.probe = probe  # the only endpoint sent to while probing, or None
+
+class _BroadcasterBase:
+    def __init__(
+        self,
+        clients: dict,
+        interval: Optional[float] = 2.0,
+        probe_rate: float = 0.0,
+        probe_sends: int = 3,
+        max_age: float = MAX_AGE,
+    ):
+        # clients maps endpoint url -> client; interval None sends once and never rebroadcasts.
+        if not clients:
+            raise ValueError("Broadcaster needs at least one endpoint")
+        self.clients = dict(clients)
+        self.interval = interval
+        self.probe_rate = probe_rate
+        self.probe_sends = probe_sends
+        self.max_age = max_age
+        self.stats = {endpoint: EndpointStats(endpoint) for endpoint in self.clients}
+        self.rebroadcasts = 0
+        self._pending = {}  # str(signature) -> _Broadcast
+        self._rng = random.Random()
+        self._probe_turn = 0
+
+    @property
+    def endpoints(self) -> list:
+        return list(self.clients)
+
+    @property
+    def send_opts(self) -> TxOpts:
+        return REBROADCAST_SEND_OPTS if self.interval else SEND_OPTS
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def ranked(self) -> list:
+        # Best first: fewest misses, then fastest median landing, then fastest ack.
+        return sorted(
+            self.stats.values(),
+            key=lambda stats: (
+                round(stats.miss_rate, 2),
+                stats.landing.percentile(50) if stats.landing.count else float("inf"),
+                stats.ack.percentile(50) if stats.ack.count else float("inf"),
+            ),
+        )
+
+    def drop(self, endpoint: str) -> bool:
+        if endpoint not in self.clients or len(self.clients) == 1:
+            return False
+        del self.clients[endpoint]
+        logger.info("Dropped broadcast endpoint %s", endpoint)
+        return True
+
+    def prune(self, max_miss_rate: float = 0.5, max_landing: Optional[float] = None, min_samples: int = 10) -> list:
+        # Drops endpoints with at least min_samples outcomes that miss too often or land too slowly.
+        dropped = []
+        for stats in reversed(self.ranked()):
+            if stats.endpoint not in self.clients or stats.landed + stats.missed < min_samples:
+                continue
+            too_slow = max_landing is not None and stats.landing.count and stats.landing.percentile(50) > max_landing
+            if (stats.miss_rate > max_miss_rate or too_slow) and self.drop(stats.endpoint):
+                dropped.append(stats.endpoint)
+        return dropped
+
+    def _new(self, raw: bytes) -> _Broadcast:
+        # A serialized transaction starts with its signature count (one byte below 128), then
+        # the fee payer's signature, which is the transaction id.
+        probe = None
+        endpoints = self.endpoints
+        if len(endpoints) > 1 and self.interval and self._rng.random() < self.probe_rate:
+            probe = endpoints[self._probe_turn % len(endpoints)]
+            self._probe_turn += 1
+        item = _Broadcast(Signature.from_bytes(raw[1:65]), raw, probe)
+        if self.interval:
+            item.next_send = item.sent_at + self.interval
+        self._pending[str(item.signature)] = item
+        return item
+
+    def _targets(self, item: _Broadcast) -> list:
+        return [item.probe] if item.probe is not None else self.endpoints
+
+    def _sent(self, endpoint: str, item: _Broadcast, elapsed: float, error: Optional[Exception]) -> None:
+        stats = self.stats[endpoint]
+        stats.sends += 1
+        if error is not None:
+            stats.errors += 1
+            logger.debug("Error sending %s to %s: %s", item.signature, endpoint, error)
+            return
+        stats.ack.record(elapsed)
+        item.accepted.add(endpoint)
+
+    def _miss_probe(self, item: _Broadcast) -> None:
+        if item.probe is not None:
+            self.stats[item.probe].missed += 1
+            item.probe = None
+
+    def _due(self, now: float) -> tuple:
+        # Returns the broadcasts to re-send now and when the next one is due (None = none pending).
+        due, next_send = [], None
+        for key, item in list(self._pending.items()):
+            if now - item.sent_at > self.max_age:
+                del self._pending[key]
+                continue
+            if item.next_send <= now:
+                if item.sends >= self.probe_sends:
+                    self._miss_probe(item)
+                item.sends += 1
+                item.next_send = now + self.interval
+                self.rebroadcasts += 1
+                due.append(item)
+            next_send = item.next_send if next_send is None else min(next_send, item.next_send)
+        return due, next_send
+
+    def _finish(self, signature: Signature, confirmed: Optional[bool]) -> None:
+        # confirmed: True or False (landed, with or without an error), None (expired or unknown).
+        item = self._pending.pop(str(signature), None)
+        if item is None or len(item.accepted) != 1:
+            return
+        (endpoint,) = item.accepted
+        stats = self.stats.get(endpoint)
+        if stats is None:
+            return
+        if confirmed is None:
+            stats.missed += 1
+        else:
+            stats.landed += 1
+            stats.landing.record(time.monotonic() - item.sent_at)
+
+class Broadcaster(_BroadcasterBase):
+    def __init__(self, clients: dict, *args, **kwargs):
+        super().__init__(clients, *args, **kwargs)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._executor = ThreadPoolExecutor(max_workers=4 * len(self.clients), thread_name_prefix="broadcast")
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="broadcaster", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def send(self, raw: bytes) -> Signature:
+        # Returns once one endpoint accepted the transaction; raises if every endpoint refused it.
+        with self._lock:
+            item = self._new(raw)
+        error = self._send_first(item, self._targets(item))
+        if error is not None and item.probe is not None:
+            with self._lock:
+                self._miss_probe(item)
+            error = self._send_first(item, self.endpoints)
+        if error is not None:
+            with self._lock:
+                self._pending.pop(str(item.signature), None)
+            raise error
+        if self.interval:
+            if self._thread is None:
+                self.start()
+            self._wake.set()
+        return item.signature
+
+    def finish(self, signature: Signature, confirmed: Optional[bool]) -> None:
+        with self._lock:
+            self._finish(signature, confirmed)
+
+    def _send_first(self, item: _Broadcast, targets: list) -> Optional[Exception]:
+        error = None
+        for future in as_completed([self._executor.submit(self._send_to, endpoint, item) for endpoint in targets]):
+            error = future.result()
+            if error is None:
+                return None
+        return error
+
+    def _send_to(self, endpoint: str, item: _Broadcast) -> Optional[Exception]:
+        client = self.clients.get(endpoint)
+        if client is None:
+            return ValueError(f"Endpoint was dropped: {endpoint}")
+        started = time.monotonic()
+        try:
+            client.send_raw_transaction(item.raw, self.send_opts)
+            error = None
+        except Exception as e:
+            error = e
+        with self._lock:
+            self._sent(endpoint, item, time.monotonic() - started, error)
+        return error
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            with self._lock:
+                due, next_send = self._due(time.monotonic())
+            for item in due:
+                for endpoint in self._targets(item):
+                    self._executor.submit(self._send_to, endpoint, item)
+            self._wake.clear()
+            self._wake.wait(None if next_send is None else max(next_send - time.monotonic(), 0.0))
+
+class AsyncBroadcaster(_BroadcasterBase):
+    def __init__(self, clients: dict, *args, **kwargs):
+        super().__init__(clients, *args, **kwargs)
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._sends = set()  # background send tasks, referenced until they finish
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._wake = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._sends:
+            await asyncio.gather(*self._sends, return_exceptions=True)
+
+    async def send(self, raw: bytes) -> Signature:
+        item = self._new(raw)
+        error = await self._send_first(item, self._targets(item))
+        if error is not None and item.probe is not None:
+            self._miss_probe(item)
+            error = await self._send_first(item, self.endpoints)
+        if error is not None:
+            self._pending.pop(str(item.signature), None)
+            raise error
+        if self.interval:
+            self.start()
+            self._wake.set()
+        return item.signature
+
+    def finish(self, signature: Signature, confirmed: Optional[bool]) -> None:
+        self._finish(signature, confirmed)
+
+    async def _send_first(self, item: _Broadcast, targets: list) -> Optional[Exception]:
+        sends = [self._spawn(endpoint, item) for endpoint in targets]
+        error = None
+        for next_done in asyncio.as_completed(sends):
+            error = await next_done
+            if error is None:
+                return None
+        return error
+
+    def _spawn(self, endpoint: str, item: _Broadcast) -> asyncio.Task:
+        task = asyncio.get_running_loop().create_task(self._send_to(endpoint, item))
+        self._sends.add(task)
+        task.add_done_callback(self._sends.discard)
+        return task
+
+    async def _send_to(self, endpoint: str, item: _Broadcast) -> Optional[Exception]:
+        client = self.clients.get(endpoint)
+        if client is None:
+            return ValueError(f"Endpoint was dropped: {endpoint}")
+        started = time.monotonic()
+        try:
+            await client.send_raw_transaction(item.raw, self.send_opts)
+            error = None
+        except Exception as e:
+            error = e
+        self._sent(endpoint, item, time.monotonic() - started, error)
+        return error
+
+    async def _run(self) -> None:
+        while True:
+            due, next_send = self._due(time.monotonic())
+            for item in due:
+                for endpoint in self._targets(item):
+                    self._spawn(endpoint, item)
+            self._wake.clear()
+            timeout = None if next_send is None else max(next_send - time.monotonic(), 0.0)
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
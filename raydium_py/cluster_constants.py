@@ -0,0 +1,97 @@
+import json
+import logging
+import os
+import threading
+from typing import Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Values that only depend on cluster parameters (rent, etc.) are resolved once per
+# process and optionally persisted per cluster, so swaps never pay an RPC for them.
+
+class ClusterConstants:
+    def __init__(self, cluster: str, path: Optional[str] = None):
+        self.cluster = cluster
+        self.path = path
+        self.resolved_calls = 0
+        self.saved_calls = 0
+        self._values = {}
+        self._lock = threading.Lock()
+        if path:
+            self.load()
+
+    def get(self, name: str, resolve: Callable[[], int]) -> int:
+        value = self._values.get(name)
+        if value is not None:
+            self.saved_calls += 1
+            return value
+
+        value = resolve()
+        self._store(name, value)
+        return value
+
+    async def get_async(self, name: str, resolve: Callable[[], Awaitable[int]]) -> int:
+        value = self._values.get(name)
+        if value is not None:
+            self.saved_calls += 1
+            return value
+
+        value = await resolve()
+        self._store(name, value)
+        return value
+
+    def rent_exempt_minimum(self, client, size: int) -> int:
+        return self.get(
+            f"rent_exempt_minimum:{size}",
+            lambda: client.get_minimum_balance_for_rent_exemption(size).value,
+        )
+
+    async def async_rent_exempt_minimum(self, async_client, size: int) -> int:
+        async def resolve() -> int:
+            return (await async_client.get_minimum_balance_for_rent_exemption(size)).value
+
+        return await self.get_async(f"rent_exempt_minimum:{size}", resolve)
+
+    def invalidate(self, name: Optional[str] = None) -> None:
+        with self._lock:
+            if name is None:
+                self._values.clear()
+            else:
+                self._values.pop(name, None)
+            self._save()
+
+    def load(self) -> None:
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning("Error reading cluster constants: %s", e)
+            return
+        with self._lock:
+            self._values.update(data.get(self.cluster, {}))
+
+    def _store(self, name: str, value: int) -> None:
+        with self._lock:
+            self.resolved_calls += 1
+            self._values[name] = value
+            self._save()
+
+    def _save(self) -> None:
+        if not self.path:
+            return
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        data[self.cluster] = dict(self._values)
+
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(data, f, indent=4)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning("Error writing cluster constants: %s", e)
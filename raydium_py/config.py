@@ -1,9 +1,39 @@
-from solana.rpc.api import Client
-from solders.keypair import Keypair #type: ignore
-
 PRIV_KEY = "base58_priv_str_here"
 RPC = "rpc_url_here"
+WS_RPC = "ws_url_here"  # websocket endpoint, only used by ReserveStream and PoolDetector
 UNIT_BUDGET =  100_000
 UNIT_PRICE =  1_000_000
-client = Client(RPC)
-payer_keypair = Keypair.from_base58_string(PRIV_KEY)
\ No newline at end of file
+POOL_KEYS_CACHE_SIZE = 10_000
+POOL_KEYS_CACHE_TTL = None  # seconds, None = never expire
+POOL_KEYS_CACHE_PATH = "pool_keys.bin"  # None = memory only
+BLOCKHASH_REFRESH_INTERVAL = 2  # seconds between background blockhash refreshes
+BLOCKHASH_MAX_AGE = 30  # seconds before a cached blockhash is fetched synchronously
+CLUSTER_CONSTANTS_PATH = "cluster_constants.json"  # None = memory only
+POOL_INDEX_PATH = "pool_index.bin"  # None = memory only
+PERSISTENT_WSOL = False  # reuse one WSOL account across swaps instead of a throwaway one per trade
+WSOL_TOP_UP_BUFFER = 0  # extra lamports wrapped on each top-up, so fewer buys need one
+RESERVE_STREAM_MAX_AGE = 5  # seconds a disconnected reserve stream is still trusted
+RPC_POOL_SIZE = 16  # keep-alive HTTP connections per client
+RPC_BATCH_WINDOW = 0  # seconds to collect concurrent RPC calls into one JSON-RPC batch, None = off
+RPC_GATEWAY = True  # dedupe identical in-flight calls, keep RPC_RATE_LIMIT and retry 429s (rpc_gateway.py)
+RPC_RATE_LIMIT = None  # calls per second your RPC plan allows, None = unlimited
+RPC_METHOD_RATE_LIMITS = {}  # calls per second for single methods, e.g. {"getProgramAccounts": 1}
+RPC_MAX_RETRIES = 3  # retries of a call the RPC answers with 429 Too Many Requests
+SEND_ENDPOINTS = []  # extra RPC urls every transaction is also sent to, besides RPC
+REBROADCAST_INTERVAL = 2  # seconds between re-sends until a transaction lands or expires, None = send once
+BROADCAST_PROBE_RATE = 0.05  # share of transactions first sent to one endpoint alone, to rank endpoints
+ADAPTIVE_FEES = False  # size each transaction's unit limit and price (fees.py) instead of UNIT_BUDGET / UNIT_PRICE
+PRIORITY_FEE_PERCENTILE = 75  # of the priority fees recently paid for the pool's accounts
+PRIORITY_FEE_MIN = 0  # micro-lamports per compute unit
+PRIORITY_FEE_MAX = 10_000_000
+PRIORITY_FEE_REFRESH_INTERVAL = 5  # seconds between background refreshes of recent priority fees
+LOOKUP_TABLES_PATH = "lookup_tables.json"  # the wallet's address lookup tables for batch swaps, None = memory only
+SHARED_POOL_TABLE = None  # name of a shared_tables.SharedPoolTable fed by another process, read before RPC
+
+# client, async_client and payer_keypair are no longer built on import; they are read from
+# the active engine (engine.py) the first time something asks for them.
+def __getattr__(name: str):
+    if name in ("client", "async_client", "payer_keypair"):
+        from engine import current_engine
+        return getattr(current_engine(), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,288 @@
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+from typing import Callable, Optional
+from solana.rpc.commitment import Confirmed
+from solders.signature import Signature  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+# Confirms every in-flight transaction with shared getSignatureStatuses polls instead of one
+# getTransaction loop per trade. Each tracked signature gets a future that resolves to
+# True (landed without error at the target commitment), False (landed with an error) or
+# None (its blockhash expired without the transaction landing).
+#
+# Polling starts at min_interval whenever something new is tracked or a transaction is first
+# seen, and backs off towards max_interval while nothing changes. Block height is fetched at
+# most every height_interval seconds and is read before the statuses of the same round, so a
+# transaction is only expired once it can no longer land.
+#
+# Expiry needs working polls. If none succeeds for max_wait seconds (an RPC outage, 429s),
+# every transaction tracked before then resolves to None anyway, so no caller waits forever;
+# max_wait defaults to a blockhash's lifetime plus a margin.
+
+COMMITMENT_LEVELS = {"processed": 0, "confirmed": 1, "finalized": 2}
+MAX_SIGNATURES_PER_REQUEST = 256
+MAX_PROCESSING_AGE = 150  # blocks a blockhash stays valid after the one it was fetched at
+SLOT_SECONDS = 0.4
+DEFAULT_MAX_WAIT = MAX_PROCESSING_AGE * SLOT_SECONDS + 30.0
+
+class _Pending:
+    __slots__ = ("signature", "last_valid_block_height", "future", "seen", "tracked_at")
+
+    def __init__(self, signature: Signature, last_valid_block_height: Optional[int], future):
+        self.signature = signature
+        self.last_valid_block_height = last_valid_block_height
+        self.future = future
+        self.seen = False
+        self.tracked_at = time.monotonic()
+
+class _TrackerBase:
+    def __init__(
+        self,
+        client,
+        commitment: str = Confirmed,
+        min_interval: float = 0.2,
+        max_interval: float = 2.0,
+        backoff: float = 1.5,
+        height_interval: float = 5.0,
+        max_wait: float = DEFAULT_MAX_WAIT,
+    ):
+        self.client = client
+        self.level = COMMITMENT_LEVELS[commitment]
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.height_interval = height_interval
+        self.max_wait = max_wait
+        self.interval = min_interval
+        self.status_calls = 0
+        self.height_calls = 0
+        self._pending = {}  # str(signature) -> _Pending
+        self._height_at = 0.0
+        self._polled_at = 0.0  # when a poll last succeeded
+        self._tracked = 0
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def _needs_height(self, items: list) -> bool:
+        if time.monotonic() - self._height_at >= self.height_interval:
+            return True
+        return any(item.last_valid_block_height is None for item in items)
+
+    def _chunks(self, items: list) -> list:
+        return [items[i:i + MAX_SIGNATURES_PER_REQUEST] for i in range(0, len(items), MAX_SIGNATURES_PER_REQUEST)]
+
+    def _apply(self, items: list, statuses: list, block_height: Optional[int]) -> bool:
+        # Resolves whatever the poll settled; returns True if anything changed.
+        progress = False
+        for item, status in zip(items, statuses):
+            if status is not None:
+                if status.err is not None:
+                    self._resolve(item, False)
+                    progress = True
+                # A null confirmation status means the transaction is already rooted.
+                elif status.confirmation_status is None or int(status.confirmation_status) >= self.level:
+                    self._resolve(item, True)
+                    progress = True
+                elif not item.seen:
+                    item.seen = True
+                    progress = True
+            elif block_height is not None:
+                if item.last_valid_block_height is None:
+                    item.last_valid_block_height = block_height + MAX_PROCESSING_AGE
+                elif block_height > item.last_valid_block_height:
+                    self._resolve(item, None)
+                    progress = True
+        return progress
+
+    def _expire(self, items: list) -> bool:
+        # Gives up on transactions no poll has been able to check for max_wait seconds.
+        now = time.monotonic()
+        expired = [item for item in items if now - max(item.tracked_at, self._polled_at) > self.max_wait]
+        if expired:
+            logger.warning("No signature status for %.0f seconds; giving up on %s transactions", self.max_wait, len(expired))
+        for item in expired:
+            self._resolve(item, None)
+        return bool(expired)
+
+    def _next_interval(self, progress: bool, tracked: int) -> None:
+        # Signatures tracked while the poll was in flight also count as progress.
+        if progress or tracked != self._tracked:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.interval * self.backoff, self.max_interval)
+
+    def _resolve(self, item: _Pending, result: Optional[bool]) -> None:
+        self._pending.pop(str(item.signature), None)
+        if not item.future.done():
+            item.future.set_result(result)
+
+class ConfirmationTracker(_TrackerBase):
+    def __init__(self, client, *args, **kwargs):
+        super().__init__(client, *args, **kwargs)
+        self._lock = threading.RLock()  # callbacks run on the tracker thread and may track again
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="confirmation-tracker", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def track(
+        self,
+        signature: Signature,
+        last_valid_block_height: Optional[int] = None,
+        callback: Optional[Callable[[Signature, Optional[bool]], None]] = None,
+    ) -> Future:
+        with self._lock:
+            item = self._pending.get(str(signature))
+            if item is None:
+                item = _Pending(signature, last_valid_block_height, Future())
+                self._pending[str(signature)] = item
+                self._tracked += 1
+            self.interval = self.min_interval
+        if callback is not None:
+            item.future.add_done_callback(lambda future: callback(signature, future.result()))
+        if self._thread is None:
+            self.start()
+        self._wake.set()
+        return item.future
+
+    def wait(self, signature: Signature, last_valid_block_height: Optional[int] = None, timeout: Optional[float] = None) -> Optional[bool]:
+        try:
+            return self.track(signature, last_valid_block_height).result(timeout)
+        except TimeoutError:
+            return None
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            with self._lock:
+                items = list(self._pending.values())
+                tracked = self._tracked
+            if not items:
+                self._wake.wait()
+                self._wake.clear()
+                continue
+
+            try:
+                progress = self._poll(items)
+                self._polled_at = time.monotonic()
+            except Exception as e:
+                logger.warning("Error polling signature statuses: %s", e)
+                with self._lock:
+                    progress = self._expire(items)
+            self._next_interval(progress, tracked)
+            self._wake.clear()
+            self._wake.wait(self.interval)
+
+    def _poll(self, items: list) -> bool:
+        block_height = None
+        if self._needs_height(items):
+            self.height_calls += 1
+            block_height = self.client.get_block_height(Confirmed).value
+            self._height_at = time.monotonic()
+
+        statuses = []
+        for chunk in self._chunks(items):
+            self.status_calls += 1
+            statuses.extend(self.client.get_signature_statuses([item.signature for item in chunk]).value)
+        with self._lock:
+            return self._apply(items, statuses, block_height)
+
+class AsyncConfirmationTracker(_TrackerBase):
+    def __init__(self, client, *args, **kwargs):
+        super().__init__(client, *args, **kwargs)
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._wake = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def track(
+        self,
+        signature: Signature,
+        last_valid_block_height: Optional[int] = None,
+        callback: Optional[Callable[[Signature, Optional[bool]], None]] = None,
+    ) -> asyncio.Future:
+        self.start()
+        item = self._pending.get(str(signature))
+        if item is None:
+            item = _Pending(signature, last_valid_block_height, asyncio.get_running_loop().create_future())
+            self._pending[str(signature)] = item
+            self._tracked += 1
+        self.interval = self.min_interval
+        if callback is not None:
+            item.future.add_done_callback(lambda future: callback(signature, future.result()))
+        self._wake.set()
+        return item.future
+
+    async def wait(self, signature: Signature, last_valid_block_height: Optional[int] = None, timeout: Optional[float] = None) -> Optional[bool]:
+        try:
+            return await asyncio.wait_for(asyncio.shield(self.track(signature, last_valid_block_height)), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def _run(self) -> None:
+        while True:
+            items = list(self._pending.values())
+            tracked = self._tracked
+            if not items:
+                await self._wake.wait()
+                self._wake.clear()
+                continue
+
+            try:
+                progress = await self._poll(items)
+                self._polled_at = time.monotonic()
+            except Exception as e:
+                logger.warning("Error polling signature statuses: %s", e)
+                progress = self._expire(items)
+            self._next_interval(progress, tracked)
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _poll(self, items: list) -> bool:
+        block_height = None
+        if self._needs_height(items):
+            self.height_calls += 1
+            block_height = (await self.client.get_block_height(Confirmed)).value
+            self._height_at = time.monotonic()
+
+        chunks = self._chunks(items)
+        self.status_calls += len(chunks)
+        responses = await asyncio.gather(*(
+            self.client.get_signature_statuses([item.signature for item in chunk]) for chunk in chunks
+        ))
+        statuses = [status for response in responses for status in response.value]
+        return self._apply(items, statuses, block_height)
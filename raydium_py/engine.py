@@ -0,0 +1,305 @@
+import contextlib
+import contextvars
+import copy
+import threading
+from typing import Callable, Optional, Sequence
+import config
+
+# Explicit configuration for the trade pipeline. An Engine holds what config.py used to
+# build at import time: the RPC clients, the payer keypair and the fee settings, together
+# with the helpers bound to them (blockhash providers, confirmation trackers, cluster
+# constants, the wallet's token accounts, WSOL account and lookup tables). Everything is built on first
+# use, so importing raydium, quote or the layouts needs neither a valid key nor an RPC, and
+# the HTTP stack (httpx, requests, solana.rpc) is only imported with the first client.
+#
+# buy/sell and the utils helpers act for current_engine(): the engine activated in the
+# calling context with `with engine.use():`, else the default engine built from config.py.
+# Activation is a context variable, so threads and asyncio tasks can each use their own.
+#
+# with_payer() derives an engine for another wallet on the same endpoint: the clients and
+# the endpoint helpers are shared, the payer, wallet state and WSOL account are its own.
+#
+# Transactions go out through the broadcaster, which sends them to rpc and every one of
+# send_endpoints and keeps re-sending them every rebroadcast_interval seconds (broadcast.py).
+# Their compute budget comes from the fee policy: unit_budget / unit_price as they are, or
+# sized per transaction with adaptive_fees (fees.py).
+#
+# Both clients of rpc call through one gateway (rpc_gateway.py), unless use_gateway is off:
+# identical calls in flight are sent once, rate_limit is kept with sends ahead of scans, and
+# 429s are retried.
+
+_current_engine = contextvars.ContextVar("raydium_py_engine", default=None)
+_default_engine = None
+_default_lock = threading.Lock()
+_FROM_CONFIG = object()  # batch_window, rebroadcast_interval and rate_limit=None have their own meaning
+_WALLET_HELPERS = ("payer_keypair", "wallet_state", "wsol_account", "lookup_tables")
+
+class Engine:
+    def __init__(
+        self,
+        rpc: str,
+        payer=None,
+        unit_budget: Optional[int] = None,
+        unit_price: Optional[int] = None,
+        persistent_wsol: Optional[bool] = None,
+        pool_size: Optional[int] = None,
+        batch_window=_FROM_CONFIG,
+        send_endpoints: Optional[Sequence[str]] = None,
+        rebroadcast_interval=_FROM_CONFIG,
+        probe_rate: Optional[float] = None,
+        adaptive_fees: Optional[bool] = None,
+        use_gateway: Optional[bool] = None,
+        rate_limit=_FROM_CONFIG,
+    ):
+        # payer is a Keypair or a base58 private key string; unset settings come from config.py.
+        self.rpc = rpc
+        self.unit_budget = config.UNIT_BUDGET if unit_budget is None else unit_budget
+        self.unit_price = config.UNIT_PRICE if unit_price is None else unit_price
+        self.persistent_wsol = config.PERSISTENT_WSOL if persistent_wsol is None else persistent_wsol
+        self.pool_size = config.RPC_POOL_SIZE if pool_size is None else pool_size
+        self.batch_window = config.RPC_BATCH_WINDOW if batch_window is _FROM_CONFIG else batch_window
+        self.send_endpoints = list(config.SEND_ENDPOINTS if send_endpoints is None else send_endpoints)
+        self.rebroadcast_interval = (
+            config.REBROADCAST_INTERVAL if rebroadcast_interval is _FROM_CONFIG else rebroadcast_interval
+        )
+        self.probe_rate = config.BROADCAST_PROBE_RATE if probe_rate is None else probe_rate
+        self.adaptive_fees = config.ADAPTIVE_FEES if adaptive_fees is None else adaptive_fees
+        self.use_gateway = config.RPC_GATEWAY if use_gateway is None else use_gateway
+        self.rate_limit = config.RPC_RATE_LIMIT if rate_limit is _FROM_CONFIG else rate_limit
+        self._payer = payer
+        self._endpoint_built = {}  # shared with engines derived by with_payer
+        self._wallet_built = {}
+        self._lock = threading.RLock()
+
+    @classmethod
+    def from_config(cls) -> "Engine":
+        return cls(config.RPC, config.PRIV_KEY)
+
+    def with_payer(self, payer) -> "Engine":
+        engine = copy.copy(self)
+        engine._payer = payer
+        engine._wallet_built = {}
+        return engine
+
+    def _get(self, name: str, build: Callable):
+        built = self._wallet_built if name in _WALLET_HELPERS else self._endpoint_built
+        value = built.get(name)
+        if value is None:
+            with self._lock:
+                value = built.get(name)
+                if value is None:
+                    value = built[name] = build()
+        return value
+
+    @property
+    def payer_keypair(self):
+        def build():
+            if isinstance(self._payer, str):
+                from solders.keypair import Keypair  # type: ignore
+                try:
+                    return Keypair.from_base58_string(self._payer)
+                except BaseException as e:  # solders panics on a malformed key
+                    if type(e).__name__ != "PanicException":
+                        raise
+                    raise ValueError("payer is not a valid base58 private key") from None
+            if self._payer is None:
+                raise ValueError("Engine has no payer keypair")
+            return self._payer
+        return self._get("payer_keypair", build)
+
+    @property
+    def client(self):
+        def build():
+            from transport import make_client
+            return make_client(self.rpc, self.pool_size, self.batch_window, gateway=self.gateway)
+        return self._get("client", build)
+
+    @property
+    def async_client(self):
+        def build():
+            from transport import make_async_client
+            return make_async_client(self.rpc, self.pool_size, self.batch_window, gateway=self.gateway)
+        return self._get("async_client", build)
+
+    @property
+    def gateway(self):
+        # None with use_gateway off.
+        if not self.use_gateway:
+            return None
+        def build():
+            from rpc_gateway import RpcGateway
+            return RpcGateway(self.rate_limit, method_rates=config.RPC_METHOD_RATE_LIMITS, max_retries=config.RPC_MAX_RETRIES)
+        return self._get("gateway", build)
+
+    @property
+    def blockhash_provider(self):
+        def build():
+            from blockhash import BlockhashProvider
+            return BlockhashProvider(self.client, config.BLOCKHASH_REFRESH_INTERVAL, config.BLOCKHASH_MAX_AGE)
+        return self._get("blockhash_provider", build)
+
+    @property
+    def async_blockhash_provider(self):
+        def build():
+            from blockhash import AsyncBlockhashProvider
+            return AsyncBlockhashProvider(self.async_client, config.BLOCKHASH_REFRESH_INTERVAL, config.BLOCKHASH_MAX_AGE)
+        return self._get("async_blockhash_provider", build)
+
+    @property
+    def confirmation_tracker(self):
+        def build():
+            from confirmation import ConfirmationTracker
+            return ConfirmationTracker(self.client)
+        return self._get("confirmation_tracker", build)
+
+    @property
+    def async_confirmation_tracker(self):
+        def build():
+            from confirmation import AsyncConfirmationTracker
+            return AsyncConfirmationTracker(self.async_client)
+        return self._get("async_confirmation_tracker", build)
+
+    @property
+    def broadcaster(self):
+        def build():
+            from broadcast import Broadcaster
+            from transport import make_client
+            clients = {self.rpc: self.client}
+            for endpoint in self.send_endpoints:
+                if endpoint not in clients:
+                    clients[endpoint] = make_client(endpoint, self.pool_size, None)
+            return Broadcaster(clients, self.rebroadcast_interval, self.probe_rate)
+        return self._get("broadcaster", build)
+
+    @property
+    def async_broadcaster(self):
+        def build():
+            from broadcast import AsyncBroadcaster
+            from transport import make_async_client
+            clients = {self.rpc: self.async_client}
+            for endpoint in self.send_endpoints:
+                if endpoint not in clients:
+                    clients[endpoint] = make_async_client(endpoint, self.pool_size, None)
+            return AsyncBroadcaster(clients, self.rebroadcast_interval, self.probe_rate)
+        return self._get("async_broadcaster", build)
+
+    @property
+    def compute_units(self):
+        def build():
+            from fees import ComputeUnitCache
+            return ComputeUnitCache()
+        return self._get("compute_units", build)
+
+    @property
+    def fee_policy(self):
+        def build():
+            from fees import AdaptiveFeePolicy, FeePolicy, PriorityFeeCache
+            if not self.adaptive_fees:
+                return FeePolicy(self.unit_budget, self.unit_price)
+            fee_cache = PriorityFeeCache(self.client, config.PRIORITY_FEE_PERCENTILE, config.PRIORITY_FEE_REFRESH_INTERVAL)
+            return AdaptiveFeePolicy(
+                self.unit_budget, self.unit_price, self.compute_units, fee_cache,
+                config.PRIORITY_FEE_MIN, config.PRIORITY_FEE_MAX,
+            )
+        return self._get("fee_policy", build)
+
+    @property
+    def async_fee_policy(self):
+        def build():
+            from fees import AsyncAdaptiveFeePolicy, AsyncFeePolicy, AsyncPriorityFeeCache
+            if not self.adaptive_fees:
+                return AsyncFeePolicy(self.unit_budget, self.unit_price)
+            fee_cache = AsyncPriorityFeeCache(self.async_client, config.PRIORITY_FEE_PERCENTILE, config.PRIORITY_FEE_REFRESH_INTERVAL)
+            return AsyncAdaptiveFeePolicy(
+                self.unit_budget, self.unit_price, self.compute_units, fee_cache,
+                config.PRIORITY_FEE_MIN, config.PRIORITY_FEE_MAX,
+            )
+        return self._get("async_fee_policy", build)
+
+    @property
+    def cluster_constants(self):
+        def build():
+            from cluster_constants import ClusterConstants
+            return ClusterConstants(self.rpc, config.CLUSTER_CONSTANTS_PATH)
+        return self._get("cluster_constants", build)
+
+    @property
+    def wallet_state(self):
+        def build():
+            from wallet_state import WalletState
+            return WalletState(self.payer_keypair.pubkey())
+        return self._get("wallet_state", build)
+
+    @property
+    def wsol_account(self):
+        def build():
+            from wsol import WsolAccount
+            return WsolAccount(self.payer_keypair.pubkey(), config.WSOL_TOP_UP_BUFFER)
+        return self._get("wsol_account", build)
+
+    @property
+    def lookup_tables(self):
+        def build():
+            from lookup_tables import LookupTableRegistry
+            return LookupTableRegistry(self.payer_keypair.pubkey(), self.rpc, config.LOOKUP_TABLES_PATH)
+        return self._get("lookup_tables", build)
+
+    @contextlib.contextmanager
+    def use(self):
+        token = _current_engine.set(self)
+        try:
+            yield self
+        finally:
+            _current_engine.reset(token)
+
+    def close(self) -> None:
+        # Stops the background threads and closes the sync connection pool, if they were built.
+        # Engines derived with with_payer share these, so this closes them for all of them.
+        with self._lock:
+            for name in ("blockhash_provider", "confirmation_tracker", "fee_policy"):
+                helper = self._endpoint_built.pop(name, None)
+                if helper is not None:
+                    helper.stop()
+            broadcaster = self._endpoint_built.pop("broadcaster", None)
+            if broadcaster is not None:
+                broadcaster.stop()
+                for endpoint, client in broadcaster.clients.items():
+                    if endpoint != self.rpc:
+                        client._provider.close()
+            client = self._endpoint_built.pop("client", None)
+            if client is not None:
+                client._provider.close()
+
+    async def aclose(self) -> None:
+        # Async counterpart of close(); call it from the loop the async helpers ran on.
+        for name in ("async_blockhash_provider", "async_confirmation_tracker", "async_fee_policy"):
+            helper = self._endpoint_built.pop(name, None)
+            if helper is not None:
+                await helper.stop()
+        broadcaster = self._endpoint_built.pop("async_broadcaster", None)
+        if broadcaster is not None:
+            await broadcaster.stop()
+            for endpoint, client in broadcaster.clients.items():
+                if endpoint != self.rpc:
+                    await client.close()
+        async_client = self._endpoint_built.pop("async_client", None)
+        if async_client is not None:
+            await async_client.close()
+
+def default_engine() -> Engine:
+    global _default_engine
+    if _default_engine is None:
+        with _default_lock:
+            if _default_engine is None:
+                _default_engine = Engine.from_config()
+    return _default_engine
+
+def set_default_engine(engine: Optional[Engine]) -> None:
+    # None drops the current default; the next default_engine() rebuilds it from config.py.
+    global _default_engine
+    with _default_lock:
+        _default_engine = engine
+
+def current_engine() -> Engine:
+    engine = _current_engine.get()
+    return engine if engine is not None else default_engine()
@@ -1,6 +1,9 @@
+import logging
 from raydium import buy
 from utils import get_pair_address_from_api, get_pair_address_from_rpc
 
+logging.basicConfig(level=logging.INFO, format="%(message)s")  # DEBUG for every step
+
 # Buy Example
 token_address = "7GCihgDB8fe6KNjn2MYtkzZcRjQy3t9GHdC8uHYmW2hr"  # POPCAT
 sol_in = .1
@@ -0,0 +1,137 @@
+import asyncio
+import logging
+from typing import Iterable, Sequence
+from async_raydium import async_buy, async_sell
+from async_utils import async_fetch_pool_keys
+from engine import Engine
+from reserves import ReserveCache
+
+logger = logging.getLogger(__name__)
+
+# Buys and sells for many wallets at once, on one event loop.
+#
+# - Every wallet has its own queue and worker task, so a wallet's trades run one at a time
+#   in submission order (they spend the same lamports, token accounts and WSOL account),
+#   while different wallets trade concurrently.
+# - Wallets are spread round-robin over the endpoints. The wallets of one endpoint are
+#   engines derived from one Engine, so they share its clients (connection pool and batching),
+#   blockhash provider and confirmation tracker; at most max_concurrency trades per endpoint
+#   are in flight at once.
+# - Pool keys (utils.pool_keys_cache) and reserves (a ReserveCache) are shared, so a hundred
+#   wallets trading one pool pay for its pool keys once and for its reserves once per
+#   reserve_ttl, instead of once per trade.
+#
+#   async with TradeExecutor(keypairs, [RPC_A, RPC_B]) as executor:
+#       results = await executor.run([("buy", wallet, pair_address, .1, 5), ...])
+
+SIDES = {"buy": async_buy, "sell": async_sell}
+
+class TradeExecutor:
+    def __init__(
+        self,
+        keypairs: Sequence,
+        endpoints: Sequence[str],
+        max_concurrency: int = 16,
+        reserve_ttl: float = 1.0,
+        **engine_settings,
+    ):
+        # keypairs are Keypairs or base58 private key strings; engine_settings go to every Engine.
+        if not keypairs or not endpoints:
+            raise ValueError("TradeExecutor needs at least one keypair and one endpoint")
+        self.endpoint_engines = [Engine(endpoint, **engine_settings) for endpoint in endpoints]
+        self.reserves = ReserveCache(reserve_ttl)
+        self.engines = {}  # str(wallet pubkey) -> Engine
+        self._semaphores = {}  # str(wallet pubkey) -> its endpoint's semaphore
+        semaphores = [asyncio.Semaphore(max_concurrency) for _ in endpoints]
+        for i, keypair in enumerate(keypairs):
+            engine = self.endpoint_engines[i % len(endpoints)].with_payer(keypair)
+            wallet = str(engine.payer_keypair.pubkey())
+            self.engines[wallet] = engine
+            self._semaphores[wallet] = semaphores[i % len(endpoints)]
+        self._queues = {}
+        self._workers = {}
+
+    @property
+    def wallets(self) -> list:
+        return list(self.engines)
+
+    def submit(self, side: str, wallet, pair_address: str, amount: float, slippage: int = 5) -> asyncio.Future:
+        # amount is SOL in for a buy and the percentage of the balance for a sell.
+        if side not in SIDES:
+            raise ValueError(f"Unknown side: {side}")
+        wallet = str(wallet)
+        if wallet not in self.engines:
+            raise KeyError(f"Unknown wallet: {wallet}")
+
+        loop = asyncio.get_running_loop()
+        queue = self._queues.get(wallet)
+        if queue is None:
+            queue = self._queues[wallet] = asyncio.Queue()
+            self._workers[wallet] = loop.create_task(self._worker(wallet, queue))
+        future = loop.create_future()
+        queue.put_nowait((side, pair_address, amount, slippage, future))
+        return future
+
+    def buy(self, wallet, pair_address: str, sol_in: float, slippage: int = 5) -> asyncio.Future:
+        return self.submit("buy", wallet, pair_address, sol_in, slippage)
+
+    def sell(self, wallet, pair_address: str, percentage: int = 100, slippage: int = 5) -> asyncio.Future:
+        return self.submit("sell", wallet, pair_address, percentage, slippage)
+
+    async def run(self, trades: Iterable[tuple]) -> list:
+        # trades are (side, wallet, pair_address, amount[, slippage]); results come back in order.
+        trades = list(trades)
+        await self.prefetch({trade[2] for trade in trades})
+        return await asyncio.gather(*(self.submit(*trade) for trade in trades))
+
+    async def prefetch(self, pair_addresses: Iterable[str]) -> None:
+        # Warms the shared caches: pool keys per pair, then every pool's reserves in one request.
+        with self.endpoint_engines[0].use():
+            pools = await asyncio.gather(*(async_fetch_pool_keys(pair_address) for pair_address in pair_addresses))
+        pools = [pool_keys for pool_keys in pools if pool_keys is not None]
+        if pools:
+            try:
+                await self.reserves.async_refresh(self.endpoint_engines[0].async_client, pools)
+            except Exception as e:
+                logger.warning("Error prefetching reserves: %s", e)
+
+    async def close(self) -> None:
+        # Lets every queued trade finish, then shuts the workers and endpoint helpers down.
+        for queue in self._queues.values():
+            queue.put_nowait(None)
+        await asyncio.gather(*self._workers.values())
+        self._queues, self._workers = {}, {}
+        for engine in self.endpoint_engines:
+            await engine.aclose()
+
+    async def __aenter__(self) -> "TradeExecutor":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def _worker(self, wallet: str, queue: asyncio.Queue) -> None:
+        engine, semaphore = self.engines[wallet], self._semaphores[wallet]
+        with engine.use():
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                side, pair_address, amount, slippage, future = item
+                try:
+                    async with semaphore:
+                        result = await self._trade(engine, side, pair_address, amount, slippage)
+                except Exception as e:
+                    logger.error("Error occurred during %s for wallet %s: %s", side, wallet, e)
+                    result = False
+                if not future.done():
+                    future.set_result(result)
+
+    async def _trade(self, engine: Engine, side: str, pair_address: str, amount: float, slippage: int) -> bool:
+        pool_keys = await async_fetch_pool_keys(pair_address)
+        if pool_keys is not None:
+            try:
+                await self.reserves.async_refresh(engine.async_client, [pool_keys])
+            except Exception as e:
+                logger.warning("Error refreshing shared reserves: %s", e)  # the trade fetches its own
+        return await SIDES[side](pair_address, amount, slippage, reserve_stream=self.reserves)
@@ -0,0 +1,160 @@
+import struct
+from typing import Optional, Sequence
+from construct import Array, Bytes, BytesInteger, FormatField, Padded, Renamed, Transformed
+from layouts import (
+    ACCOUNT_LAYOUT,
+    LIQUIDITY_STATE_LAYOUT_V4,
+    MARKET_STATE_LAYOUT_V3,
+    OPEN_ORDERS_LAYOUT,
+)
+
+# Precompiled readers for the construct layouts in layouts.py. Offsets and formats are
+# derived from the construct definitions themselves, so the two can never drift apart.
+# Fields are read straight out of the caller's buffer (bytes, bytearray or memoryview)
+# with struct.unpack_from; nothing but the requested fields is ever materialized.
+
+def _field_spec(subcon) -> tuple:
+    if isinstance(subcon, FormatField):
+        return subcon.fmtstr[1:], None
+    if isinstance(subcon, Bytes):
+        return f"{subcon.length}s", None
+    if isinstance(subcon, BytesInteger):
+        return f"{subcon.length}s", _little_endian_int
+    if isinstance(subcon, Array):
+        item_format, _ = _field_spec(subcon.subcon)
+        if item_format.endswith("s"):
+            size = subcon.subcon.sizeof()
+            return f"{subcon.sizeof()}s", lambda raw: [raw[i:i + size] for i in range(0, len(raw), size)]
+        items = struct.Struct(f"<{subcon.count}{item_format}")
+        return f"{subcon.sizeof()}s", lambda raw: list(items.unpack(raw))
+    if isinstance(subcon, Transformed):
+        return f"{subcon.sizeof()}s", _flag_reader(subcon)
+    raise TypeError(f"Unsupported construct field: {subcon}")
+
+def _little_endian_int(raw: bytes) -> int:
+    return int.from_bytes(raw, "little")
+
+def _flag_reader(subcon):
+    # Bit-level structs (ACCOUNT_FLAGS_LAYOUT) are probed once to find which bit backs each flag.
+    inner = subcon
+    while not hasattr(inner, "subcons"):
+        inner = inner.subcon
+    names = [sc.name for sc in inner.subcons if sc.name]
+    bits = {
+        name: int.from_bytes(subcon.build({n: n == name for n in names}), "little").bit_length() - 1
+        for name in names
+    }
+
+    def read(raw: bytes) -> dict:
+        value = int.from_bytes(raw, "little")
+        return {name: bool(value >> bit & 1) for name, bit in bits.items()}
+
+    return read
+
+class FastLayout:
+    def __init__(self, layout, fields: Optional[Sequence[str]] = None):
+        self.size = layout.sizeof()
+        self.offsets = {}
+        self._specs = {}
+
+        offset = 0
+        for subcon in layout.subcons:
+            if isinstance(subcon, Renamed) and subcon.name:
+                self.offsets[subcon.name] = offset
+                self._specs[subcon.name] = _field_spec(subcon.subcon)
+            elif not isinstance(subcon, Padded):
+                raise TypeError(f"Unsupported construct field: {subcon}")
+            offset += subcon.sizeof()
+
+        self.names = tuple(fields) if fields is not None else tuple(self.offsets)
+        self.struct, self._order, self._converters = self._compile(self.names)
+        self._readers = {name: self._compile((name,))[0] for name in self.offsets}
+
+    def _compile(self, names: Sequence[str]) -> tuple:
+        # One struct.Struct over all requested fields in offset order, with pad bytes for the gaps.
+        ordered = sorted(names, key=self.offsets.__getitem__)
+        fmt = "<"
+        position = 0
+        for name in ordered:
+            gap = self.offsets[name] - position
+            if gap < 0:
+                raise ValueError(f"Overlapping field: {name}")
+            if gap:
+                fmt += f"{gap}x"
+            item_format, _ = self._specs[name]
+            fmt += item_format
+            position = self.offsets[name] + struct.calcsize("<" + item_format)
+
+        order = [ordered.index(name) for name in names]
+        converters = [self._specs[name][1] for name in names]
+        return struct.Struct(fmt), order, converters
+
+    def select(self, fields: Sequence[str]) -> "FastLayout":
+        selected = object.__new__(FastLayout)
+        selected.size = self.size
+        selected.offsets = self.offsets
+        selected._specs = self._specs
+        selected._readers = self._readers
+        selected.names = tuple(fields)
+        selected.struct, selected._order, selected._converters = self._compile(selected.names)
+        return selected
+
+    def unpack(self, data) -> tuple:
+        raw = self.struct.unpack_from(data)
+        return tuple(
+            converter(raw[i]) if converter is not None else raw[i]
+            for i, converter in zip(self._order, self._converters)
+        )
+
+    def parse(self, data) -> dict:
+        return dict(zip(self.names, self.unpack(data)))
+
+    def read(self, data, name: str):
+        value = self._readers[name].unpack_from(data)[0]
+        converter = self._specs[name][1]
+        return converter(value) if converter is not None else value
+
+    def view(self, data) -> "LayoutView":
+        return LayoutView(self, data)
+
+class LayoutView:
+    __slots__ = ("_layout", "_data")
+
+    def __init__(self, layout: FastLayout, data):
+        self._layout = layout
+        self._data = memoryview(data)
+
+    def __getattr__(self, name: str):
+        try:
+            return self._layout.read(self._data, name)
+        except KeyError:
+            raise AttributeError(name) from None
+
+LIQUIDITY_STATE_V4 = FastLayout(LIQUIDITY_STATE_LAYOUT_V4)
+MARKET_STATE_V3 = FastLayout(MARKET_STATE_LAYOUT_V3)
+OPEN_ORDERS = FastLayout(OPEN_ORDERS_LAYOUT)
+ACCOUNT = FastLayout(ACCOUNT_LAYOUT)
+
+# The subsets fetch_pool_keys and the reserve readers actually need, decoded in one call each.
+AMM_POOL_KEYS = LIQUIDITY_STATE_V4.select((
+    "coinDecimals",
+    "pcDecimals",
+    "poolCoinTokenAccount",
+    "poolPcTokenAccount",
+    "ammOpenOrders",
+    "serumMarket",
+    "ammTargetOrders",
+    "swapFeeNumerator",
+    "swapFeeDenominator",
+))
+MARKET_POOL_KEYS = MARKET_STATE_V3.select((
+    "vault_signer_nonce",
+    "base_mint",
+    "quote_mint",
+    "base_vault",
+    "quote_vault",
+    "bids",
+    "asks",
+    "event_queue",
+))
+TOKEN_ACCOUNT_AMOUNT = ACCOUNT.select(("mint", "owner", "amount"))
@@ -0,0 +1,524 @@
+import asyncio
+import json
+import logging
+import math
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Optional, Sequence
+from solana.rpc.core import RPCException
+from solders.compute_budget import ID as COMPUTE_BUDGET_PROGRAM_ID, set_compute_unit_limit, set_compute_unit_price  # type: ignore
+from solders.message import MessageV0  # type: ignore
+from solders.transaction import VersionedTransaction  # type: ignore
+from instrumentation import span
+
+logger = logging.getLogger(__name__)
+
+# Compute budget sized per transaction instead of one UNIT_BUDGET / UNIT_PRICE for all.
+#
+# - Unit limit: the compute a transaction uses depends on the pool and on which instructions
+#   it carries (a buy that creates the token account needs more than a bare swap), not on
+#   the amounts. ComputeUnitCache keeps recent measurements per (pool, instruction shape):
+#   the first transaction of a shape is simulated, and a share of confirmed transactions is
+#   looked up afterwards in the background. The limit is the largest recent measurement plus
+#   a margin; priority fees are paid on the limit, not on what was used.
+# - Unit price: PriorityFeeCache keeps a percentile of getRecentPrioritizationFees for the
+#   pool's writable accounts, refreshed in the background like the blockhash, and the policy
+#   clamps it to [min_price, max_price].
+#
+# FeePolicy / AsyncFeePolicy hand out the fixed budget; AdaptiveFeePolicy and
+# AsyncAdaptiveFeePolicy size it. buy/sell ask the engine's policy for a ComputeBudget before
+# compiling and report how the transaction ended with observe().
+
+MAX_UNITS = 1_400_000  # per transaction
+UNIT_STEP = 1_000  # limits are rounded up to this
+OBSERVE_WORKERS = 2
+GET_TRANSACTION_CONFIG = {"encoding": "base64", "commitment": "confirmed", "maxSupportedTransactionVersion": 0}
+
+@dataclass
+class ComputeBudget:
+    unit_limit: int
+    unit_price: int  # micro-lamports per compute unit
+    key: Optional[tuple] = None  # (pool, instruction shape) the limit was sized for, None = fixed
+
+class _RpcRequest:
+    # Body for RPC methods solders has no request type for; the transport only calls to_json().
+    __slots__ = ("method", "params")
+
+    def __init__(self, method: str, params: list):
+        self.method = method
+        self.params = params
+
+    def to_json(self) -> str:
+        return json.dumps({"jsonrpc": "2.0", "id": 0, "method": self.method, "params": self.params})
+
+def _result(raw: str):
+    response = json.loads(raw)
+    if "error" in response:
+        raise RPCException(response["error"])
+    return response["result"]
+
+def rpc_call(client, method: str, params: list):
+    return _result(client._provider.make_request_unparsed(_RpcRequest(method, params)))
+
+async def async_rpc_call(async_client, method: str, params: list):
+    return _result(await async_client._provider.make_request_unparsed(_RpcRequest(method, params)))
+
+def instruction_shape(instructions: Sequence) -> tuple:
+    # Program and instruction kind (first data byte) of everything but the compute budget.
+    return tuple(
+        (str(instruction.program_id), bytes(instruction.data[:1]))
+        for instruction in instructions
+        if instruction.program_id != COMPUTE_BUDGET_PROGRAM_ID
+    )
+
+def with_compute_budget(instructions: Sequence, unit_limit: int, unit_price: int) -> list:
+    return [
+        set_compute_unit_limit(unit_limit),
+        set_compute_unit_price(unit_price),
+        *(instruction for instruction in instructions if instruction.program_id != COMPUTE_BUDGET_PROGRAM_ID),
+    ]
+
+def fee_accounts(pool_keys) -> tuple:
+    # The accounts every swap of the pool write-locks; their recent fees are what a trade bids against.
+    if pool_keys is None:
+        return ()
+    return (str(pool_keys.amm_id), str(pool_keys.base_vault), str(pool_keys.quote_vault))
+
+def _percentile(values: list, q: float) -> int:
+    if not values:
+        return 0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(len(ordered) * q / 100) - 1))]
+
+class ComputeUnitCache:
+    def __init__(self, margin: float = 0.1, window: int = 16, max_size: int = 10_000):
+        self.margin = margin
+        self.window = window
+        self.max_size = max_size
+        self._samples = OrderedDict()  # (pool, shape) -> deque of measured units
+        self._lock = threading.Lock()
+
+    def samples(self, key: tuple) -> int:
+        samples = self._samples.get(key)
+        return len(samples) if samples else 0
+
+    def limit(self, key: tuple) -> Optional[int]:
+        samples = self._samples.get(key)
+        if not samples:
+            return None
+        units = int(max(samples) * (1 + self.margin))
+        return min(MAX_UNITS, -(-units // UNIT_STEP) * UNIT_STEP)
+
+    def record(self, key: tuple, units: int) -> None:
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None:
+                samples = self._samples[key] = deque(maxlen=self.window)
+                if len(self._samples) > self.max_size:
+                    self._samples.popitem(last=False)
+            else:
+                self._samples.move_to_end(key)
+            samples.append(units)
+
+class _FeeCacheBase:
+    def __init__(
+        self,
+        client,
+        percentile: float = 75,
+        refresh_interval: float = 5.0,
+        max_age: float = 30.0,
+        idle_after: float = 60.0,
+    ):
+        self.client = client
+        self.percentile = percentile
+        self.refresh_interval = refresh_interval
+        self.max_age = max_age
+        self.idle_after = idle_after
+        self.cached_hits = 0
+        self.sync_fetches = 0
+        self._prices = {}  # accounts -> (price, fetched_at)
+        self._used = {}  # accounts -> last asked for
+
+    def _cached(self, accounts: tuple) -> Optional[int]:
+        now = time.monotonic()
+        self._used[accounts] = now
+        entry = self._prices.get(accounts)
+        if entry is not None and now - entry[1] <= self.max_age:
+            self.cached_hits += 1
+            return entry[0]
+        return None
+
+    def _store(self, accounts: tuple, fees: list) -> int:
+        price = _percentile([entry["prioritizationFee"] for entry in fees], self.percentile)
+        self._prices[accounts] = (price, time.monotonic())
+        return price
+
+    def _active(self) -> list:
+        # Account sets nobody asked for in idle_after seconds are no longer refreshed.
+        now = time.monotonic()
+        for accounts, used_at in list(self._used.items()):
+            if now - used_at > self.idle_after:
+                self._used.pop(accounts, None)
+                self._prices.pop(accounts, None)
+        return list(self._used)
+
+class PriorityFeeCache(_FeeCacheBase):
+    def __init__(self, client, *args, **kwargs):
+        super().__init__(client, *args, **kwargs)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="priority-fee-cache", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def refresh(self, accounts: tuple) -> int:
+        return self._store(accounts, rpc_call(self.client, "getRecentPrioritizationFees", [list(accounts)]))
+
+    def get(self, accounts: Sequence[str]) -> int:
+        accounts = tuple(accounts)
+        if self._thread is None:
+            self.start()
+        price = self._cached(accounts)
+        if price is None:
+            self.sync_fetches += 1
+            price = self.refresh(accounts)
+        return price
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.refresh_interval):
+            for accounts in self._active():
+                try:
+                    self.refresh(accounts)
+                except Exception as e:
+                    logger.warning("Error refreshing priority fees: %s", e)
+
+class AsyncPriorityFeeCache(_FeeCacheBase):
+    def __init__(self, client, *args, **kwargs):
+        super().__init__(client, *args, **kwargs)
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def refresh(self, accounts: tuple) -> int:
+        return self._store(accounts, await async_rpc_call(self.client, "getRecentPrioritizationFees", [list(accounts)]))
+
+    async def get(self, accounts: Sequence[str]) -> int:
+        accounts = tuple(accounts)
+        self.start()
+        price = self._cached(accounts)
+        if price is None:
+            self.sync_fetches += 1
+            price = await self.refresh(accounts)
+        return price
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            for accounts in self._active():
+                try:
+                    await self.refresh(accounts)
+                except Exception as e:
+                    logger.warning("Error refreshing priority fees: %s", e)
+
+class FeePolicy:
+    # The same unit limit and price for every transaction (config.UNIT_BUDGET, UNIT_PRICE).
+    def __init__(self, unit_limit: int, unit_price: int):
+        self.unit_limit = unit_limit
+        self.unit_price = unit_price
+
+    def budget(self, client, payer, instructions: Sequence, blockhash, pool_keys=None) -> ComputeBudget:
+        return ComputeBudget(self.unit_limit, self.unit_price)
+
+    def template_budget(self, client, template, amount_in: int, minimum_amount_out: int, blockhash, pool_keys=None) -> ComputeBudget:
+        return ComputeBudget(self.unit_limit, self.unit_price)
+
+    def batch_budget(self, client, payer, instructions: Sequence, lookup_tables: Sequence, blockhash, pools: Sequence) -> ComputeBudget:
+        # A transaction carrying several swaps (batch_swaps.py) gets unit_limit for each.
+        return ComputeBudget(min(MAX_UNITS, self.unit_limit * max(1, len(pools))), self.unit_price)
+
+    def observe(self, client, signature, budget: ComputeBudget, confirmed: Optional[bool]) -> None:
+        pass
+
+    def stop(self) -> None:
+        pass
+
+class AsyncFeePolicy:
+    def __init__(self, unit_limit: int, unit_price: int):
+        self.unit_limit = unit_limit
+        self.unit_price = unit_price
+
+    async def budget(self, async_client, payer, instructions: Sequence, blockhash, pool_keys=None) -> ComputeBudget:
+        return ComputeBudget(self.unit_limit, self.unit_price)
+
+    async def template_budget(
+        self, async_client, template, amount_in: int, minimum_amount_out: int, blockhash, pool_keys=None,
+    ) -> ComputeBudget:
+        return ComputeBudget(self.unit_limit, self.unit_price)
+
+    async def batch_budget(
+        self, async_client, payer, instructions: Sequence, lookup_tables: Sequence, blockhash, pools: Sequence,
+    ) -> ComputeBudget:
+        return ComputeBudget(min(MAX_UNITS, self.unit_limit * max(1, len(pools))), self.unit_price)
+
+    def observe(self, async_client, signature, budget: ComputeBudget, confirmed: Optional[bool]) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+class _AdaptiveBase:
+    def _setup(
+        self,
+        compute_units: ComputeUnitCache,
+        fee_cache,
+        min_price: int,
+        max_price: int,
+        simulate: bool,
+        observe_rate: float,
+    ) -> None:
+        # Until a shape is measured (or with simulate off) its limit is the fixed unit_limit;
+        # observe_rate is the share of confirmed transactions looked up once the window is full.
+        self.compute_units = compute_units
+        self.fee_cache = fee_cache
+        self.min_price = min_price
+        self.max_price = max_price
+        self.simulate = simulate
+        self.observe_rate = observe_rate
+        self.simulations = 0
+        self.observed = 0
+        self._rng = random.Random()
+
+    def _key(self, instructions: Sequence, pool_keys) -> tuple:
+        return (str(pool_keys.amm_id) if pool_keys is not None else "", instruction_shape(instructions))
+
+    def _template_key(self, template, pool_keys) -> tuple:
+        return (str(pool_keys.amm_id) if pool_keys is not None else "", template.shape)
+
+    def _batch_key(self, instructions: Sequence, pools: Sequence) -> tuple:
+        return (",".join(str(pool_keys.amm_id) for pool_keys in pools), instruction_shape(instructions))
+
+    def _clamp(self, price: int) -> int:
+        return max(self.min_price, min(self.max_price, price))
+
+    def _simulated(self, key: tuple, value, default: int) -> int:
+        self.simulations += 1
+        if value.err is not None or not value.units_consumed:
+            logger.debug("Simulation failed (%s); using the default unit limit", value.err)
+            return default
+        self.compute_units.record(key, value.units_consumed)
+        return self.compute_units.limit(key)
+
+    def _wants_units(self, budget: ComputeBudget, confirmed: Optional[bool]) -> bool:
+        if budget.key is None or confirmed is None:
+            return False
+        return self.compute_units.samples(budget.key) < self.compute_units.window or self._rng.random() < self.observe_rate
+
+    def _observed(self, budget: ComputeBudget, transaction: Optional[dict]) -> None:
+        units = (transaction or {}).get("meta", {}).get("computeUnitsConsumed")
+        if not units:
+            return
+        self.observed += 1
+        if units >= budget.unit_limit:
+            # Ran out of compute: all it tells is that the shape needs more than its limit.
+            units = min(MAX_UNITS, budget.unit_limit * 2)
+        self.compute_units.record(budget.key, units)
+
+class AdaptiveFeePolicy(_AdaptiveBase, FeePolicy):
+    def __init__(
+        self,
+        unit_limit: int,
+        unit_price: int,
+        compute_units: ComputeUnitCache,
+        fee_cache: PriorityFeeCache,
+        min_price: int = 0,
+        max_price: int = 10_000_000,
+        simulate: bool = True,
+        observe_rate: float = 0.05,
+    ):
+        FeePolicy.__init__(self, unit_limit, unit_price)
+        self._setup(compute_units, fee_cache, min_price, max_price, simulate, observe_rate)
+        self._executor = ThreadPoolExecutor(max_workers=OBSERVE_WORKERS, thread_name_prefix="fee-observer")
+
+    def budget(self, client, payer, instructions: Sequence, blockhash, pool_keys=None) -> ComputeBudget:
+        key = self._key(instructions, pool_keys)
+
+        def build(unit_limit: int) -> VersionedTransaction:
+            message = MessageV0.try_compile(payer.pubkey(), with_compute_budget(instructions, unit_limit, 0), [], blockhash)
+            return VersionedTransaction(message, [payer])
+
+        return ComputeBudget(self._unit_limit(client, key, build), self._unit_price(pool_keys), key)
+
+    def template_budget(self, client, template, amount_in: int, minimum_amount_out: int, blockhash, pool_keys=None) -> ComputeBudget:
+        key = self._template_key(template, pool_keys)
+
+        def build(unit_limit: int) -> VersionedTransaction:
+            return VersionedTransaction.from_bytes(template.render(amount_in, minimum_amount_out, blockhash, unit_limit, 0))
+
+        return ComputeBudget(self._unit_limit(client, key, build), self._unit_price(pool_keys), key)
+
+    def batch_budget(self, client, payer, instructions: Sequence, lookup_tables: Sequence, blockhash, pools: Sequence) -> ComputeBudget:
+        # Measured per combination of pools; priced for the most contested of them.
+        key = self._batch_key(instructions, pools)
+
+        def build(unit_limit: int) -> VersionedTransaction:
+            message = MessageV0.try_compile(
+                payer.pubkey(), with_compute_budget(instructions, unit_limit, 0), lookup_tables, blockhash,
+            )
+            return VersionedTransaction(message, [payer])
+
+        default = min(MAX_UNITS, self.unit_limit * max(1, len(pools)))
+        unit_price = max((self._unit_price(pool_keys) for pool_keys in pools), default=self.unit_price)
+        return ComputeBudget(self._unit_limit(client, key, build, default), unit_price, key)
+
+    def observe(self, client, signature, budget: ComputeBudget, confirmed: Optional[bool]) -> None:
+        if self._wants_units(budget, confirmed):
+            self._executor.submit(self._fetch_units, client, signature, budget)
+
+    def stop(self) -> None:
+        self.fee_cache.stop()
+        self._executor.shutdown(wait=False)
+
+    def _unit_limit(self, client, key: tuple, build, default: Optional[int] = None) -> int:
+        default = default or self.unit_limit
+        unit_limit = self.compute_units.limit(key)
+        if unit_limit is not None or not self.simulate:
+            return unit_limit or default
+        try:
+            with span("simulate"):
+                value = client.simulate_transaction(build(MAX_UNITS)).value
+        except Exception as e:
+            logger.warning("Error simulating transaction: %s", e)
+            return default
+        return self._simulated(key, value, default)
+
+    def _unit_price(self, pool_keys) -> int:
+        try:
+            return self._clamp(self.fee_cache.get(fee_accounts(pool_keys)))
+        except Exception as e:
+            logger.warning("Error fetching priority fees: %s", e)
+            return self.unit_price
+
+    def _fetch_units(self, client, signature, budget: ComputeBudget) -> None:
+        try:
+            self._observed(budget, rpc_call(client, "getTransaction", [str(signature), GET_TRANSACTION_CONFIG]))
+        except Exception as e:
+            logger.debug("Error fetching compute units of %s: %s", signature, e)
+
+class AsyncAdaptiveFeePolicy(_AdaptiveBase, AsyncFeePolicy):
+    def __init__(
+        self,
+        unit_limit: int,
+        unit_price: int,
+        compute_units: ComputeUnitCache,
+        fee_cache: AsyncPriorityFeeCache,
+        min_price: int = 0,
+        max_price: int = 10_000_000,
+        simulate: bool = True,
+        observe_rate: float = 0.05,
+    ):
+        AsyncFeePolicy.__init__(self, unit_limit, unit_price)
+        self._setup(compute_units, fee_cache, min_price, max_price, simulate, observe_rate)
+        self._lookups = set()  # background getTransaction tasks, referenced until they finish
+
+    async def budget(self, async_client, payer, instructions: Sequence, blockhash, pool_keys=None) -> ComputeBudget:
+        key = self._key(instructions, pool_keys)
+
+        def build(unit_limit: int) -> VersionedTransaction:
+            message = MessageV0.try_compile(payer.pubkey(), with_compute_budget(instructions, unit_limit, 0), [], blockhash)
+            return VersionedTransaction(message, [payer])
+
+        # The simulation (first trade of a shape only) and the fee lookup overlap.
+        unit_limit, unit_price = await asyncio.gather(self._unit_limit(async_client, key, build), self._unit_price(pool_keys))
+        return ComputeBudget(unit_limit, unit_price, key)
+
+    async def template_budget(
+        self, async_client, template, amount_in: int, minimum_amount_out: int, blockhash, pool_keys=None,
+    ) -> ComputeBudget:
+        key = self._template_key(template, pool_keys)
+
+        def build(unit_limit: int) -> VersionedTransaction:
+            return VersionedTransaction.from_bytes(template.render(amount_in, minimum_amount_out, blockhash, unit_limit, 0))
+
+        unit_limit, unit_price = await asyncio.gather(self._unit_limit(async_client, key, build), self._unit_price(pool_keys))
+        return ComputeBudget(unit_limit, unit_price, key)
+
+    async def batch_budget(
+        self, async_client, payer, instructions: Sequence, lookup_tables: Sequence, blockhash, pools: Sequence,
+    ) -> ComputeBudget:
+        key = self._batch_key(instructions, pools)
+
+        def build(unit_limit: int) -> VersionedTransaction:
+            message = MessageV0.try_compile(
+                payer.pubkey(), with_compute_budget(instructions, unit_limit, 0), lookup_tables, blockhash,
+            )
+            return VersionedTransaction(message, [payer])
+
+        default = min(MAX_UNITS, self.unit_limit * max(1, len(pools)))
+        unit_limit, *unit_prices = await asyncio.gather(
+            self._unit_limit(async_client, key, build, default), *(self._unit_price(pool_keys) for pool_keys in pools),
+        )
+        return ComputeBudget(unit_limit, max(unit_prices, default=self.unit_price), key)
+
+    def observe(self, async_client, signature, budget: ComputeBudget, confirmed: Optional[bool]) -> None:
+        if self._wants_units(budget, confirmed):
+            task = asyncio.get_running_loop().create_task(self._fetch_units(async_client, signature, budget))
+            self._lookups.add(task)
+            task.add_done_callback(self._lookups.discard)
+
+    async def stop(self) -> None:
+        await self.fee_cache.stop()
+        for task in list(self._lookups):
+            task.cancel()
+
+    async def _unit_limit(self, async_client, key: tuple, build, default: Optional[int] = None) -> int:
+        default = default or self.unit_limit
+        unit_limit = self.compute_units.limit(key)
+        if unit_limit is not None or not self.simulate:
+            return unit_limit or default
+        try:
+            with span("simulate"):
+                value = (await async_client.simulate_transaction(build(MAX_UNITS))).value
+        except Exception as e:
+            logger.warning("Error simulating transaction: %s", e)
+            return default
+        return self._simulated(key, value, default)
+
+    async def _unit_price(self, pool_keys) -> int:
+        try:
+            return self._clamp(await self.fee_cache.get(fee_accounts(pool_keys)))
+        except Exception as e:
+            logger.warning("Error fetching priority fees: %s", e)
+            return self.unit_price
+
+    async def _fetch_units(self, async_client, signature, budget: ComputeBudget) -> None:
+        try:
+            self._observed(budget, await async_rpc_call(async_client, "getTransaction", [str(signature), GET_TRANSACTION_CONFIG]))
+        except Exception as e:
+            logger.debug("Error fetching compute units of %s: %s", signature, e)
@@ -0,0 +1,213 @@
+import asyncio
+import contextvars
+import functools
+import json
+import threading
+import time
+from bisect import bisect_left
+from typing import Optional
+
+# Per-phase timings for the trade pipeline. buy/sell wrap each phase (pool keys, reserves,
+# quote, build, compile, send, confirm) in span("phase"). By default spans go to
+# NullMetrics, where span() hands back one shared no-op context manager, so an
+# uninstrumented trade only pays a function call per phase. enable() installs a Metrics
+# recorder instead: every span adds its perf_counter wall time to a fixed-bucket histogram
+# and counts the RPC calls made while it is the innermost open span (the transport reports
+# them through count_rpc). Nested spans pass their RPC counts up to the enclosing span.
+#
+# Snapshots are plain dicts; export_json and export_prometheus turn a recorder into text,
+# and any other exporter only needs the same (metrics) -> str shape.
+
+# Bucket upper bounds: 1 us to ~67 s, four buckets per doubling (<= 19% relative error).
+BUCKET_BOUNDS = tuple(1e-6 * 2 ** (i / 4) for i in range(105))
+EXPORT_BOUNDS = BUCKET_BOUNDS[::4]  # one Prometheus bucket per doubling
+PERCENTILES = (50, 90, 99)
+
+_current_span = contextvars.ContextVar("raydium_py_span", default=None)
+
+class Histogram:
+    __slots__ = ("counts", "count", "total", "max", "_lock")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, value: float) -> None:
+        index = bisect_left(BUCKET_BOUNDS, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += value
+            if value > self.max:
+                self.max = value
+
+    def percentile(self, q: float) -> float:
+        # Upper bound of the bucket holding the q-th percentile, capped at the largest sample.
+        if not self.count:
+            return 0.0
+        rank, seen = q / 100 * self.count, 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return min(BUCKET_BOUNDS[index] if index < len(BUCKET_BOUNDS) else self.max, self.max)
+        return self.max
+
+    def cumulative(self, bounds: tuple) -> list:
+        counts, total, index = [], 0, 0
+        for bound in bounds:
+            while index < len(BUCKET_BOUNDS) and BUCKET_BOUNDS[index] <= bound * (1 + 1e-9):
+                total += self.counts[index]
+                index += 1
+            counts.append(total)
+        return counts
+
+class _Span:
+    __slots__ = ("metrics", "name", "rpc_calls", "_started", "_token")
+
+    def __init__(self, metrics, name: str):
+        self.metrics = metrics
+        self.name = name
+        self.rpc_calls = 0
+
+    def __enter__(self):
+        self._token = _current_span.set(self)
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self._started
+        _current_span.reset(self._token)
+        parent = _current_span.get()
+        if parent is not None:
+            parent.rpc_calls += self.rpc_calls
+        self.metrics.record(self.name, elapsed, self.rpc_calls)
+        return False
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+NULL_SPAN = _NullSpan()
+
+class NullMetrics:
+    enabled = False
+
+    def span(self, name: str) -> _NullSpan:
+        return NULL_SPAN
+
+    def record(self, name: str, seconds: float, rpc_calls: int = 0) -> None:
+        pass
+
+    def snapshot(self) -> dict:
+        return {}
+
+    def reset(self) -> None:
+        pass
+
+class Metrics:
+    enabled = True
+
+    def __init__(self):
+        self.histograms = {}
+        self.rpc_calls = {}
+        self._lock = threading.Lock()
+
+    def span(self, name: str) -> _Span:
+        return _Span(self, name)
+
+    def record(self, name: str, seconds: float, rpc_calls: int = 0) -> None:
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(name, Histogram())
+        histogram.record(seconds)
+        if rpc_calls:
+            with self._lock:
+                self.rpc_calls[name] = self.rpc_calls.get(name, 0) + rpc_calls
+
+    def snapshot(self) -> dict:
+        phases = {}
+        for name, histogram in list(self.histograms.items()):
+            phase = {
+                "count": histogram.count,
+                "sum_s": histogram.total,
+                "max_s": histogram.max,
+                "rpc_calls": self.rpc_calls.get(name, 0),
+            }
+            for q in PERCENTILES:
+                phase[f"p{q}_s"] = histogram.percentile(q)
+            phases[name] = phase
+        return phases
+
+    def reset(self) -> None:
+        with self._lock:
+            self.histograms = {}
+            self.rpc_calls = {}
+
+_metrics = NullMetrics()
+
+def enable(metrics: Optional[Metrics] = None) -> Metrics:
+    global _metrics
+    _metrics = metrics if metrics is not None else Metrics()
+    return _metrics
+
+def disable() -> None:
+    global _metrics
+    _metrics = NullMetrics()
+
+def get_metrics():
+    return _metrics
+
+def span(name: str):
+    return _metrics.span(name)
+
+def timed(name: str):
+    # Decorator form of span() for whole functions, sync or async.
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with _metrics.span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with _metrics.span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def count_rpc(calls: int = 1) -> None:
+    current = _current_span.get()
+    if current is not None:
+        current.rpc_calls += calls
+
+def export_json(metrics=None) -> str:
+    return json.dumps((metrics or _metrics).snapshot(), indent=2, sort_keys=True)
+
+def export_prometheus(metrics=None, prefix: str = "raydium_py") -> str:
+    metrics = metrics or _metrics
+    lines = [
+        f"# HELP {prefix}_phase_seconds Wall time of each trade pipeline phase.",
+        f"# TYPE {prefix}_phase_seconds histogram",
+    ]
+    for name, histogram in sorted(getattr(metrics, "histograms", {}).items()):
+        for bound, count in zip(EXPORT_BOUNDS, histogram.cumulative(EXPORT_BOUNDS)):
+            lines.append(f'{prefix}_phase_seconds_bucket{{phase="{name}",le="{bound:.6g}"}} {count}')
+        lines.append(f'{prefix}_phase_seconds_bucket{{phase="{name}",le="+Inf"}} {histogram.count}')
+        lines.append(f'{prefix}_phase_seconds_sum{{phase="{name}"}} {histogram.total:.9f}')
+        lines.append(f'{prefix}_phase_seconds_count{{phase="{name}"}} {histogram.count}')
+    lines.append(f"# HELP {prefix}_phase_rpc_calls_total RPC calls made inside each phase.")
+    lines.append(f"# TYPE {prefix}_phase_rpc_calls_total counter")
+    for name, calls in sorted(getattr(metrics, "rpc_calls", {}).items()):
+        lines.append(f'{prefix}_phase_rpc_calls_total{{phase="{name}"}} {calls}')
+    return "\n".join(lines) + "\n"
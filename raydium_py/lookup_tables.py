@@ -0,0 +1,224 @@
+import json
+import logging
+import os
+import struct
+import threading
+from typing import Iterable, Optional, Sequence
+from solana.rpc.commitment import Processed
+from solana.rpc.types import MemcmpOpts
+from solana.transaction import AccountMeta
+from solders.address_lookup_table_account import (  # type: ignore
+    ID as LOOKUP_TABLE_PROGRAM,
+    AddressLookupTable,
+    AddressLookupTableAccount,
+    derive_lookup_table_address,
+)
+from solders.instruction import Instruction  # type: ignore
+from solders.pubkey import Pubkey  # type: ignore
+from solders.system_program import ID as SYSTEM_PROGRAM
+from constants import OPEN_BOOK_PROGRAM, RAY_AUTHORITY_V4, TOKEN_PROGRAM_ID
+from pool_keys import PoolKeys
+
+logger = logging.getLogger(__name__)
+
+# Address lookup tables owned by the wallet, for batch swaps (batch_swaps.py). A v0
+# transaction names an account in a table with a one-byte index instead of its 32-byte
+# address, which is what lets several swaps of 18 accounts each share one transaction.
+#
+# LookupTableRegistry remembers which tables the wallet created and what they hold, per
+# cluster, in LOOKUP_TABLES_PATH (JSON, like cluster_constants.json); sync() re-reads their
+# contents from the chain once per process, and looks the wallet's tables up by authority
+# when it knows none. extend_instructions() returns the transactions that add missing
+# addresses, filling the last table before creating a new one, and cover() picks the tables
+# that hold a batch's accounts.
+#
+# Only accounts can be looked up: program ids (RAY_V4, the token program when it is invoked)
+# and signers always stay in the transaction itself. Addresses added to a table can be used
+# from the next slot on, which has passed by the time their transaction is confirmed.
+
+MAX_ADDRESSES = 256  # per table
+EXTEND_CHUNK = 24  # addresses per extend transaction, well under the packet size
+AUTHORITY_OFFSET = 22  # in the table account: u32 state, u64 deactivation slot, u64 last extended slot, u8 start, option tag
+ACTIVE = 2**64 - 1  # deactivation slot of a table that is not being closed
+STATIC_ADDRESSES = (TOKEN_PROGRAM_ID, RAY_AUTHORITY_V4, OPEN_BOOK_PROGRAM)
+CREATE_LOOKUP_TABLE = 0
+EXTEND_LOOKUP_TABLE = 2
+
+def create_lookup_table(authority: Pubkey, payer: Pubkey, recent_slot: int) -> tuple:
+    # (instruction, table address). solders has no builders for the lookup table program.
+    table, bump = derive_lookup_table_address(authority, recent_slot)
+    data = struct.pack("<IQB", CREATE_LOOKUP_TABLE, recent_slot, bump)
+    return Instruction(LOOKUP_TABLE_PROGRAM, data, _accounts(table, authority, payer)), table
+
+def extend_lookup_table(table: Pubkey, authority: Pubkey, payer: Pubkey, addresses: Sequence[Pubkey]) -> Instruction:
+    data = struct.pack("<IQ", EXTEND_LOOKUP_TABLE, len(addresses)) + b"".join(bytes(address) for address in addresses)
+    return Instruction(LOOKUP_TABLE_PROGRAM, data, _accounts(table, authority, payer))
+
+def _accounts(table: Pubkey, authority: Pubkey, payer: Pubkey) -> list:
+    return [
+        AccountMeta(pubkey=table, is_signer=False, is_writable=True),
+        AccountMeta(pubkey=authority, is_signer=True, is_writable=False),
+        AccountMeta(pubkey=payer, is_signer=True, is_writable=True),
+        AccountMeta(pubkey=SYSTEM_PROGRAM, is_signer=False, is_writable=False),
+    ]
+
+def pool_addresses(pool_keys: PoolKeys) -> list:
+    # The swap accounts of a pool that never change.
+    return [
+        pool_keys.amm_id, pool_keys.open_orders, pool_keys.target_orders, pool_keys.base_vault,
+        pool_keys.quote_vault, pool_keys.market_id, pool_keys.bids, pool_keys.asks, pool_keys.event_queue,
+        pool_keys.market_base_vault, pool_keys.market_quote_vault, pool_keys.market_authority,
+    ]
+
+class LookupTableRegistry:
+    def __init__(self, authority: Pubkey, cluster: str, path: Optional[str] = None):
+        self.authority = authority
+        self.cluster = cluster
+        self.path = path
+        self.synced = False
+        self._tables = {}  # str(table) -> list of Pubkey, in table order
+        self._index = {}  # str(address) -> str(table) holding it
+        self._lock = threading.Lock()
+        self._load()
+
+    @property
+    def tables(self) -> list:
+        return [Pubkey.from_string(table) for table in self._tables]
+
+    def missing(self, addresses: Iterable[Pubkey]) -> list:
+        seen, missing = set(), []
+        for address in addresses:
+            key = str(address)
+            if key not in self._index and key not in seen:
+                seen.add(key)
+                missing.append(address)
+        return missing
+
+    def cover(self, addresses: Iterable[Pubkey]) -> list:
+        # The tables holding any of addresses (each address is looked up in the first table
+        # that has it), most used first, as AddressLookupTableAccounts for try_compile.
+        with self._lock:
+            counts = {}
+            for address in {str(address) for address in addresses}:
+                table = self._index.get(address)
+                if table is not None:
+                    counts[table] = counts.get(table, 0) + 1
+            chosen = sorted(counts, key=counts.get, reverse=True)
+            return [
+                AddressLookupTableAccount(Pubkey.from_string(table), list(self._tables[table]))
+                for table in chosen
+            ]
+
+    def extend_instructions(self, payer: Pubkey, addresses: Sequence[Pubkey], recent_slot: int) -> list:
+        # [(table, added addresses, instructions)], one entry per transaction to send. Pass
+        # each confirmed entry to record(). A new table is created in its first transaction;
+        # its address derives from recent_slot, so one call creates at most one table and
+        # addresses that do not fit are left for the next call.
+        addresses = self.missing(addresses)
+        transactions = []
+        with self._lock:
+            table, size, created = None, MAX_ADDRESSES, False
+            if self._tables:
+                last = next(reversed(self._tables))
+                table, size = Pubkey.from_string(last), len(self._tables[last])
+        while addresses:
+            instructions = []
+            if size >= MAX_ADDRESSES:
+                if created:
+                    break
+                create, table = create_lookup_table(self.authority, payer, recent_slot)
+                instructions.append(create)
+                size, created = 0, True
+            chunk = addresses[:min(EXTEND_CHUNK, MAX_ADDRESSES - size)]
+            addresses = addresses[len(chunk):]
+            instructions.append(extend_lookup_table(table, self.authority, payer, chunk))
+            transactions.append((table, chunk, instructions))
+            size += len(chunk)
+        return transactions
+
+    def record(self, table: Pubkey, addresses: Sequence[Pubkey]) -> None:
+        with self._lock:
+            contents = self._tables.setdefault(str(table), [])
+            for address in addresses:
+                contents.append(address)
+                self._index.setdefault(str(address), str(table))
+        self._save()
+
+    def sync(self, client) -> None:
+        # Replaces the local contents with what the tables hold on chain; tables that are
+        # gone or deactivated are forgotten.
+        if self._tables:
+            tables = self.tables
+            response = client.get_multiple_accounts(tables, commitment=Processed)
+            self._apply_accounts(tables, response.value)
+        else:
+            response = client.get_program_accounts(LOOKUP_TABLE_PROGRAM, **self._discover_options())
+            self._apply_accounts([account.pubkey for account in response.value], [account.account for account in response.value])
+        self.synced = True
+
+    async def async_sync(self, async_client) -> None:
+        if self._tables:
+            tables = self.tables
+            response = await async_client.get_multiple_accounts(tables, commitment=Processed)
+            self._apply_accounts(tables, response.value)
+        else:
+            response = await async_client.get_program_accounts(LOOKUP_TABLE_PROGRAM, **self._discover_options())
+            self._apply_accounts([account.pubkey for account in response.value], [account.account for account in response.value])
+        self.synced = True
+
+    def _discover_options(self) -> dict:
+        return dict(
+            commitment=Processed, encoding="base64", filters=[MemcmpOpts(offset=AUTHORITY_OFFSET, bytes=str(self.authority))],
+        )
+
+    def _apply_accounts(self, tables: list, accounts: list) -> None:
+        with self._lock:
+            self._tables, self._index = {}, {}
+            for table, account in zip(tables, accounts):
+                if account is None:
+                    logger.info("Lookup table %s no longer exists.", table)
+                    continue
+                try:
+                    state = AddressLookupTable.deserialize(bytes(account.data))
+                except Exception as e:
+                    logger.warning("Error decoding lookup table %s: %s", table, e)
+                    continue
+                if state.meta.deactivation_slot != ACTIVE or state.meta.authority != self.authority:
+                    continue
+                self._tables[str(table)] = list(state.addresses)
+                for address in state.addresses:
+                    self._index.setdefault(str(address), str(table))
+        self._save()
+
+    def _load(self) -> None:
+        if not self.path:
+            return
+        try:
+            with open(self.path, "r") as f:
+                tables = json.load(f).get(self.cluster, {}).get(str(self.authority), {})
+        except (OSError, ValueError):
+            return
+        for table, addresses in tables.items():
+            self._tables[table] = [Pubkey.from_string(address) for address in addresses]
+            for address in addresses:
+                self._index.setdefault(address, table)
+
+    def _save(self) -> None:
+        if not self.path:
+            return
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        with self._lock:
+            tables = {table: [str(address) for address in addresses] for table, addresses in self._tables.items()}
+        data.setdefault(self.cluster, {})[str(self.authority)] = tables
+
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(data, f, indent=4)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning("Error writing lookup tables: %s", e)
@@ -0,0 +1,580 @@
+import asyncio
+import base64
+import hashlib
+import json
+import random
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+import websockets
+from solders.address_lookup_table_account import ID as LOOKUP_TABLE_PROGRAM  # type: ignore
+from solders.pubkey import Pubkey  # type: ignore
+from solders.transaction import VersionedTransaction  # type: ignore
+from constants import OPEN_BOOK_PROGRAM, RAY_V4, TOKEN_PROGRAM_ID, WSOL
+from layouts import ACCOUNT_LAYOUT, LIQUIDITY_STATE_LAYOUT_V4, MARKET_STATE_LAYOUT_V3
+
+# Deterministic stand-in for a Solana JSON-RPC node, for the benchmarks. It serves canned
+# AMM v4 / OpenBook market / vault / token accounts generated from a seed, answers the
+# handful of methods the trading pipeline uses (single and batch requests, keep-alive),
+# and sleeps latency + uniform(0, jitter) seconds per HTTP request. Sent transactions are
+# not executed; they only become "confirmed" forward_delay + confirm_delay seconds after
+# arrival, unless the node drops them (drop_rate, like a lost packet on the way to the
+# leader). Nodes built with the same seed and one shared ledger dict act as several RPC
+# endpoints of one cluster: a transaction that lands through any of them is confirmed on all.
+#
+# Compute and fees: a transaction uses the sum of COMPUTE_UNITS of its instructions' programs
+# and fails (ComputationalBudgetExceeded, fee still charged) if that is above its unit limit.
+# With a market_fee set, getRecentPrioritizationFees reports fees scattered around it and a
+# transaction priced below it lands underpriced_delay seconds later.
+#
+# With a rate_limit (calls per second, a batch counting each of its calls, bursts of up to one
+# second's worth), requests over the limit are answered with HTTP 429 like a paid RPC plan.
+# With reject_batches, batch requests are answered with HTTP 403, like a free plan.
+#
+# Address lookup tables: create and extend instructions take effect when their transaction is
+# accepted, and sendTransaction resolves a transaction's lookups like the leader would. It
+# rejects transactions over the packet size or the account lock limit, or that look up a
+# table or index that does not exist.
+#
+# MockWsNode is the websocket side, for ReserveStream and PoolDetector: it answers
+# accountSubscribe/programSubscribe, pushes the notifications the caller makes up with
+# notify() (program subscribers get every one; filters are not applied), and drops every
+# connection on disconnect() to exercise reconnects and resyncs.
+
+RENT_EXEMPT_MINIMUM = 2_039_280
+COMPUTE_UNITS = {  # per instruction, by program
+    "ComputeBudget111111111111111111111111111111": 150,
+    "11111111111111111111111111111111": 1_500,
+    str(TOKEN_PROGRAM_ID): 3_500,
+    "ATokenGPvbdGVxr1b2hvZbsiqW5xWH25efTNsLJA8knL": 24_000,
+    str(RAY_V4): 31_000,
+    str(LOOKUP_TABLE_PROGRAM): 750,
+}
+DEFAULT_UNITS_PER_INSTRUCTION = 200_000
+SLOT_SECONDS = 0.4
+BLOCKHASH_VALIDITY = 150
+PACKET_DATA_SIZE = 1232
+MAX_ACCOUNT_LOCKS = 64
+LOOKUP_TABLE_META_SIZE = 56
+
+class MockRpcError(Exception):
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+def token_account_data(mint: Pubkey, owner: Pubkey, amount: int) -> bytes:
+    return ACCOUNT_LAYOUT.build(dict(
+        mint=bytes(mint), owner=bytes(owner), amount=amount, delegate_option=0, delegate=bytes(32), state=1,
+        is_native_option=0, is_native=0, delegated_amount=0, close_authority_option=0, close_authority=bytes(32),
+    ))
+
+def vault_signer_nonce(market: Pubkey) -> Optional[int]:
+    # Same derivation as Pubkey.create_program_address, without its panic on invalid seeds.
+    for nonce in range(256):
+        digest = hashlib.sha256(
+            bytes(market) + struct.pack("<Q", nonce) + bytes(OPEN_BOOK_PROGRAM) + b"ProgramDerivedAddress"
+        ).digest()
+        if not Pubkey(digest).is_on_curve():
+            return nonce
+    return None
+
+class MockPool:
+    def __init__(self, rng: random.Random, token_reserve: int, sol_reserve: int, token_decimals: int = 6):
+        def new_key() -> Pubkey:
+            return Pubkey(rng.randbytes(32))
+
+        self.amm_id, self.mint = new_key(), new_key()
+        self.market, nonce = None, None
+        while nonce is None:
+            self.market = new_key()
+            nonce = vault_signer_nonce(self.market)
+        self.base_vault, self.quote_vault = new_key(), new_key()
+        self.token_reserve, self.sol_reserve = token_reserve, sol_reserve
+
+        amm_fields = {subcon.name: 0 for subcon in LIQUIDITY_STATE_LAYOUT_V4.subcons}
+        amm_fields.update(
+            status=6, coinDecimals=token_decimals, pcDecimals=9,
+            tradeFeeNumerator=25, tradeFeeDenominator=10_000, swapFeeNumerator=25, swapFeeDenominator=10_000,
+            poolCoinTokenAccount=bytes(self.base_vault), poolPcTokenAccount=bytes(self.quote_vault),
+            coinMintAddress=bytes(self.mint), pcMintAddress=bytes(WSOL), lpMintAddress=bytes(new_key()),
+            ammOpenOrders=bytes(new_key()), serumMarket=bytes(self.market), serumProgramId=bytes(OPEN_BOOK_PROGRAM),
+            ammTargetOrders=bytes(new_key()), poolWithdrawQueue=bytes(32), poolTempLpTokenAccount=bytes(32),
+            ammOwner=bytes(32), pnlOwner=bytes(32),
+        )
+        self.amm_data = LIQUIDITY_STATE_LAYOUT_V4.build(amm_fields)
+        self.market_data = MARKET_STATE_LAYOUT_V3.build(dict(
+            account_flags=dict(
+                initialized=True, market=True, open_orders=False, request_queue=False,
+                event_queue=False, bids=False, asks=False,
+            ),
+            own_address=bytes(self.market), vault_signer_nonce=nonce,
+            base_mint=bytes(self.mint), quote_mint=bytes(WSOL), base_vault=bytes(new_key()),
+            base_deposits_total=0, base_fees_accrued=0, quote_vault=bytes(new_key()),
+            quote_deposits_total=0, quote_fees_accrued=0, quote_dust_threshold=0,
+            request_queue=bytes(new_key()), event_queue=bytes(new_key()), bids=bytes(new_key()), asks=bytes(new_key()),
+            base_lot_size=1, quote_lot_size=1, fee_rate_bps=0, referrer_rebate_accrued=0,
+        ))
+
+class MockRpcNode:
+    def __init__(
+        self,
+        seed: int = 0,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        confirm_delay: float = 0.0,
+        ledger: Optional[dict] = None,
+        drop_rate: float = 0.0,
+        forward_delay: float = 0.0,
+        rate_limit: Optional[float] = None,
+        reject_batches: bool = False,
+    ):
+        self.rng = random.Random(seed)
+        self._jitter_rng = random.Random(seed + 1)
+        self.drop_rng = random.Random(seed + 2)  # reseed to make nodes of one seed drop differently
+        self.latency = latency
+        self.jitter = jitter
+        self.confirm_delay = confirm_delay
+        self.drop_rate = drop_rate
+        self.forward_delay = forward_delay
+        self.rate_limit = rate_limit
+        self.rate_limited = 0  # requests answered with 429
+        self.reject_batches = reject_batches
+        self.rejected_batches = 0  # batch requests answered with 403
+        self._allowance = rate_limit or 0.0
+        self._allowance_at = time.monotonic()
+        self.blockhash_validity = BLOCKHASH_VALIDITY
+        self.market_fee = 0  # micro-lamports per compute unit
+        self.underpriced_delay = 0.0
+        self.budgets = []  # (unit_limit, unit_price, units_consumed) of every accepted transaction
+        self._fee_rng = random.Random(seed + 3)
+        self.accounts = {}  # str(pubkey) -> (str(owner), data, lamports)
+        self.calls = {}
+        self.requests = 0
+        self.connections = 0
+        self.dropped = 0
+        self._landed = {} if ledger is None else ledger  # str(signature) -> (confirmed_at, units, err)
+        self._started = time.monotonic()
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def add_account(self, pubkey: Pubkey, owner: Pubkey, data: bytes, lamports: int = RENT_EXEMPT_MINIMUM) -> None:
+        self.accounts[str(pubkey)] = (str(owner), bytes(data), lamports)
+
+    def add_pool(self, token_reserve: int = 10**15, sol_reserve: int = 5 * 10**12, token_decimals: int = 6) -> MockPool:
+        pool = MockPool(self.rng, token_reserve, sol_reserve, token_decimals)
+        self.add_account(pool.amm_id, RAY_V4, pool.amm_data, 6_124_800)
+        self.add_account(pool.market, OPEN_BOOK_PROGRAM, pool.market_data, 3_591_360)
+        self.add_account(pool.base_vault, TOKEN_PROGRAM_ID, token_account_data(pool.mint, Pubkey.default(), token_reserve))
+        self.add_account(pool.quote_vault, TOKEN_PROGRAM_ID, token_account_data(WSOL, Pubkey.default(), sol_reserve))
+        return pool
+
+    def add_token_account(self, address: Pubkey, mint: Pubkey, owner: Pubkey, amount: int) -> None:
+        self.add_account(address, TOKEN_PROGRAM_ID, token_account_data(mint, owner, amount))
+
+    def reset_counters(self) -> None:
+        with self._lock:
+            self.calls = {}
+            self.requests = 0
+            self.connections = 0
+            self.dropped = 0
+            self.rate_limited = 0
+            self.rejected_batches = 0
+            self.budgets = []
+
+    def start(self, port: int = 0) -> "MockRpcNode":
+        node = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True  # headers and body are separate writes
+
+            def log_message(self, *args):
+                pass
+
+            def setup(self):
+                super().setup()
+                with node._lock:
+                    node.connections += 1
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                node._sleep()
+                if isinstance(body, list) and node.reject_batches:
+                    with node._lock:
+                        node.rejected_batches += 1
+                    data = json.dumps({"error": {"code": 403, "message": "Batch requests are not allowed"}}).encode()
+                    self.send_response(403)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                    return
+                if not node._allow(len(body) if isinstance(body, list) else 1):
+                    self.send_response(429)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                result = [node.handle(r) for r in body] if isinstance(body, list) else node.handle(body)
+                data = json.dumps(result).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                try:
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # the client went away, e.g. a poll cancelled on shutdown
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def handle(self, request: dict) -> dict:
+        method, params = request["method"], request.get("params", [])
+        with self._lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+        handler = getattr(self, f"_rpc_{method}", None)
+        if handler is None:
+            return {"jsonrpc": "2.0", "id": request.get("id"), "error": {"code": -32601, "message": "Method not found"}}
+        try:
+            return {"jsonrpc": "2.0", "id": request.get("id"), "result": handler(params)}
+        except MockRpcError as e:
+            return {"jsonrpc": "2.0", "id": request.get("id"), "error": {"code": e.code, "message": e.message}}
+
+    def _sleep(self) -> None:
+        with self._lock:
+            self.requests += 1
+            delay = self.latency + (self._jitter_rng.uniform(0, self.jitter) if self.jitter else 0)
+        if delay:
+            time.sleep(delay)
+
+    def _allow(self, calls: int) -> bool:
+        if not self.rate_limit:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            self._allowance = min(self.rate_limit, self._allowance + (now - self._allowance_at) * self.rate_limit)
+            self._allowance_at = now
+            if self._allowance < calls:
+                self.rate_limited += 1
+                return False
+            self._allowance -= calls
+            return True
+
+    def _slot(self) -> int:
+        return 1_000 + int((time.monotonic() - self._started) / SLOT_SECONDS)
+
+    def _context(self) -> dict:
+        return {"slot": self._slot()}
+
+    def _account_json(self, key: str, data_slice: Optional[dict] = None) -> Optional[dict]:
+        account = self.accounts.get(key)
+        if account is None:
+            return None
+        owner, data, lamports = account
+        if data_slice:
+            data = data[data_slice["offset"]:data_slice["offset"] + data_slice["length"]]
+        return {
+            "data": [base64.b64encode(data).decode(), "base64"],
+            "executable": False, "lamports": lamports, "owner": owner, "rentEpoch": 0, "space": len(account[1]),
+        }
+
+    def _rpc_getAccountInfo(self, params: list) -> dict:
+        return {"context": self._context(), "value": self._account_json(params[0])}
+
+    def _rpc_getMultipleAccounts(self, params: list) -> dict:
+        return {"context": self._context(), "value": [self._account_json(key) for key in params[0]]}
+
+    def _rpc_getMinimumBalanceForRentExemption(self, params: list) -> int:
+        return RENT_EXEMPT_MINIMUM
+
+    def _rpc_getSlot(self, params: list) -> int:
+        return self._slot()
+
+    def _rpc_getBlockHeight(self, params: list) -> int:
+        return self._slot() - 100
+
+    def _rpc_getLatestBlockhash(self, params: list) -> dict:
+        slot = self._slot()
+        blockhash = Pubkey(hashlib.sha256(struct.pack("<Q", slot)).digest())
+        return {"context": {"slot": slot}, "value": {
+            "blockhash": str(blockhash), "lastValidBlockHeight": slot - 100 + self.blockhash_validity,
+        }}
+
+    def _rpc_getTokenAccountsByOwner(self, params: list) -> dict:
+        owner, account_filter = params[0], params[1]
+        accounts = []
+        for key, (program, data, _) in self.accounts.items():
+            if program != str(TOKEN_PROGRAM_ID) or len(data) != ACCOUNT_LAYOUT.sizeof():
+                continue
+            account = ACCOUNT_LAYOUT.parse(data)
+            if str(Pubkey.from_bytes(account.owner)) != owner:
+                continue
+            if "mint" in account_filter and str(Pubkey.from_bytes(account.mint)) != account_filter["mint"]:
+                continue
+            accounts.append({"pubkey": key, "account": self._account_json(key)})
+        return {"context": self._context(), "value": accounts}
+
+    def _rpc_getProgramAccounts(self, params: list) -> list:
+        config = params[1] if len(params) > 1 else {}
+        accounts = []
+        for key, (program, data, _) in self.accounts.items():
+            if program != params[0]:
+                continue
+            matched = True
+            for account_filter in config.get("filters", []):
+                if "dataSize" in account_filter and len(data) != account_filter["dataSize"]:
+                    matched = False
+                if "memcmp" in account_filter:
+                    offset = account_filter["memcmp"]["offset"]
+                    expected = bytes(Pubkey.from_string(account_filter["memcmp"]["bytes"]))
+                    if data[offset:offset + len(expected)] != expected:
+                        matched = False
+            if matched:
+                accounts.append({"pubkey": key, "account": self._account_json(key, config.get("dataSlice"))})
+        return accounts
+
+    def _execute(self, transaction: VersionedTransaction) -> tuple:
+        # (unit_limit, unit_price, units_consumed, err) under the compute budget it asked for.
+        message = transaction.message
+        keys = message.account_keys
+        unit_limit, unit_price, units, count = None, 0, 0, 0
+        for instruction in message.instructions:
+            program = str(keys[instruction.program_id_index])
+            data = bytes(instruction.data)
+            units += COMPUTE_UNITS.get(program, DEFAULT_UNITS_PER_INSTRUCTION)
+            if program != "ComputeBudget111111111111111111111111111111":
+                count += 1
+            elif data[:1] == b"\x02":
+                unit_limit = struct.unpack_from("<I", data, 1)[0]
+            elif data[:1] == b"\x03":
+                unit_price = struct.unpack_from("<Q", data, 1)[0]
+        if unit_limit is None:
+            unit_limit = min(1_400_000, DEFAULT_UNITS_PER_INSTRUCTION * count)
+        if units > unit_limit:
+            return unit_limit, unit_price, unit_limit, {"InstructionError": [0, "ComputationalBudgetExceeded"]}
+        return unit_limit, unit_price, units, None
+
+    def _check_accounts(self, transaction: VersionedTransaction) -> None:
+        message, locks = transaction.message, len(transaction.message.account_keys)
+        for lookup in getattr(message, "address_table_lookups", []):
+            account = self.accounts.get(str(lookup.account_key))
+            if account is None or account[0] != str(LOOKUP_TABLE_PROGRAM):
+                raise MockRpcError(-32602, "invalid transaction: Transaction loads an address table account that doesn't exist")
+            size = (len(account[1]) - LOOKUP_TABLE_META_SIZE) // 32
+            indexes = [*lookup.writable_indexes, *lookup.readonly_indexes]
+            if any(index >= size for index in indexes):
+                raise MockRpcError(-32602, "invalid transaction: Transaction address table lookup uses an invalid index")
+            locks += len(indexes)
+        if locks > MAX_ACCOUNT_LOCKS:
+            raise MockRpcError(-32602, "invalid transaction: Transaction locked too many accounts")
+
+    def _apply_lookup_tables(self, transaction: VersionedTransaction) -> None:
+        # Lookup table program instructions, assuming they are well formed.
+        keys = transaction.message.account_keys
+        for instruction in transaction.message.instructions:
+            if keys[instruction.program_id_index] != LOOKUP_TABLE_PROGRAM:
+                continue
+            data, accounts = bytes(instruction.data), bytes(instruction.accounts)
+            table = str(keys[accounts[0]])
+            if data[:4] == struct.pack("<I", 0):
+                authority = bytes(keys[accounts[1]])
+                meta = struct.pack("<IQQBB", 1, 2**64 - 1, 0, 0, 1) + authority + bytes(2)
+                self.accounts[table] = (str(LOOKUP_TABLE_PROGRAM), meta, 1_000_000)
+            elif data[:4] == struct.pack("<I", 2) and table in self.accounts:
+                owner, table_data, lamports = self.accounts[table]
+                count = struct.unpack_from("<Q", data, 4)[0]
+                table_data = table_data[:12] + struct.pack("<Q", self._slot()) + table_data[20:] + data[12:12 + 32 * count]
+                self.accounts[table] = (owner, table_data, lamports)
+
+    def _rpc_sendTransaction(self, params: list) -> str:
+        raw = base64.b64decode(params[0])
+        if len(raw) > PACKET_DATA_SIZE:
+            raise MockRpcError(-32602, f"base64 encoded solana_sdk::transaction::versioned::VersionedTransaction too large: {len(raw)} bytes (max: {PACKET_DATA_SIZE} bytes)")
+        transaction = VersionedTransaction.from_bytes(raw)
+        signature = str(transaction.signatures[0])
+        unit_limit, unit_price, units, err = self._execute(transaction)
+        with self._lock:
+            self._check_accounts(transaction)
+            if self.drop_rate and self.drop_rng.random() < self.drop_rate:
+                self.dropped += 1
+                return signature
+            if err is None and signature not in self._landed:
+                self._apply_lookup_tables(transaction)
+            self.budgets.append((unit_limit, unit_price, units))
+            confirmed_at = time.monotonic() + self.forward_delay + self.confirm_delay
+            if unit_price < self.market_fee:
+                confirmed_at += self.underpriced_delay
+            landed = self._landed.get(signature)
+            if landed is None or confirmed_at < landed[0]:
+                self._landed[signature] = (confirmed_at, units, err)
+        return signature
+
+    def _rpc_simulateTransaction(self, params: list) -> dict:
+        _, _, units, err = self._execute(VersionedTransaction.from_bytes(base64.b64decode(params[0])))
+        return {
+            "context": self._context(),
+            "value": {"err": err, "logs": [], "accounts": None, "unitsConsumed": units, "returnData": None},
+        }
+
+    def _rpc_getRecentPrioritizationFees(self, params: list) -> list:
+        slot = self._slot()
+        with self._lock:
+            return [
+                {"slot": slot - i, "prioritizationFee": 0 if self._fee_rng.random() < .3 else int(self.market_fee * self._fee_rng.lognormvariate(0, .5))}
+                for i in range(150)
+            ]
+
+    def _rpc_getTransaction(self, params: list) -> Optional[dict]:
+        landed = self._landed.get(params[0])
+        if landed is None or time.monotonic() < landed[0]:
+            return None
+        _, units, err = landed
+        return {"slot": self._slot(), "blockTime": None, "meta": {"err": err, "computeUnitsConsumed": units}}
+
+    def _rpc_getSignatureStatuses(self, params: list) -> dict:
+        now, statuses = time.monotonic(), []
+        for signature in params[0]:
+            landed = self._landed.get(signature)
+            if landed is None or now < landed[0]:
+                statuses.append(None)
+            else:
+                err = landed[2]
+                statuses.append({
+                    "slot": self._slot(), "confirmations": None, "err": err,
+                    "status": {"Ok": None} if err is None else {"Err": err}, "confirmationStatus": "confirmed",
+                })
+        return {"context": self._context(), "value": statuses}
+
+class MockWsNode:
+    def __init__(self):
+        self.connections = 0
+        self.subscribes = 0
+        self._subscriptions = {}  # subscription id -> (websocket, method, pubkey or program)
+        self._next_id = 1
+        self._sockets = set()
+        self._loop = None
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = next(iter(self._server.sockets)).getsockname()[:2]
+        return f"ws://{host}:{port}"
+
+    @property
+    def subscriptions(self) -> int:
+        return len(self._subscriptions)
+
+    def start(self, port: int = 0) -> "MockWsNode":
+        ready = threading.Event()
+
+        async def serve():
+            return await websockets.serve(self._serve, "127.0.0.1", port)
+
+        def run() -> None:
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            try:
+                self._server = self._loop.run_until_complete(serve())
+            finally:
+                ready.set()
+            self._loop.run_forever()
+            self._loop.close()
+
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+        ready.wait()
+        if self._server is None:
+            raise RuntimeError("Mock websocket node failed to start")
+        return self
+
+    def stop(self) -> None:
+        if self._loop is None:
+            return
+
+        async def shutdown() -> None:
+            self._server.close()
+            await self._server.wait_closed()
+
+        asyncio.run_coroutine_threadsafe(shutdown(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop = None
+
+    def notify(self, pubkey, slot: int, data: bytes) -> int:
+        # An accountNotification (or programNotification) for every subscription that covers
+        # this account; returns how many were sent.
+        return self._call(self._notify(str(pubkey), slot, data))
+
+    def disconnect(self) -> None:
+        self._call(self._disconnect())
+
+    def wait_subscribed(self, count: int, timeout: float = 5.0) -> bool:
+        deadline = time.monotonic() + timeout
+        while self.subscriptions < count:
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.005)
+        return True
+
+    def _call(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    async def _serve(self, ws, path=None) -> None:
+        self.connections += 1
+        self._sockets.add(ws)
+        try:
+            async for raw in ws:
+                request = json.loads(raw)
+                method = request.get("method")
+                if method not in ("accountSubscribe", "programSubscribe"):
+                    continue
+                subscription = self._next_id
+                self._next_id += 1
+                self.subscribes += 1
+                self._subscriptions[subscription] = (ws, method, request["params"][0])
+                await ws.send(json.dumps({"jsonrpc": "2.0", "id": request["id"], "result": subscription}))
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            self._sockets.discard(ws)
+            for subscription, (socket, _, _) in list(self._subscriptions.items()):
+                if socket is ws:
+                    del self._subscriptions[subscription]
+
+    async def _notify(self, pubkey: str, slot: int, data: bytes) -> int:
+        encoded = [base64.b64encode(data).decode(), "base64"]
+        sent = 0
+        for subscription, (ws, method, target) in list(self._subscriptions.items()):
+            if method == "accountSubscribe" and target == pubkey:
+                kind, value = "accountNotification", {"data": encoded}
+            elif method == "programSubscribe":
+                kind, value = "programNotification", {"pubkey": pubkey, "account": {"data": encoded}}
+            else:
+                continue
+            message = {"subscription": subscription, "result": {"context": {"slot": slot}, "value": value}}
+            try:
+                await ws.send(json.dumps({"jsonrpc": "2.0", "method": kind, "params": message}))
+                sent += 1
+            except websockets.ConnectionClosed:
+                pass
+        return sent
+
+    async def _disconnect(self) -> None:
+        for ws in list(self._sockets):
+            await ws.close()
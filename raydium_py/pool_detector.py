@@ -0,0 +1,280 @@
+import asyncio
+import base64
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Optional
+import websockets
+from solana.rpc.commitment import Processed
+from solders.pubkey import Pubkey  # type: ignore
+from constants import OPEN_BOOK_PROGRAM, RAY_V4, WSOL
+from fast_layouts import LIQUIDITY_STATE_V4, MARKET_STATE_V3
+from pool_keys import PoolKeys
+from snapshots import read_rows
+from utils import decode_pool_keys, pool_index, pool_keys_cache
+
+logger = logging.getLogger(__name__)
+
+# Detects new AMM v4 pools as they are initialized, from two programSubscribe streams:
+#
+#   RAY_V4             AMM accounts that have never been swapped against (both swap totals
+#                      zero, filtered by the RPC node), which is what a pool looks like from
+#                      its initialize2 until its first trade
+#   OPEN_BOOK_PROGRAM  market accounts quoted in market_quote_mint (WSOL by default; None for
+#                      every market), kept in a bounded cache since a pool's market is created
+#                      shortly before the pool
+#
+# The first notification of an unknown pool is decoded together with its market, straight
+# from the stream data, into PoolKeys, which go into the pool keys cache and the pool index
+# (so fetch_pool_keys and the mint lookups hit them), and into reserve_stream if given; then
+# on_pool is called with a NewPool. A pool whose market is not cached waits for it, or has it
+# fetched with one getAccountInfo when a client is given.
+#
+# handle() takes the websocket messages and on_account() raw accounts, so a stand-in stream
+# can drive the detector without a socket; feed() replays a snapshot file (snapshots.py),
+# e.g. one written by passing recorder= to a live detector.
+
+AMM_SIZE = LIQUIDITY_STATE_V4.size
+MARKET_SIZE = MARKET_STATE_V3.size
+UNSWAPPED_FIELDS = ("swapCoinInAmount", "swapPcInAmount")  # u128 totals, zero until the first swap
+MAX_MARKETS = 10_000
+
+@dataclass
+class NewPool:
+    pool_keys: PoolKeys
+    slot: int
+    open_time: int  # unix seconds the pool accepts swaps from (poolOpenTime)
+    detected_at: float  # time.time() when the keys were ready
+
+def is_unswapped_pool(data: bytes) -> bool:
+    # An initialized AMM v4 account on OpenBook that has not been traded yet.
+    return (
+        len(data) == AMM_SIZE
+        and LIQUIDITY_STATE_V4.read(data, "status") != 0
+        and LIQUIDITY_STATE_V4.read(data, "serumProgramId") == bytes(OPEN_BOOK_PROGRAM)
+        and not any(LIQUIDITY_STATE_V4.read(data, name) for name in UNSWAPPED_FIELDS)
+    )
+
+def _memcmp(offset: int, value: bytes) -> dict:
+    return {"memcmp": {"offset": offset, "bytes": base64.b64encode(value).decode(), "encoding": "base64"}}
+
+class PoolDetector:
+    def __init__(
+        self,
+        ws_url: str,
+        on_pool: Optional[Callable[[NewPool], None]] = None,
+        client=None,
+        commitment: str = "processed",
+        market_quote_mint: Optional[Pubkey] = WSOL,
+        reserve_stream=None,
+        recorder=None,
+        max_markets: int = MAX_MARKETS,
+        reconnect_delay: float = 1.0,
+        max_reconnect_delay: float = 30.0,
+    ):
+        self.ws_url = ws_url
+        self.on_pool = on_pool
+        self.client = client
+        self.commitment = commitment
+        self.market_quote_mint = market_quote_mint
+        self.reserve_stream = reserve_stream
+        self.recorder = recorder  # SnapshotRecorder fed every notification, for feed()
+        self.max_markets = max_markets
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.detected = 0
+        self.notifications = 0
+        self.reconnects = 0
+        self._known = set()  # str(amm_id) of pools already reported or seen traded
+        self._markets = OrderedDict()  # bytes(market) -> data
+        self._waiting = {}  # bytes(market) -> [(amm_id, slot, data)] of pools missing it
+        self._lock = threading.Lock()
+        self._subscriptions = {}  # subscription id -> program
+        self._pending = {}  # request id -> program
+        self._next_id = 1
+        self._connected = False
+        self._loop = None
+        self._thread = None
+        self._task = None
+
+    @property
+    def connected(self) -> bool:
+        return self._connected
+
+    def subscriptions(self) -> list:
+        # (program, filters) of the two programSubscribe requests.
+        amm_filters = [{"dataSize": AMM_SIZE}]
+        amm_filters += [_memcmp(LIQUIDITY_STATE_V4.offsets[name], bytes(16)) for name in UNSWAPPED_FIELDS]
+        market_filters = [{"dataSize": MARKET_SIZE}]
+        if self.market_quote_mint is not None:
+            market_filters.append(_memcmp(MARKET_STATE_V3.offsets["quote_mint"], bytes(self.market_quote_mint)))
+        return [(RAY_V4, amm_filters), (OPEN_BOOK_PROGRAM, market_filters)]
+
+    def on_account(self, pubkey: Pubkey, slot: int, data: bytes) -> None:
+        if len(data) == MARKET_SIZE:
+            self._on_market(bytes(pubkey), data)
+        elif len(data) == AMM_SIZE:
+            self._on_amm(pubkey, slot, data)
+
+    def handle(self, message: dict) -> None:
+        if "id" in message:
+            program = self._pending.pop(message["id"], None)
+            if program is None:
+                return
+            if "result" in message:
+                self._subscriptions[message["result"]] = program
+                if not self._pending:
+                    self._connected = True
+            else:
+                logger.warning("Program subscription failed for %s: %s", program, message.get("error"))
+            return
+
+        if message.get("method") != "programNotification":
+            return
+        result = message["params"]["result"]
+        slot = result["context"]["slot"]
+        pubkey = Pubkey.from_string(result["value"]["pubkey"])
+        data = base64.b64decode(result["value"]["account"]["data"][0])
+        self.notifications += 1
+        if self.recorder is not None:
+            self.recorder.record(pubkey, slot, data)
+        self.on_account(pubkey, slot, data)
+
+    def feed(self, path: str) -> int:
+        # Replays a snapshot file through the detector; returns the pools detected.
+        detected = self.detected
+        for pubkey, slot, data in read_rows(path):
+            self.on_account(pubkey, slot, data)
+        return self.detected - detected
+
+    async def run(self) -> None:
+        delay = self.reconnect_delay
+        while True:
+            try:
+                async with websockets.connect(self.ws_url, max_size=None) as ws:
+                    self._subscriptions.clear()
+                    self._pending.clear()
+                    for program, filters in self.subscriptions():
+                        await self._subscribe(ws, program, filters)
+                    delay = self.reconnect_delay
+                    async for message in ws:
+                        self.handle(json.loads(message))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Pool detector disconnected: %s", e)
+            finally:
+                self._connected = False
+
+            self.reconnects += 1
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_reconnect_delay)
+
+    def start(self) -> None:
+        # Runs the detector on its own event loop thread, for use from synchronous code.
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_thread, name="pool-detector", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._loop is None:
+            return
+        if self._task is not None:
+            self._loop.call_soon_threadsafe(self._task.cancel)
+        if self._thread is not None:
+            self._thread.join()
+        self._thread = None
+        self._loop = None
+        self._task = None
+
+    def _run_thread(self) -> None:
+        asyncio.set_event_loop(self._loop)
+        self._task = self._loop.create_task(self.run())
+        try:
+            self._loop.run_until_complete(self._task)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self._loop.close()
+
+    async def _subscribe(self, ws, program: Pubkey, filters: list) -> None:
+        request_id = self._next_id
+        self._next_id += 1
+        self._pending[request_id] = str(program)
+        await ws.send(json.dumps({
+            "jsonrpc": "2.0",
+            "id": request_id,
+            "method": "programSubscribe",
+            "params": [str(program), {"encoding": "base64", "commitment": self.commitment, "filters": filters}],
+        }))
+
+    def _on_market(self, market: bytes, data: bytes) -> None:
+        with self._lock:
+            self._markets[market] = data
+            self._markets.move_to_end(market)
+            if len(self._markets) > self.max_markets:
+                self._markets.popitem(last=False)
+            waiting = self._waiting.pop(market, [])
+        for amm_id, slot, amm_data in waiting:
+            self._publish(amm_id, slot, amm_data, data)
+
+    def _on_amm(self, amm_id: Pubkey, slot: int, data: bytes) -> None:
+        key = str(amm_id)
+        with self._lock:
+            if key in self._known:
+                return
+            self._known.add(key)
+            if not is_unswapped_pool(data) or key in pool_keys_cache:
+                # Already trading, or already known: not a new pool.
+                return
+            market = bytes(LIQUIDITY_STATE_V4.read(data, "serumMarket"))
+            market_data = self._markets.get(market)
+            if market_data is None:
+                self._waiting.setdefault(market, []).append((amm_id, slot, data))
+        if market_data is not None:
+            self._publish(amm_id, slot, data, market_data)
+        elif self.client is not None:
+            self._request_market(Pubkey.from_bytes(market))
+
+    def _request_market(self, market: Pubkey) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._fetch_market(market)
+        else:
+            loop.run_in_executor(None, self._fetch_market, market)
+
+    def _fetch_market(self, market: Pubkey) -> None:
+        try:
+            response = self.client.get_account_info(market, commitment=Processed)
+        except Exception as e:
+            logger.warning("Error fetching market %s: %s", market, e)
+            return
+        if response.value is None:
+            logger.warning("Market %s not found", market)
+            return
+        self._on_market(bytes(market), bytes(response.value.data))
+
+    def _publish(self, amm_id: Pubkey, slot: int, data: bytes, market_data: bytes) -> None:
+        try:
+            pool_keys = decode_pool_keys(amm_id, data, market_data)
+        except Exception as e:
+            logger.warning("Error decoding new pool %s: %s", amm_id, e)
+            return
+        pool_keys_cache.put(pool_keys)
+        pool_index.add_pool_keys(pool_keys)
+        if self.reserve_stream is not None:
+            self.reserve_stream.add_pool(pool_keys)
+        self.detected += 1
+        pool = NewPool(pool_keys, slot, LIQUIDITY_STATE_V4.read(data, "poolOpenTime"), time.time())
+        logger.info("New pool %s (%s / %s) at slot %s", amm_id, pool_keys.base_mint, pool_keys.quote_mint, slot)
+        if self.on_pool is not None:
+            try:
+                self.on_pool(pool)
+            except Exception as e:
+                logger.error("Error in new pool callback for %s: %s", amm_id, e)
@@ -0,0 +1,245 @@
+import asyncio
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from typing import Iterable, Optional
+from solana.rpc.commitment import Processed
+from solana.rpc.types import DataSliceOpts, MemcmpOpts
+from solders.pubkey import Pubkey  # type: ignore
+from constants import RAY_V4, WSOL
+from fast_layouts import LIQUIDITY_STATE_V4
+
+logger = logging.getLogger(__name__)
+
+# Local mint -> AMM v4 pool index, so pair lookups are a hash probe instead of a
+# getProgramAccounts scan. The whole index lives in one memory-mapped file:
+#
+#   header | hash table (table_capacity slots) | pool records (record_capacity)
+#
+# Slot:   mint (32s), head (u32, record index + 1, 0 = none), count (u32)
+# Record: amm_id (32s), base_mint (32s), quote_mint (32s), next_base (u32), next_quote (u32)
+#
+# Each mint's slot heads a linked list of every pool that has it as base or quote, threaded
+# through next_base/next_quote, newest first. Slots are found by linear probing from the
+# mint's crc32 (vanity mints share prefixes, so raw key bytes are not used), at most half full.
+
+MAGIC = b"RPIX\x01"
+HEADER = struct.Struct("<5s3xIIIId")  # magic, table_capacity, record_capacity, record_count, mint_count, updated_at
+HEADER_SIZE = 64
+SLOT = struct.Struct("<32sII")
+RECORD = struct.Struct("<32s32s32sII")
+
+AMM_ACCOUNT_SIZE = LIQUIDITY_STATE_V4.size
+BASE_MINT_OFFSET = LIQUIDITY_STATE_V4.offsets["coinMintAddress"]
+QUOTE_MINT_OFFSET = LIQUIDITY_STATE_V4.offsets["pcMintAddress"]
+QUOTE_START = QUOTE_MINT_OFFSET - BASE_MINT_OFFSET  # within the returned data slice
+MINTS_LENGTH = QUOTE_START + 32
+
+MIN_RECORD_CAPACITY = 1024
+
+def _capacities(record_count: int, mint_count: int) -> tuple:
+    # Records get 25% headroom for incremental adds; the table stays at most half full.
+    record_capacity = max(MIN_RECORD_CAPACITY, record_count + record_count // 4)
+    table_capacity = MIN_RECORD_CAPACITY
+    while table_capacity < 2 * max(mint_count, record_count):
+        table_capacity *= 2
+    return table_capacity, record_capacity
+
+def _file_size(table_capacity: int, record_capacity: int) -> int:
+    return HEADER_SIZE + table_capacity * SLOT.size + record_capacity * RECORD.size
+
+def _scan_options(filters: list) -> dict:
+    return dict(
+        commitment=Processed,
+        encoding="base64",
+        data_slice=DataSliceOpts(offset=BASE_MINT_OFFSET, length=MINTS_LENGTH),
+        filters=filters,
+    )
+
+def _mint_filters(mint: str) -> list:
+    return [[AMM_ACCOUNT_SIZE, MemcmpOpts(offset=offset, bytes=str(mint))] for offset in (BASE_MINT_OFFSET, QUOTE_MINT_OFFSET)]
+
+def _scan(client, filters: list) -> list:
+    return _decode_scan(client.get_program_accounts(RAY_V4, **_scan_options(filters)))
+
+async def _async_scan(async_client, filters: list) -> list:
+    return _decode_scan(await async_client.get_program_accounts(RAY_V4, **_scan_options(filters)))
+
+def _decode_scan(response) -> list:
+    return [
+        (bytes(account.pubkey), account.account.data[:32], account.account.data[QUOTE_START:QUOTE_START + 32])
+        for account in response.value
+    ]
+
+class PoolIndex:
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+        self._buf = None
+        if path and os.path.exists(path) and os.path.getsize(path) >= HEADER_SIZE:
+            try:
+                self._map_file()
+            except Exception as e:
+                logger.warning("Error loading pool index: %s", e)
+        if self._buf is None:
+            # Kept in memory until the first pool is added, so importing utils writes no file.
+            self._rebuild([], 0.0, persist=False)
+
+    def __len__(self) -> int:
+        return self._header()[3]
+
+    @property
+    def updated_at(self) -> float:
+        return self._header()[5]
+
+    def candidates(self, mint) -> list:
+        # Every pool with this mint on either side, newest first.
+        with self._lock:
+            return [str(Pubkey.from_bytes(record[0])) for _, record in self._chain(bytes(mint))]
+
+    def pairs(self, token_mint, quote_mint=WSOL) -> list:
+        # Pools trading token_mint against quote_mint; token-as-base pools first.
+        token, quote = bytes(token_mint), bytes(quote_mint)
+        with self._lock:
+            records = [record for _, record in self._chain(token)]
+        as_base = [record[0] for record in records if record[1] == token and record[2] == quote]
+        as_quote = [record[0] for record in records if record[2] == token and record[1] == quote]
+        return [str(Pubkey.from_bytes(amm_id)) for amm_id in as_base + as_quote]
+
+    def add(self, amm_id, base_mint, quote_mint) -> bool:
+        amm_id, base_mint, quote_mint = bytes(amm_id), bytes(base_mint), bytes(quote_mint)
+        with self._lock:
+            if self._contains(amm_id, base_mint, quote_mint):
+                return False
+            _, table_capacity, record_capacity, record_count, mint_count, updated_at = self._header()
+            unsaved = self.path and self._file is None
+            if unsaved or record_count >= record_capacity or 2 * (mint_count + 2) > table_capacity:
+                self._rebuild(list(self._records()), updated_at, extra=1)
+            self._insert(self._buf, amm_id, base_mint, quote_mint)
+            return True
+
+    def add_pool_keys(self, pool_keys) -> bool:
+        return self.add(pool_keys.amm_id, pool_keys.base_mint, pool_keys.quote_mint)
+
+    def snapshot(self, client) -> int:
+        # One getProgramAccounts over every AMM v4 account, returning only the two mint fields.
+        records = _scan(client, [AMM_ACCOUNT_SIZE])
+        with self._lock:
+            self._rebuild(records, time.time())
+        return len(records)
+
+    def refresh_mint(self, client, mint: str) -> list:
+        # Incremental fill for a single mint, using the memcmp-filtered scans in both orientations.
+        return self._add_scanned([_scan(client, filters) for filters in _mint_filters(mint)])
+
+    async def async_refresh_mint(self, async_client, mint: str) -> list:
+        scans = await asyncio.gather(*(_async_scan(async_client, filters) for filters in _mint_filters(mint)))
+        # Adding writes the index file; keep that off the event loop.
+        return await asyncio.get_running_loop().run_in_executor(None, self._add_scanned, scans)
+
+    def _add_scanned(self, scans: list) -> list:
+        found = []
+        for records in scans:
+            for amm_id, base_mint, quote_mint in records:
+                self.add(amm_id, base_mint, quote_mint)
+                found.append(str(Pubkey.from_bytes(amm_id)))
+        return found
+
+    def close(self) -> None:
+        with self._lock:
+            if isinstance(self._buf, mmap.mmap):
+                self._buf.flush()
+                self._buf.close()
+            if self._file is not None:
+                self._file.close()
+            self._buf = None
+            self._file = None
+
+    def _header(self) -> tuple:
+        return HEADER.unpack_from(self._buf, 0)
+
+    def _map_file(self) -> None:
+        file = open(self.path, "r+b")
+        buf = mmap.mmap(file.fileno(), 0)
+        magic, table_capacity, record_capacity = HEADER.unpack_from(buf, 0)[:3]
+        if magic != MAGIC or len(buf) < _file_size(table_capacity, record_capacity):
+            buf.close()
+            file.close()
+            raise ValueError(f"Unrecognized pool index file: {self.path}")
+        self._file, self._buf = file, buf
+
+    def _rebuild(self, records: list, updated_at: float, extra: int = 0, persist: bool = True) -> None:
+        mint_count = len({mint for record in records for mint in record[1:]})
+        table_capacity, record_capacity = _capacities(len(records) + extra, mint_count + 2 * extra)
+        buf = bytearray(_file_size(table_capacity, record_capacity))
+        HEADER.pack_into(buf, 0, MAGIC, table_capacity, record_capacity, 0, 0, updated_at)
+        for amm_id, base_mint, quote_mint in records:
+            self._insert(buf, amm_id, base_mint, quote_mint)
+
+        if not self.path or not persist:
+            self._buf = buf
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(buf)
+        if isinstance(self._buf, mmap.mmap):
+            self._buf.close()
+        if self._file is not None:
+            self._file.close()
+        os.replace(tmp_path, self.path)
+        self._map_file()
+
+    def _records(self) -> Iterable:
+        _, table_capacity, _, record_count = self._header()[:4]
+        base = HEADER_SIZE + table_capacity * SLOT.size
+        for i in range(record_count):
+            yield RECORD.unpack_from(self._buf, base + i * RECORD.size)[:3]
+
+    @staticmethod
+    def _probe(buf, table_capacity: int, mint: bytes) -> tuple:
+        # (slot offset, head, count); count == 0 means the mint is not indexed.
+        mask = table_capacity - 1
+        i = zlib.crc32(mint) & mask
+        while True:
+            offset = HEADER_SIZE + i * SLOT.size
+            key, head, count = SLOT.unpack_from(buf, offset)
+            if count == 0 or key == mint:
+                return offset, head, count
+            i = (i + 1) & mask
+
+    def _chain(self, mint: bytes) -> Iterable:
+        _, table_capacity = self._header()[:2]
+        _, head, _ = self._probe(self._buf, table_capacity, mint)
+        base = HEADER_SIZE + table_capacity * SLOT.size
+        while head:
+            record = RECORD.unpack_from(self._buf, base + (head - 1) * RECORD.size)
+            yield head - 1, record
+            head = record[3] if record[1] == mint else record[4]
+
+    def _contains(self, amm_id: bytes, base_mint: bytes, quote_mint: bytes) -> bool:
+        # Walk whichever mint has fewer pools; the WSOL list is long, the token's is not.
+        table_capacity = self._header()[1]
+        base_count = self._probe(self._buf, table_capacity, base_mint)[2]
+        quote_count = self._probe(self._buf, table_capacity, quote_mint)[2]
+        if not base_count or not quote_count:
+            return False
+        mint = base_mint if base_count <= quote_count else quote_mint
+        return any(record[0] == amm_id for _, record in self._chain(mint))
+
+    def _insert(self, buf, amm_id: bytes, base_mint: bytes, quote_mint: bytes) -> None:
+        magic, table_capacity, record_capacity, record_count, mint_count, updated_at = HEADER.unpack_from(buf, 0)
+        heads = []
+        for mint in (base_mint, quote_mint):
+            offset, head, count = self._probe(buf, table_capacity, mint)
+            if count == 0:
+                mint_count += 1
+            SLOT.pack_into(buf, offset, mint, record_count + 1, count + 1)
+            heads.append(head)
+        offset = HEADER_SIZE + table_capacity * SLOT.size + record_count * RECORD.size
+        RECORD.pack_into(buf, offset, amm_id, base_mint, quote_mint, heads[0], heads[1])
+        HEADER.pack_into(buf, 0, magic, table_capacity, record_capacity, record_count + 1, mint_count, updated_at)
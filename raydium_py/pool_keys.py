@@ -0,0 +1,216 @@
+import logging
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+from solders.pubkey import Pubkey  # type: ignore
+
+@dataclass
+class PoolKeys:
+    amm_id: Pubkey
+    base_mint: Pubkey
+    quote_mint: Pubkey
+    base_decimals: int
+    quote_decimals: int
+    open_orders: Pubkey
+    target_orders: Pubkey
+    base_vault: Pubkey
+    quote_vault: Pubkey
+    market_id: Pubkey
+    market_authority: Pubkey
+    market_base_vault: Pubkey
+    market_quote_vault: Pubkey
+    bids: Pubkey
+    asks: Pubkey
+    event_queue: Pubkey
+    swap_fee_numerator: int = 25
+    swap_fee_denominator: int = 10_000
+
+PUBKEY_FIELDS = (
+    "amm_id",
+    "base_mint",
+    "quote_mint",
+    "open_orders",
+    "target_orders",
+    "base_vault",
+    "quote_vault",
+    "market_id",
+    "market_authority",
+    "market_base_vault",
+    "market_quote_vault",
+    "bids",
+    "asks",
+    "event_queue",
+)
+
+logger = logging.getLogger(__name__)
+
+# File layout: MAGIC followed by fixed-size records, appended as entries are cached.
+# Record: flags (u8), base_decimals (u8), quote_decimals (u8), cached_at (f64),
+# swap_fee_numerator (u64), swap_fee_denominator (u64), pubkeys (14 * 32 bytes).
+MAGIC = b"RPKC\x02"
+RECORD = struct.Struct(f"<BBBdQQ{32 * len(PUBKEY_FIELDS)}s")
+FLAG_ENTRY = 0
+FLAG_REMOVED = 1
+
+def pack_pool_keys(pool_keys: PoolKeys, cached_at: float, flags: int = FLAG_ENTRY) -> bytes:
+    pubkeys = b"".join(bytes(getattr(pool_keys, name)) for name in PUBKEY_FIELDS)
+    return RECORD.pack(
+        flags,
+        pool_keys.base_decimals,
+        pool_keys.quote_decimals,
+        cached_at,
+        pool_keys.swap_fee_numerator,
+        pool_keys.swap_fee_denominator,
+        pubkeys,
+    )
+
+def unpack_pool_keys(record: bytes) -> tuple:
+    flags, base_decimals, quote_decimals, cached_at, fee_numerator, fee_denominator, pubkeys = RECORD.unpack(record)
+    values = {
+        name: Pubkey.from_bytes(pubkeys[i * 32:(i + 1) * 32])
+        for i, name in enumerate(PUBKEY_FIELDS)
+    }
+    pool_keys = PoolKeys(
+        base_decimals=base_decimals,
+        quote_decimals=quote_decimals,
+        swap_fee_numerator=fee_numerator,
+        swap_fee_denominator=fee_denominator,
+        **values,
+    )
+    return flags, cached_at, pool_keys
+
+class PoolKeysCache:
+    def __init__(self, max_size: int = 10_000, ttl: Optional[float] = None, path: Optional[str] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # str(amm_id) -> (cached_at, PoolKeys)
+        self._lock = threading.Lock()
+        self._records_on_disk = 0
+        if path:
+            self.load()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, amm_id) -> bool:
+        return self.get(str(amm_id), count=False) is not None
+
+    def get(self, amm_id: str, count: bool = True) -> Optional[PoolKeys]:
+        with self._lock:
+            entry = self._entries.get(amm_id)
+            if entry is not None and self._expired(entry[0]):
+                del self._entries[amm_id]
+                entry = None
+            if entry is None:
+                if count:
+                    self.misses += 1
+                return None
+            self._entries.move_to_end(amm_id)
+            if count:
+                self.hits += 1
+            return entry[1]
+
+    def put(self, pool_keys: PoolKeys) -> None:
+        cached_at = time.time()
+        with self._lock:
+            self._insert(str(pool_keys.amm_id), cached_at, pool_keys)
+            self._append(pack_pool_keys(pool_keys, cached_at))
+
+    def remove(self, amm_id: str) -> None:
+        with self._lock:
+            entry = self._entries.pop(amm_id, None)
+            if entry is not None:
+                self._append(pack_pool_keys(entry[1], time.time(), FLAG_REMOVED))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            if self.path:
+                self._rewrite()
+
+    def load(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._records_on_disk = 0
+            try:
+                with open(self.path, "rb") as f:
+                    data = f.read()
+            except FileNotFoundError:
+                return
+
+            if not data.startswith(MAGIC):
+                # Rewritten below, or every record appended after this would be unreadable too.
+                logger.warning("Discarding pool keys cache with unknown format: %s", self.path)
+                self._rewrite()
+                return
+
+            view = memoryview(data)[len(MAGIC):]
+            count = len(view) // RECORD.size
+            damaged = len(view) % RECORD.size != 0  # a write cut short, e.g. by a crash
+            for i in range(count):
+                try:
+                    flags, cached_at, pool_keys = unpack_pool_keys(view[i * RECORD.size:(i + 1) * RECORD.size])
+                except Exception as e:
+                    logger.warning("Error reading pool keys cache record %s: %s", i, e)
+                    damaged = True
+                    break
+                amm_id = str(pool_keys.amm_id)
+                if flags == FLAG_REMOVED or self._expired(cached_at):
+                    self._entries.pop(amm_id, None)
+                else:
+                    self._insert(amm_id, cached_at, pool_keys)
+            self._records_on_disk = count
+            if damaged:
+                # Appending after a torn or unreadable record would misalign every later one.
+                logger.warning("Rewriting damaged pool keys cache: %s", self.path)
+                self._rewrite()
+
+    def compact(self) -> None:
+        with self._lock:
+            if self.path:
+                self._rewrite()
+
+    def _expired(self, cached_at: float) -> bool:
+        return self.ttl is not None and time.time() - cached_at > self.ttl
+
+    def _insert(self, amm_id: str, cached_at: float, pool_keys: PoolKeys) -> None:
+        self._entries[amm_id] = (cached_at, pool_keys)
+        self._entries.move_to_end(amm_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def _append(self, record: bytes) -> None:
+        if not self.path:
+            return
+        # Superseded and evicted records pile up in the append log; rewrite once they dominate it.
+        if self._records_on_disk >= 2 * self.max_size:
+            self._rewrite()
+            return
+        try:
+            is_new = not os.path.exists(self.path)
+            with open(self.path, "ab") as f:
+                if is_new:
+                    f.write(MAGIC)
+                f.write(record)
+            self._records_on_disk += 1
+        except OSError as e:
+            logger.warning("Error writing pool keys cache: %s", e)
+
+    def _rewrite(self) -> None:
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(MAGIC)
+                for cached_at, pool_keys in self._entries.values():
+                    f.write(pack_pool_keys(pool_keys, cached_at))
+            os.replace(tmp_path, self.path)
+            self._records_on_disk = len(self._entries)
+        except OSError as e:
+            logger.warning("Error writing pool keys cache: %s", e)
@@ -0,0 +1,183 @@
+from typing import Sequence
+
+np = None  # numpy, imported by the first batch call; scalar quoting never needs it
+
+# Exact integer quoting for AMM v4 swap_base_in, mirroring the on-chain program:
+#   fee        = ceil(amount_in * swap_fee_numerator / swap_fee_denominator)  (Raydium's checked_ceil_div)
+#   amount_out = reserve_out * (amount_in - fee) // (reserve_in + amount_in - fee)
+# Reserves are raw u64 amounts: vault balance net of need_take_pnl, as fetch_reserves,
+# ReserveStream and replay.py all return them. Intermediate products are u128 on-chain;
+# the scalar path uses Python ints and the batch path emulates u128 with pairs of uint64
+# lanes, so both round exactly like the program.
+
+DEFAULT_FEE_NUMERATOR = 25
+DEFAULT_FEE_DENOMINATOR = 10_000
+BPS = 10_000
+
+def swap_fee(amount_in: int, fee_numerator: int = DEFAULT_FEE_NUMERATOR, fee_denominator: int = DEFAULT_FEE_DENOMINATOR) -> int:
+    product = amount_in * fee_numerator
+    fee, remainder = divmod(product, fee_denominator)
+    if fee == 0:
+        return 1 if product * 2 >= fee_denominator else 0
+    return fee + 1 if remainder else fee
+
+def quote_base_in(
+    amount_in: int,
+    reserve_in: int,
+    reserve_out: int,
+    fee_numerator: int = DEFAULT_FEE_NUMERATOR,
+    fee_denominator: int = DEFAULT_FEE_DENOMINATOR,
+) -> int:
+    amount_in_after_fee = amount_in - swap_fee(amount_in, fee_numerator, fee_denominator)
+    return reserve_out * amount_in_after_fee // (reserve_in + amount_in_after_fee)
+
+def minimum_amount_out(amount_out: int, slippage_bps: int) -> int:
+    return amount_out * (BPS - slippage_bps) // BPS
+
+def quote_pool_base_in(pool_keys, amount_in: int, reserve_in: int, reserve_out: int) -> int:
+    return quote_base_in(
+        amount_in, reserve_in, reserve_out, pool_keys.swap_fee_numerator, pool_keys.swap_fee_denominator
+    )
+
+def _load_numpy(caller: str) -> None:
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            raise ImportError(f"{caller} requires numpy") from None
+        np = numpy
+
+def pool_fee_arrays(pools: Sequence) -> tuple:
+    _load_numpy("pool_fee_arrays")
+    numerators = np.fromiter((p.swap_fee_numerator for p in pools), dtype=np.uint64, count=len(pools))
+    denominators = np.fromiter((p.swap_fee_denominator for p in pools), dtype=np.uint64, count=len(pools))
+    return numerators, denominators
+
+def quote_base_in_batch(
+    amount_in,
+    reserve_in,
+    reserve_out,
+    fee_numerator=DEFAULT_FEE_NUMERATOR,
+    fee_denominator=DEFAULT_FEE_DENOMINATOR,
+):
+    _load_numpy("quote_base_in_batch")
+
+    shape, (amount_in, reserve_in, reserve_out, fee_numerator, fee_denominator) = _flat_uint64(
+        amount_in, reserve_in, reserve_out, fee_numerator, fee_denominator
+    )
+
+    with np.errstate(all="ignore"):
+        # fee = checked_ceil_div(amount_in * numerator, denominator)
+        fee, remainder_nonzero = _mul_div(amount_in, fee_numerator, fee_denominator)
+        product = amount_in * fee_numerator  # exact wherever the quotient is 0
+        fee = np.where(
+            fee == 0,
+            (product >= fee_denominator - product).astype(np.uint64),
+            fee + remainder_nonzero.astype(np.uint64),
+        )
+
+        amount_in_after_fee = amount_in - fee
+        denominator = reserve_in + amount_in_after_fee
+        amount_out, _ = _mul_div(reserve_out, amount_in_after_fee, denominator)
+        amount_out[denominator == 0] = 0  # empty pool; the program rejects these swaps
+
+    # reserve_in + amount_in can only exceed u64 for states no real mint supply allows;
+    # finish those rows (if any) with Python ints rather than return a wrapped result.
+    for i in np.flatnonzero(denominator < reserve_in):
+        amount_out[i] = quote_base_in(
+            int(amount_in[i]), int(reserve_in[i]), int(reserve_out[i]), int(fee_numerator[i]), int(fee_denominator[i])
+        )
+    return amount_out.reshape(shape)
+
+def minimum_amount_out_batch(amount_out, slippage_bps):
+    _load_numpy("minimum_amount_out_batch")
+
+    shape, (amount_out, keep) = _flat_uint64(amount_out, BPS - np.asarray(slippage_bps))
+    with np.errstate(all="ignore"):
+        result, _ = _mul_div(amount_out, keep, np.full(amount_out.shape, BPS, dtype=np.uint64))
+    return result.reshape(shape)
+
+def _flat_uint64(*values) -> tuple:
+    arrays = np.broadcast_arrays(*(np.asarray(value, dtype=np.uint64) for value in values))
+    return arrays[0].shape, [array.reshape(-1) for array in arrays]
+
+_MASK32 = 0xFFFFFFFF
+_SHIFT32 = 32
+_TWO64 = 18446744073709551616.0
+_MAX_U64_FLOAT = 18446744073709549568.0  # largest float64 below 2**64
+_FAST_PRODUCT_LIMIT = 2.0 ** 110
+_FAST_DIVISOR_LIMIT = 2 ** 61
+
+def _mul_u64(a, b) -> tuple:
+    # Full 64x64 -> 128 bit product as (hi, lo) uint64 arrays.
+    a_lo, a_hi = a & _MASK32, a >> _SHIFT32
+    b_lo, b_hi = b & _MASK32, b >> _SHIFT32
+    lo_lo = a_lo * b_lo
+    hi_lo = a_hi * b_lo
+    lo_hi = a_lo * b_hi
+    middle = (lo_lo >> _SHIFT32) + (hi_lo & _MASK32) + (lo_hi & _MASK32)
+    lo = (middle << _SHIFT32) | (lo_lo & _MASK32)
+    hi = a_hi * b_hi + (hi_lo >> _SHIFT32) + (lo_hi >> _SHIFT32) + (middle >> _SHIFT32)
+    return hi, lo
+
+def _remainder(hi, lo, quotient, divisor) -> tuple:
+    # (hi:lo) - quotient * divisor as a signed 128-bit (hi, lo) pair.
+    product_hi, product_lo = _mul_u64(quotient, divisor)
+    borrow = (lo < product_lo).astype(np.uint64)
+    return hi - product_hi - borrow, lo - product_lo
+
+def _signed_float(hi, lo):
+    # Two's complement 128-bit value as float64; negatives are converted via their
+    # magnitude so small remainders like -15 are not lost to float rounding.
+    negative = hi.view(np.int64) < 0
+    neg_lo = ~lo + 1
+    neg_hi = ~hi + (neg_lo == 0)
+    magnitude = (
+        np.where(negative, neg_hi, hi).astype(np.float64) * _TWO64
+        + np.where(negative, neg_lo, lo).astype(np.float64)
+    )
+    return np.where(negative, -magnitude, magnitude)
+
+def _mul_div(a, b, divisor) -> tuple:
+    # floor(a * b / divisor) with a u128 intermediate, for quotients that fit in u64.
+    # Returns (quotient, remainder != 0).
+    #
+    # Fast path: a float64 estimate is off by less than a * b * 2**-51 / divisor, so for
+    # a * b < 2**110 and divisor < 2**61 the exact remainder a * b - q * divisor fits in an
+    # int64 and can be computed from wrapping u64 products alone; one floor division fixes q.
+    # Covers every realistic reserve/amount combination; other rows take the 128-bit path.
+    product_f = a.astype(np.float64) * b.astype(np.float64)
+    estimate = np.minimum(product_f / divisor.astype(np.float64), _MAX_U64_FLOAT)
+    quotient = estimate.astype(np.uint64)
+
+    divisor_i = divisor.view(np.int64)
+    remainder = (a * b - quotient * divisor).view(np.int64)
+    correction = remainder // divisor_i
+    quotient += correction.view(np.uint64)
+    remainder -= correction * divisor_i
+    remainder_nonzero = remainder != 0
+
+    wide = (product_f >= _FAST_PRODUCT_LIMIT) | (divisor >= _FAST_DIVISOR_LIMIT) | (divisor == 0)
+    if wide.any():
+        quotient[wide], remainder_nonzero[wide] = _mul_div_wide(a[wide], b[wide], divisor[wide])
+    return quotient, remainder_nonzero
+
+def _mul_div_wide(a, b, divisor) -> tuple:
+    # Same contract as _mul_div for any inputs, using full 128-bit remainders: a float
+    # estimate is corrected once (leaving it within one of the answer), then fixed up exactly.
+    divisor_f = divisor.astype(np.float64)
+    estimate = a.astype(np.float64) * b.astype(np.float64) / divisor_f
+    quotient = np.clip(np.floor(estimate), 0, _MAX_U64_FLOAT).astype(np.uint64)
+
+    hi, lo = _mul_u64(a, b)
+    rem_hi, rem_lo = _remainder(hi, lo, quotient, divisor)
+    quotient += np.floor(_signed_float(rem_hi, rem_lo) / divisor_f).astype(np.int64).view(np.uint64)
+
+    rem_hi, rem_lo = _remainder(hi, lo, quotient, divisor)
+    negative = rem_hi.view(np.int64) < 0
+    too_small = ~negative & ((rem_hi != 0) | (rem_lo >= divisor))
+    quotient += too_small.view(np.uint8).astype(np.uint64)
+    quotient -= negative.view(np.uint8).astype(np.uint64)
+    rem_lo = np.where(negative, rem_lo + divisor, np.where(too_small, rem_lo - divisor, rem_lo))
+    return quotient, rem_lo != 0
@@ -1,7 +1,7 @@
 import base64
+import logging
 import os
-from solana.rpc.commitment import Processed
-from solana.rpc.types import TokenAccountOpts, TxOpts
+from typing import Optional, Sequence
 from solders.compute_budget import set_compute_unit_limit, set_compute_unit_price  # type: ignore
 from solders.message import MessageV0  # type: ignore
 from solders.pubkey import Pubkey  # type: ignore
@@ -10,258 +10,436 @@ from solders.system_program import (
     create_account_with_seed,
 )
 from solders.transaction import VersionedTransaction  # type: ignore
-from spl.token.client import Token
 from spl.token.instructions import (
     CloseAccountParams,
     InitializeAccountParams,
     close_account,
-    create_associated_token_account,
+    create_idempotent_associated_token_account,
     get_associated_token_address,
     initialize_account,
 )
-from config import UNIT_BUDGET, UNIT_PRICE, client, payer_keypair
 from constants import SOL_DECIMAL, TOKEN_PROGRAM_ID, WSOL
+from engine import current_engine
+from fees import with_compute_budget
+from instrumentation import span, timed
 from layouts import ACCOUNT_LAYOUT
+from quote import minimum_amount_out, quote_pool_base_in
+from reserves import Reserves
 from utils import (
+    PoolKeys,
     confirm_txn,
     fetch_pool_keys,
-    get_token_balance,
-    get_token_reserves,
+    get_reserves,
     make_swap_instruction,
-    sol_for_tokens,
-    tokens_for_sol
+    swap_templates,
 )
+from swap_templates import SwapTemplate
+from wsol import WsolAccount
 
-def buy(pair_address: str, sol_in: float = .01, slippage: int = 5) -> bool:
+logger = logging.getLogger(__name__)
+
+@timed("buy")
+def buy(pair_address: str, sol_in: float = .01, slippage: int = 5, reserve_stream=None) -> bool:
+    engine = current_engine()
     try:
-        print(f"Starting buy transaction for pair address: {pair_address}")
+        logger.info("Starting buy transaction for pair address: %s", pair_address)
         
-        print("Fetching pool keys...")
-        pool_keys = fetch_pool_keys(pair_address)
+        logger.debug("Fetching pool keys...")
+        with span("pool_keys"):
+            pool_keys = fetch_pool_keys(pair_address)
         if pool_keys is None:
-            print("No pool keys found...")
+            logger.warning("No pool keys found...")
             return False
-        print("Pool keys fetched successfully.")
+        logger.debug("Pool keys fetched successfully.")
 
         mint = pool_keys.base_mint if pool_keys.base_mint != WSOL else pool_keys.quote_mint
         
-        print("Calculating transaction amounts...")
+        logger.debug("Calculating transaction amounts...")
         amount_in = int(sol_in * SOL_DECIMAL)
         
-        base_reserve, quote_reserve, token_decimal = get_token_reserves(pool_keys)
-        amount_out = sol_for_tokens(sol_in, base_reserve, quote_reserve)
-        print(f"Raw Amount Out: {amount_out}")
-        
-        slippage_adjustment = 1 - (slippage / 100)
-        amount_out_with_slippage = amount_out * slippage_adjustment
-        minimum_amount_out = int(amount_out_with_slippage * 10**token_decimal)
-        print(f"Amount In: {amount_in} | Minimum Amount Out: {minimum_amount_out}")
-
-        print("Checking for existing token account...")
-        token_account_check = client.get_token_accounts_by_owner(payer_keypair.pubkey(), TokenAccountOpts(mint), Processed)
-        if token_account_check.value:
-            token_account = token_account_check.value[0].pubkey
-            token_account_instr = None
-            print("Token account found.")
-        else:
-            token_account = get_associated_token_address(payer_keypair.pubkey(), mint)
-            token_account_instr = create_associated_token_account(payer_keypair.pubkey(), payer_keypair.pubkey(), mint)
-            print("No existing token account found; creating associated token account.")
-
-        print("Generating seed for WSOL account...")
-        seed = base64.urlsafe_b64encode(os.urandom(24)).decode('utf-8') 
-        wsol_token_account = Pubkey.create_with_seed(payer_keypair.pubkey(), seed, TOKEN_PROGRAM_ID)
-        balance_needed = Token.get_min_balance_rent_for_exempt_for_account(client)
-        
-        print("Creating and initializing WSOL account...")
-        create_wsol_account_instr = create_account_with_seed(
-            CreateAccountWithSeedParams(
-                from_pubkey=payer_keypair.pubkey(),
-                to_pubkey=wsol_token_account,
-                base=payer_keypair.pubkey(),
-                seed=seed,
-                lamports=int(balance_needed + amount_in),
-                space=ACCOUNT_LAYOUT.sizeof(),
-                owner=TOKEN_PROGRAM_ID
-            )
-        )
-        
-        init_wsol_account_instr = initialize_account(
-            InitializeAccountParams(
-                program_id=TOKEN_PROGRAM_ID,
-                account=wsol_token_account,
-                mint=WSOL,
-                owner=payer_keypair.pubkey()
-            )
-        )
-        
-        print("Creating swap instructions...")
-        swap_instructions = make_swap_instruction(
-            amount_in=amount_in,
-            minimum_amount_out=minimum_amount_out,
-            token_account_in=wsol_token_account,
-            token_account_out=token_account,
-            accounts=pool_keys,
-            owner=payer_keypair
-        )
+        with span("reserves"):
+            reserves = get_reserves(pool_keys, reserve_stream)
+        if reserves is None:
+            logger.warning("No reserves found...")
+            return False
+        with span("quote"):
+            minimum_amount_out = calc_buy_minimum_out(pool_keys, amount_in, slippage, reserves)
+        logger.debug("Amount In: %s | Minimum Amount Out: %s", amount_in, minimum_amount_out)
 
-        print("Preparing to close WSOL account after swap...")
-        close_wsol_account_instr = close_account(
-            CloseAccountParams(
-                program_id=TOKEN_PROGRAM_ID,
-                account=wsol_token_account,
-                dest=payer_keypair.pubkey(),
-                owner=payer_keypair.pubkey()
-            )
-        )
-        
-        instructions = [
-            set_compute_unit_limit(UNIT_BUDGET),
-            set_compute_unit_price(UNIT_PRICE),
-            create_wsol_account_instr,
-            init_wsol_account_instr
-        ]
-        
-        if token_account_instr:
-            instructions.append(token_account_instr)
-        
-        instructions.append(swap_instructions)
-        instructions.append(close_wsol_account_instr)
+        logger.debug("Checking for existing token account...")
+        with span("wallet"):
+            token_account = engine.wallet_state.token_account(engine.client, mint)
+            existing_token_account = token_account.address if token_account else None
 
-        print("Compiling transaction message...")
-        compiled_message = MessageV0.try_compile(
-            payer_keypair.pubkey(),
-            instructions,
-            [],
-            client.get_latest_blockhash().value.blockhash,
-        )
-        
-        print("Sending transaction...")
-        txn_sig = client.send_transaction(
-            txn = VersionedTransaction(compiled_message, [payer_keypair]), 
-            opts = TxOpts(skip_preflight=True)
-            ).value
-        print("Transaction Signature:", txn_sig)
-        
-        print("Confirming transaction...")
-        confirmed = confirm_txn(txn_sig)
-        
-        print("Transaction confirmed:", confirmed)
+            wsol_setup, top_up = [], 0
+            if engine.persistent_wsol:
+                if engine.wsol_account.needs_refresh(amount_in):
+                    engine.wsol_account.refresh(engine.client)
+                wsol_setup, top_up = engine.wsol_account.prepare_buy(amount_in)
+                balance_needed = 0
+            else:
+                balance_needed = engine.cluster_constants.rent_exempt_minimum(engine.client, ACCOUNT_LAYOUT.sizeof())
+
+        confirmed = None
+        try:
+            if engine.persistent_wsol and not wsol_setup and existing_token_account:
+                # Steady state: only amounts and blockhash differ from the last trade.
+                with span("build"):
+                    template = swap_templates.get(engine.payer_keypair, pool_keys, engine.wsol_account.address, existing_token_account)
+                confirmed = send_template_and_confirm(template, amount_in, minimum_amount_out, pool_keys)
+            else:
+                with span("build"):
+                    instructions = make_buy_instructions(
+                        pool_keys, mint, amount_in, minimum_amount_out, existing_token_account, balance_needed,
+                        engine.wsol_account if engine.persistent_wsol else None, wsol_setup,
+                    )
+                confirmed = send_and_confirm(instructions, pool_keys)
+        finally:
+            if engine.persistent_wsol:
+                engine.wsol_account.settle_buy(amount_in, top_up, confirmed, engine.wsol_account.creates(wsol_setup))
+            engine.wallet_state.settle_buy(
+                mint, existing_token_account or get_associated_token_address(engine.payer_keypair.pubkey(), mint),
+                minimum_amount_out, confirmed,
+            )
         return confirmed
 
     except Exception as e:
-        print("Error occurred during transaction:", e)
+        logger.error("Error occurred during transaction: %s", e)
         return False
 
-def sell(pair_address: str, percentage: int = 100, slippage: int = 5) -> bool:
+@timed("sell")
+def sell(pair_address: str, percentage: int = 100, slippage: int = 5, reserve_stream=None) -> bool:
+    engine = current_engine()
     try:
-        print(f"Starting sell transaction for pair address: {pair_address}")
+        logger.info("Starting sell transaction for pair address: %s", pair_address)
         if not (1 <= percentage <= 100):
-            print("Percentage must be between 1 and 100.")
+            logger.warning("Percentage must be between 1 and 100.")
             return False
 
-        print("Fetching pool keys...")
-        pool_keys = fetch_pool_keys(pair_address)
+        logger.debug("Fetching pool keys...")
+        with span("pool_keys"):
+            pool_keys = fetch_pool_keys(pair_address)
         if pool_keys is None:
-            print("No pool keys found...")
+            logger.warning("No pool keys found...")
             return False
-        print("Pool keys fetched successfully.")
+        logger.debug("Pool keys fetched successfully.")
 
         mint = pool_keys.base_mint if pool_keys.base_mint != WSOL else pool_keys.quote_mint
         
-        print("Retrieving token balance...")
-        token_balance = get_token_balance(str(mint))
-        print("Token Balance:", token_balance)    
-        
-        if token_balance == 0 or token_balance is None:
-            print("No token balance available to sell.")
+        logger.debug("Retrieving token balance...")
+        with span("wallet"):
+            token_account = engine.wallet_state.token_account(engine.client, mint, exact=True)
+        token_balance = token_account.amount if token_account else 0
+        logger.debug("Token Balance: %s", token_balance)
+
+        if token_balance == 0:
+            logger.warning("No token balance available to sell.")
             return False
-        
-        token_balance = token_balance * (percentage / 100)
-        print(f"Selling {percentage}% of the token balance, adjusted balance: {token_balance}")
 
-        print("Calculating transaction amounts...")
-        base_reserve, quote_reserve, token_decimal = get_token_reserves(pool_keys)
-        amount_out = tokens_for_sol(token_balance, base_reserve, quote_reserve)
-        print(f"Raw Amount Out: {amount_out}")
+        amount_in = token_balance * percentage // 100
+        logger.debug("Selling %s%% of the token balance, adjusted balance: %s", percentage, amount_in)
+
+        logger.debug("Calculating transaction amounts...")
+        with span("reserves"):
+            reserves = get_reserves(pool_keys, reserve_stream)
+        if reserves is None:
+            logger.warning("No reserves found...")
+            return False
+        with span("quote"):
+            minimum_amount_out = calc_sell_minimum_out(pool_keys, amount_in, slippage, reserves)
+        logger.debug("Amount In: %s | Minimum Amount Out: %s", amount_in, minimum_amount_out)
+
+        wsol_setup = []
+        if engine.persistent_wsol:
+            wsol_setup = engine.wsol_account.prepare_sell()
+            balance_needed = 0
+        else:
+            balance_needed = engine.cluster_constants.rent_exempt_minimum(engine.client, ACCOUNT_LAYOUT.sizeof())
+
+        confirmed = None
+        try:
+            if engine.persistent_wsol and not wsol_setup and percentage != 100:
+                with span("build"):
+                    template = swap_templates.get(engine.payer_keypair, pool_keys, token_account.address, engine.wsol_account.address)
+                confirmed = send_template_and_confirm(template, amount_in, minimum_amount_out, pool_keys)
+            else:
+                with span("build"):
+                    instructions = make_sell_instructions(
+                        pool_keys, token_account.address, amount_in, minimum_amount_out, percentage == 100, balance_needed,
+                        engine.wsol_account if engine.persistent_wsol else None, wsol_setup,
+                    )
+                confirmed = send_and_confirm(instructions, pool_keys)
+        finally:
+            if engine.persistent_wsol:
+                engine.wsol_account.settle_sell(minimum_amount_out, confirmed, engine.wsol_account.creates(wsol_setup))
+            engine.wallet_state.settle_sell(mint, amount_in, percentage == 100, confirmed)
+        return confirmed
         
-        slippage_adjustment = 1 - (slippage / 100)
-        amount_out_with_slippage = amount_out * slippage_adjustment
-        minimum_amount_out = int(amount_out_with_slippage * SOL_DECIMAL)
-       
-        amount_in = int(token_balance * 10**token_decimal)
-        print(f"Amount In: {amount_in} | Minimum Amount Out: {minimum_amount_out}")
+    except Exception as e:
+        logger.error("Error occurred during transaction: %s", e)
+        return False
+
+@timed("unwrap")
+def unwrap_wsol() -> bool:
+    # Closes the persistent WSOL account, returning everything it holds to the wallet as SOL.
+    engine = current_engine()
+    try:
+        logger.info("Unwrapping WSOL account: %s", engine.wsol_account.address)
+        confirmed = None
+        try:
+            confirmed = send_and_confirm([
+                set_compute_unit_limit(engine.unit_budget),
+                set_compute_unit_price(engine.unit_price),
+                *engine.wsol_account.unwrap_instructions(),
+            ])
+        finally:
+            engine.wsol_account.settle_unwrap(confirmed)
+        return confirmed
+
+    except Exception as e:
+        logger.error("Error occurred during transaction: %s", e)
+        return False
+
+def send_and_confirm(instructions: list, pool_keys: Optional[PoolKeys] = None) -> Optional[bool]:
+    engine = current_engine()
+    logger.debug("Compiling transaction message...")
+    with span("compile"):
+        blockhash, last_valid_block_height = engine.blockhash_provider.get_with_height()
+        with span("fees"):
+            budget = engine.fee_policy.budget(engine.client, engine.payer_keypair, instructions, blockhash, pool_keys)
+        compiled_message = MessageV0.try_compile(
+            engine.payer_keypair.pubkey(),
+            with_compute_budget(instructions, budget.unit_limit, budget.unit_price),
+            [],
+            blockhash,
+        )
+        txn = VersionedTransaction(compiled_message, [engine.payer_keypair])
+
+    logger.debug("Sending transaction...")
+    with span("send"):
+        txn_sig = engine.broadcaster.send(bytes(txn))
+    logger.info("Transaction Signature: %s", txn_sig)
+
+    logger.debug("Confirming transaction...")
+    confirmed = None
+    try:
+        with span("confirm"):
+            confirmed = confirm_txn(txn_sig, last_valid_block_height=last_valid_block_height)
+    finally:
+        engine.broadcaster.finish(txn_sig, confirmed)  # stops the rebroadcasts
+        engine.fee_policy.observe(engine.client, txn_sig, budget, confirmed)
+
+    logger.info("Transaction confirmed: %s", confirmed)
+    return confirmed
+
+def send_template_and_confirm(
+    template: SwapTemplate, amount_in: int, minimum_amount_out: int, pool_keys: Optional[PoolKeys] = None,
+) -> Optional[bool]:
+    engine = current_engine()
+    logger.debug("Patching swap template...")
+    with span("compile"):
+        blockhash, last_valid_block_height = engine.blockhash_provider.get_with_height()
+        with span("fees"):
+            budget = engine.fee_policy.template_budget(engine.client, template, amount_in, minimum_amount_out, blockhash, pool_keys)
+        raw_txn = template.render(amount_in, minimum_amount_out, blockhash, budget.unit_limit, budget.unit_price)
+
+    logger.debug("Sending transaction...")
+    with span("send"):
+        txn_sig = engine.broadcaster.send(raw_txn)
+    logger.info("Transaction Signature: %s", txn_sig)
+
+    logger.debug("Confirming transaction...")
+    confirmed = None
+    try:
+        with span("confirm"):
+            confirmed = confirm_txn(txn_sig, last_valid_block_height=last_valid_block_height)
+    finally:
+        engine.broadcaster.finish(txn_sig, confirmed)  # stops the rebroadcasts
+        engine.fee_policy.observe(engine.client, txn_sig, budget, confirmed)
+
+    logger.info("Transaction confirmed: %s", confirmed)
+    return confirmed
+
+def calc_buy_minimum_out(pool_keys: PoolKeys, amount_in: int, slippage: int, reserves: Reserves) -> int:
+    # Raw lamports in, raw tokens out, rounded exactly like the pool program.
+    if pool_keys.base_mint == WSOL:
+        amount_out = quote_pool_base_in(pool_keys, amount_in, reserves.base, reserves.quote)
+    else:
+        amount_out = quote_pool_base_in(pool_keys, amount_in, reserves.quote, reserves.base)
+    logger.debug("Raw Amount Out: %s", amount_out)
+    return minimum_amount_out(amount_out, slippage * 100)
+
+def calc_sell_minimum_out(pool_keys: PoolKeys, amount_in: int, slippage: int, reserves: Reserves) -> int:
+    # Raw tokens in, raw lamports out.
+    if pool_keys.base_mint == WSOL:
+        amount_out = quote_pool_base_in(pool_keys, amount_in, reserves.quote, reserves.base)
+    else:
+        amount_out = quote_pool_base_in(pool_keys, amount_in, reserves.base, reserves.quote)
+    logger.debug("Raw Amount Out: %s", amount_out)
+    return minimum_amount_out(amount_out, slippage * 100)
+
+def make_buy_instructions(
+    pool_keys: PoolKeys,
+    mint: Pubkey,
+    amount_in: int,
+    minimum_amount_out: int,
+    existing_token_account: Optional[Pubkey],
+    balance_needed: int,
+    wsol_account: Optional[WsolAccount] = None,
+    wsol_setup: Sequence = (),
+) -> list:
+    engine = current_engine()
+    payer_keypair = engine.payer_keypair
+    if existing_token_account:
+        token_account = existing_token_account
+        token_account_instr = None
+        logger.debug("Token account found.")
+    else:
         token_account = get_associated_token_address(payer_keypair.pubkey(), mint)
-        
-        print("Generating seed and creating WSOL account...")
-        seed = base64.urlsafe_b64encode(os.urandom(24)).decode('utf-8')
-        wsol_token_account = Pubkey.create_with_seed(payer_keypair.pubkey(), seed, TOKEN_PROGRAM_ID)
-        balance_needed = Token.get_min_balance_rent_for_exempt_for_account(client)
-        
-        create_wsol_account_instr = create_account_with_seed(
-            CreateAccountWithSeedParams(
-                from_pubkey=payer_keypair.pubkey(),
-                to_pubkey=wsol_token_account,
-                base=payer_keypair.pubkey(),
-                seed=seed,
-                lamports=int(balance_needed),
-                space=ACCOUNT_LAYOUT.sizeof(),
-                owner=TOKEN_PROGRAM_ID
-            )
+        # Idempotent: the cached wallet state may lag behind an account created elsewhere.
+        token_account_instr = create_idempotent_associated_token_account(payer_keypair.pubkey(), payer_keypair.pubkey(), mint)
+        logger.debug("No existing token account found; creating associated token account.")
+
+    if wsol_account is not None:
+        # Persistent mode: swap straight out of the long-lived WSOL account.
+        instructions = [set_compute_unit_limit(engine.unit_budget), set_compute_unit_price(engine.unit_price), *wsol_setup]
+        if token_account_instr:
+            instructions.append(token_account_instr)
+        instructions.append(make_swap_instruction(
+            amount_in, minimum_amount_out, wsol_account.address, token_account, pool_keys, payer_keypair
+        ))
+        return instructions
+
+    logger.debug("Generating seed for WSOL account...")
+    seed = base64.urlsafe_b64encode(os.urandom(24)).decode('utf-8') 
+    wsol_token_account = Pubkey.create_with_seed(payer_keypair.pubkey(), seed, TOKEN_PROGRAM_ID)
+    
+    logger.debug("Creating and initializing WSOL account...")
+    create_wsol_account_instr = create_account_with_seed(
+        CreateAccountWithSeedParams(
+            from_pubkey=payer_keypair.pubkey(),
+            to_pubkey=wsol_token_account,
+            base=payer_keypair.pubkey(),
+            seed=seed,
+            lamports=int(balance_needed + amount_in),
+            space=ACCOUNT_LAYOUT.sizeof(),
+            owner=TOKEN_PROGRAM_ID
         )
-        
-        init_wsol_account_instr = initialize_account(
-            InitializeAccountParams(
-                program_id=TOKEN_PROGRAM_ID,
-                account=wsol_token_account,
-                mint=WSOL,
-                owner=payer_keypair.pubkey()
-            )
+    )
+    
+    init_wsol_account_instr = initialize_account(
+        InitializeAccountParams(
+            program_id=TOKEN_PROGRAM_ID,
+            account=wsol_token_account,
+            mint=WSOL,
+            owner=payer_keypair.pubkey()
         )
+    )
+    
+    logger.debug("Creating swap instructions...")
+    swap_instructions = make_swap_instruction(
+        amount_in=amount_in,
+        minimum_amount_out=minimum_amount_out,
+        token_account_in=wsol_token_account,
+        token_account_out=token_account,
+        accounts=pool_keys,
+        owner=payer_keypair
+    )
 
-        print("Creating swap instructions...")
-        swap_instructions = make_swap_instruction(amount_in, minimum_amount_out, token_account, wsol_token_account, pool_keys, payer_keypair)
-        
-        print("Preparing to close WSOL account after swap...")
-        close_wsol_account_instr = close_account(CloseAccountParams(TOKEN_PROGRAM_ID, wsol_token_account, payer_keypair.pubkey(), payer_keypair.pubkey()))
-        
+    logger.debug("Preparing to close WSOL account after swap...")
+    close_wsol_account_instr = close_account(
+        CloseAccountParams(
+            program_id=TOKEN_PROGRAM_ID,
+            account=wsol_token_account,
+            dest=payer_keypair.pubkey(),
+            owner=payer_keypair.pubkey()
+        )
+    )
+    
+    instructions = [
+        set_compute_unit_limit(engine.unit_budget),
+        set_compute_unit_price(engine.unit_price),
+        create_wsol_account_instr,
+        init_wsol_account_instr
+    ]
+    
+    if token_account_instr:
+        instructions.append(token_account_instr)
+    
+    instructions.append(swap_instructions)
+    instructions.append(close_wsol_account_instr)
+    return instructions
+
+def make_sell_instructions(
+    pool_keys: PoolKeys,
+    token_account: Pubkey,
+    amount_in: int,
+    minimum_amount_out: int,
+    close_token_account: bool,
+    balance_needed: int,
+    wsol_account: Optional[WsolAccount] = None,
+    wsol_setup: Sequence = (),
+) -> list:
+    engine = current_engine()
+    payer_keypair = engine.payer_keypair
+    if wsol_account is not None:
+        # Persistent mode: proceeds stay wrapped in the long-lived WSOL account.
         instructions = [
-            set_compute_unit_limit(UNIT_BUDGET),
-            set_compute_unit_price(UNIT_PRICE),
-            create_wsol_account_instr,
-            init_wsol_account_instr,
-            swap_instructions,
-            close_wsol_account_instr
+            set_compute_unit_limit(engine.unit_budget),
+            set_compute_unit_price(engine.unit_price),
+            *wsol_setup,
+            make_swap_instruction(amount_in, minimum_amount_out, token_account, wsol_account.address, pool_keys, payer_keypair),
         ]
-        
-        if percentage == 100:
-            print("Preparing to close token account after swap...")
-            close_token_account_instr = close_account(
+        if close_token_account:
+            instructions.append(close_account(
                 CloseAccountParams(TOKEN_PROGRAM_ID, token_account, payer_keypair.pubkey(), payer_keypair.pubkey())
-            )
-            instructions.append(close_token_account_instr)
+            ))
+        return instructions
+    
+    logger.debug("Generating seed and creating WSOL account...")
+    seed = base64.urlsafe_b64encode(os.urandom(24)).decode('utf-8')
+    wsol_token_account = Pubkey.create_with_seed(payer_keypair.pubkey(), seed, TOKEN_PROGRAM_ID)
+    
+    create_wsol_account_instr = create_account_with_seed(
+        CreateAccountWithSeedParams(
+            from_pubkey=payer_keypair.pubkey(),
+            to_pubkey=wsol_token_account,
+            base=payer_keypair.pubkey(),
+            seed=seed,
+            lamports=int(balance_needed),
+            space=ACCOUNT_LAYOUT.sizeof(),
+            owner=TOKEN_PROGRAM_ID
+        )
+    )
+    
+    init_wsol_account_instr = initialize_account(
+        InitializeAccountParams(
+            program_id=TOKEN_PROGRAM_ID,
+            account=wsol_token_account,
+            mint=WSOL,
+            owner=payer_keypair.pubkey()
+        )
+    )
 
-        print("Compiling transaction message...")
-        compiled_message = MessageV0.try_compile(
-            payer_keypair.pubkey(),
-            instructions,
-            [],  
-            client.get_latest_blockhash().value.blockhash,
+    logger.debug("Creating swap instructions...")
+    swap_instructions = make_swap_instruction(amount_in, minimum_amount_out, token_account, wsol_token_account, pool_keys, payer_keypair)
+    
+    logger.debug("Preparing to close WSOL account after swap...")
+    close_wsol_account_instr = close_account(CloseAccountParams(TOKEN_PROGRAM_ID, wsol_token_account, payer_keypair.pubkey(), payer_keypair.pubkey()))
+    
+    instructions = [
+        set_compute_unit_limit(engine.unit_budget),
+        set_compute_unit_price(engine.unit_price),
+        create_wsol_account_instr,
+        init_wsol_account_instr,
+        swap_instructions,
+        close_wsol_account_instr
+    ]
+    
+    if close_token_account:
+        logger.debug("Preparing to close token account after swap...")
+        close_token_account_instr = close_account(
+            CloseAccountParams(TOKEN_PROGRAM_ID, token_account, payer_keypair.pubkey(), payer_keypair.pubkey())
         )
-        
-        print("Sending transaction...")
-        txn_sig = client.send_transaction(
-            txn = VersionedTransaction(compiled_message, [payer_keypair]), 
-            opts = TxOpts(skip_preflight=True)
-            ).value
-        print("Transaction Signature:", txn_sig)
-
-        print("Confirming transaction...")
-        confirmed = confirm_txn(txn_sig)
-        
-        print("Transaction confirmed:", confirmed)
-        return confirmed
-        
-    except Exception as e:
-        print("Error occurred during transaction:", e)
-        return False
+        instructions.append(close_token_account_instr)
+    return instructions
@@ -0,0 +1,220 @@
+import logging
+from dataclasses import dataclass
+from typing import Iterable, Iterator, Optional
+from solders.pubkey import Pubkey  # type: ignore
+from constants import WSOL
+from fast_layouts import ACCOUNT, LIQUIDITY_STATE_V4, MARKET_STATE_V3
+from quote import minimum_amount_out_batch, quote_base_in_batch
+from reserves import Reserves
+from snapshots import read_blocks
+from utils import decode_pool_keys
+
+logger = logging.getLogger(__name__)
+
+np = None  # numpy, imported when a Replay is built
+
+# Offline replay of a snapshot file (snapshots.py), without any RPC. Loading decodes the
+# pool keys from the first recorded AMM and market account of each pool, exactly like
+# fetch_pool_keys, and turns every vault and AMM update into per-pool reserve series:
+# vault amount minus the AMM's pending pnl, one entry per slot in which anything changed.
+# Vault amounts and pnl are gathered straight out of each block's data with numpy, so
+# loading costs a few numpy operations per block rather than a Python call per row.
+#
+# Quotes run over a whole series (or a grid of amounts x series) at once through
+# quote_base_in_batch, bit-exact with the on-chain program; events() walks every pool in
+# slot order for rules that need state between updates.
+#
+#   replay = Replay("pools.snap")
+#   out = replay.quote_buy(amm_id, [10**8, 10**9])  # shape (2, len(replay.series(amm_id)))
+#   for slot, amm_id, reserves in replay.events():
+#       ...
+
+AMM_SIZE = LIQUIDITY_STATE_V4.size
+MARKET_SIZE = MARKET_STATE_V3.size
+VAULT_SIZE = ACCOUNT.size
+AMOUNT_OFFSET = ACCOUNT.offsets["amount"]
+PNL_COIN_OFFSET = LIQUIDITY_STATE_V4.offsets["needTakePnlCoin"]
+PNL_PC_OFFSET = LIQUIDITY_STATE_V4.offsets["needTakePnlPc"]
+
+def _load_numpy() -> None:
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            raise ImportError("Replay requires numpy") from None
+        np = numpy
+
+def _u64_at(data, offsets):
+    # Little-endian u64s at the given byte offsets of a uint8 array.
+    if not len(offsets):
+        return np.zeros(0, dtype=np.uint64)
+    return data[offsets[:, None] + np.arange(8)].view("<u8").reshape(-1)
+
+def _latest(present):
+    # For every position, the index of the latest position at or before it where present is
+    # set, or -1.
+    index = np.where(present, np.arange(len(present)), -1)
+    return np.maximum.accumulate(index) if len(index) else index
+
+class _Grouped:
+    # Row columns sorted by account number (recording order kept within an account), so the
+    # rows of one account are a slice.
+    def __init__(self, rows, slots, accounts, *values):
+        order = np.argsort(accounts, kind="stable")
+        self.accounts = accounts[order]
+        self.columns = [column[order] for column in (rows, slots, *values)]
+
+    def of(self, number: int) -> tuple:
+        lo, hi = np.searchsorted(self.accounts, [number, number + 1]) if number >= 0 else (0, 0)
+        return tuple(column[lo:hi] for column in self.columns)
+
+@dataclass
+class ReserveSeries:
+    slots: "np.ndarray"  # uint64, increasing
+    base: "np.ndarray"  # uint64, net of pending pnl
+    quote: "np.ndarray"
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+    def at(self, slot: int) -> Optional[Reserves]:
+        # The reserves as of the end of slot.
+        i = int(np.searchsorted(self.slots, slot, side="right")) - 1
+        if i < 0:
+            return None
+        return Reserves(base=int(self.base[i]), quote=int(self.quote[i]), slot=int(self.slots[i]))
+
+class Replay:
+    def __init__(self, path: str, pools: Optional[Iterable[str]] = None):
+        # pools: AMM ids to keep, None for every pool found in the file.
+        _load_numpy()
+        self.path = path
+        self.rows = 0
+        self.pools = {}  # str(amm_id) -> PoolKeys
+        self._series = {}  # str(amm_id) -> ReserveSeries
+        self._load(None if pools is None else {str(amm_id) for amm_id in pools})
+
+    def series(self, amm_id) -> ReserveSeries:
+        return self._series[str(amm_id)]
+
+    def reserves_at(self, amm_id, slot: int) -> Optional[Reserves]:
+        return self._series[str(amm_id)].at(slot)
+
+    def quote_buy(self, amm_id, amount_in, slippage_bps: int = 0):
+        # Raw tokens out for amount_in lamports at every point of the pool's series; like
+        # calc_buy_minimum_out. An array of amounts shaped (k, 1) gives a (k, len) grid.
+        pool_keys, series = self.pools[str(amm_id)], self._series[str(amm_id)]
+        if pool_keys.base_mint == WSOL:
+            return self._quote(pool_keys, amount_in, series.base, series.quote, slippage_bps)
+        return self._quote(pool_keys, amount_in, series.quote, series.base, slippage_bps)
+
+    def quote_sell(self, amm_id, amount_in, slippage_bps: int = 0):
+        # Raw lamports out for amount_in raw tokens; like calc_sell_minimum_out.
+        pool_keys, series = self.pools[str(amm_id)], self._series[str(amm_id)]
+        if pool_keys.base_mint == WSOL:
+            return self._quote(pool_keys, amount_in, series.quote, series.base, slippage_bps)
+        return self._quote(pool_keys, amount_in, series.base, series.quote, slippage_bps)
+
+    def events(self) -> Iterator[tuple]:
+        # (slot, amm_id, Reserves) for every series entry of every pool, in slot order.
+        names = list(self._series)
+        if not names:
+            return
+        slots = np.concatenate([self._series[name].slots for name in names])
+        owners = np.concatenate([np.full(len(self._series[name]), i, dtype=np.uint32) for i, name in enumerate(names)])
+        positions = np.concatenate([np.arange(len(self._series[name])) for name in names])
+        order = np.argsort(slots, kind="stable")
+        for slot, owner, position in zip(slots[order].tolist(), owners[order].tolist(), positions[order].tolist()):
+            series = self._series[names[owner]]
+            yield slot, names[owner], Reserves(int(series.base[position]), int(series.quote[position]), slot)
+
+    def _quote(self, pool_keys, amount_in, reserve_in, reserve_out, slippage_bps: int):
+        amount_out = quote_base_in_batch(
+            amount_in, reserve_in, reserve_out, pool_keys.swap_fee_numerator, pool_keys.swap_fee_denominator,
+        )
+        return minimum_amount_out_batch(amount_out, slippage_bps) if slippage_bps else amount_out
+
+    def _load(self, wanted: Optional[set]) -> None:
+        keys, numbers = [], {}  # account number -> 32-byte key, and back
+        first_data = {}  # account number -> data of its first AMM or market row
+        vault_parts, amm_parts = [], []  # (row, account, values...) arrays per block
+        for block in read_blocks(self.path):
+            for key in block.new_keys:
+                numbers[key] = len(keys)
+                keys.append(key)
+            rows = np.arange(self.rows, self.rows + block.rows, dtype=np.uint64)
+            self.rows += block.rows
+            slots = np.frombuffer(block.slots, dtype="<u8")
+            accounts = np.frombuffer(block.accounts, dtype="<u4")
+            lengths = np.frombuffer(block.lengths, dtype="<u4").astype(np.int64)
+            starts = np.cumsum(lengths) - lengths
+            data = np.frombuffer(block.data, dtype=np.uint8)
+
+            vault, amm = lengths == VAULT_SIZE, lengths == AMM_SIZE
+            for mask in (amm, lengths == MARKET_SIZE):
+                if mask.any():
+                    found, first = np.unique(accounts[mask], return_index=True)
+                    for number, row in zip(found.tolist(), np.flatnonzero(mask)[first].tolist()):
+                        if number not in first_data:
+                            first_data[number] = bytes(block.data[starts[row]:starts[row] + lengths[row]])
+            vault_parts.append((rows[vault], slots[vault], accounts[vault], _u64_at(data, starts[vault] + AMOUNT_OFFSET)))
+            amm_parts.append((
+                rows[amm], slots[amm], accounts[amm],
+                _u64_at(data, starts[amm] + PNL_COIN_OFFSET), _u64_at(data, starts[amm] + PNL_PC_OFFSET),
+            ))
+        if not keys:
+            return
+
+        vaults = _Grouped(*(np.concatenate(column) for column in zip(*vault_parts)))
+        amms = _Grouped(*(np.concatenate(column) for column in zip(*amm_parts)))
+        for number, data in first_data.items():
+            if len(data) != AMM_SIZE:
+                continue
+            amm_id = Pubkey.from_bytes(keys[number])
+            if wanted is not None and str(amm_id) not in wanted:
+                continue
+            market = first_data.get(numbers.get(bytes(LIQUIDITY_STATE_V4.read(data, "serumMarket")), -1))
+            if market is None:
+                logger.debug("No market account recorded for pool %s", amm_id)
+                continue
+            try:
+                pool_keys = decode_pool_keys(amm_id, data, market)
+            except Exception as e:
+                logger.warning("Error decoding pool keys of %s: %s", amm_id, e)
+                continue
+            self.pools[str(amm_id)] = pool_keys
+            self._series[str(amm_id)] = self._build_series(
+                vaults.of(numbers.get(bytes(pool_keys.base_vault), -1)),
+                vaults.of(numbers.get(bytes(pool_keys.quote_vault), -1)),
+                amms.of(number),
+            )
+
+    def _build_series(self, base: tuple, quote: tuple, amm: tuple) -> ReserveSeries:
+        # base, quote: (rows, slots, amounts); amm: (rows, slots, pnl_coin, pnl_pc).
+        # Every update of the pool in recording order within a slot: base, quote or amm.
+        rows = np.concatenate((base[0], quote[0], amm[0]))
+        slots = np.concatenate((base[1], quote[1], amm[1]))
+        kinds = np.concatenate((
+            np.zeros(len(base[0]), dtype=np.uint8), np.ones(len(quote[0]), dtype=np.uint8),
+            np.full(len(amm[0]), 2, dtype=np.uint8),
+        ))
+        values = np.concatenate((base[2], quote[2], amm[2]))
+        values_pc = np.concatenate((np.zeros(len(base[0]) + len(quote[0]), dtype=np.uint64), amm[3]))
+        order = np.lexsort((rows, slots))
+        slots, kinds, values, values_pc = slots[order], kinds[order], values[order], values_pc[order]
+
+        base_at, quote_at, amm_at = _latest(kinds == 0), _latest(kinds == 1), _latest(kinds == 2)
+        # The state at the end of each slot, once both vaults have been seen.
+        keep = (base_at >= 0) & (quote_at >= 0)
+        keep[:-1] &= slots[:-1] != slots[1:]
+        base = values[base_at[keep]]
+        quote = values[quote_at[keep]]
+        has_amm = amm_at[keep] >= 0
+        coin = np.where(has_amm, values[amm_at[keep]], 0).astype(np.uint64)
+        pc = np.where(has_amm, values_pc[amm_at[keep]], 0).astype(np.uint64)
+        return ReserveSeries(
+            slots[keep],
+            np.where(base > coin, base - coin, 0).astype(np.uint64),
+            np.where(quote > pc, quote - pc, 0).astype(np.uint64),
+        )
@@ -0,0 +1,243 @@
+import asyncio
+import base64
+import json
+import logging
+import threading
+import time
+from typing import Optional
+import websockets
+from fast_layouts import ACCOUNT, LIQUIDITY_STATE_V4
+from pool_keys import PoolKeys
+from reserves import Reserves, fetch_reserves
+
+logger = logging.getLogger(__name__)
+
+# Keeps pool reserves in memory from accountSubscribe notifications on each pool's vaults
+# (and optionally its AMM account, for the pending pnl the program excludes from swaps;
+# without it, the pnl stays as the last seed() read it).
+# While the socket is up every subscribed value is current, so staleness only starts to
+# count once the connection drops. Updates missed while disconnected are not replayed, so
+# given a client the stream re-reads every vault each time it (re)subscribes.
+#
+# handle() takes one decoded websocket message, so updates can be fed without a socket;
+# mock_rpc.MockWsNode serves the socket side for tests and benchmarks. seed() runs on other
+# threads (a resync runs in an executor), so pool state is only touched under _lock.
+
+AMM_PNL = LIQUIDITY_STATE_V4.select(("needTakePnlCoin", "needTakePnlPc"))
+
+class _PoolState:
+    __slots__ = ("base", "quote", "base_slot", "quote_slot", "pnl_coin", "pnl_pc", "amm_slot", "watch_amm")
+
+    def __init__(self, watch_amm: bool):
+        self.base = None
+        self.quote = None
+        self.base_slot = 0
+        self.quote_slot = 0
+        self.pnl_coin = 0
+        self.pnl_pc = 0
+        self.amm_slot = 0
+        self.watch_amm = watch_amm
+
+class ReserveStream:
+    def __init__(
+        self,
+        ws_url: str,
+        client=None,
+        commitment: str = "processed",
+        reconnect_delay: float = 1.0,
+        max_reconnect_delay: float = 30.0,
+        recorder=None,
+        shared_table=None,
+    ):
+        self.ws_url = ws_url
+        self.client = client
+        self.commitment = commitment
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.recorder = recorder  # SnapshotRecorder fed every notification, for replay.py
+        self.shared_table = shared_table  # SharedPoolTable this stream writes, for other processes
+        self.updates = 0
+        self.reconnects = 0
+        self._pools = {}  # str(amm_id) -> PoolKeys
+        self._state = {}  # str(amm_id) -> _PoolState
+        self._targets = {}  # str(pubkey) -> (str(amm_id), "base" | "quote" | "amm")
+        self._subscriptions = {}  # subscription id -> str(pubkey)
+        self._pending = {}  # request id -> str(pubkey)
+        self._next_id = 1
+        self._ws = None
+        self._connected = False
+        self._disconnected_at = time.monotonic()
+        self._loop = None
+        self._thread = None
+        self._task = None
+        self._lock = threading.RLock()
+
+    def add_pool(self, pool_keys: PoolKeys, watch_amm: bool = False) -> None:
+        amm_id = str(pool_keys.amm_id)
+        self._pools[amm_id] = pool_keys
+        with self._lock:
+            self._state.setdefault(amm_id, _PoolState(watch_amm))
+        if self.shared_table is not None:
+            self.shared_table.put_pool_keys(pool_keys)
+        targets = [(pool_keys.base_vault, "base"), (pool_keys.quote_vault, "quote")]
+        if watch_amm:
+            targets.append((pool_keys.amm_id, "amm"))
+        for pubkey, kind in targets:
+            self._targets[str(pubkey)] = (amm_id, kind)
+            if self._ws is not None and self._loop is not None:
+                self._loop.call_soon_threadsafe(
+                    lambda key=str(pubkey): asyncio.ensure_future(self._subscribe(self._ws, key))
+                )
+
+    def seed(self, client=None) -> None:
+        # One-shot snapshot so pools are quotable before their first notification.
+        client = client or self.client
+        for amm_id, reserves in fetch_reserves(client, list(self._pools.values())).items():
+            with self._lock:
+                state = self._state[amm_id]
+                if reserves.slot > state.base_slot:
+                    state.base, state.base_slot = reserves.base + reserves.base_pnl, reserves.slot
+                if reserves.slot > state.quote_slot:
+                    state.quote, state.quote_slot = reserves.quote + reserves.quote_pnl, reserves.slot
+                if reserves.slot > state.amm_slot:
+                    state.pnl_coin, state.pnl_pc, state.amm_slot = reserves.base_pnl, reserves.quote_pnl, reserves.slot
+                self._publish(amm_id)
+
+    @property
+    def connected(self) -> bool:
+        return self._connected
+
+    def get(self, amm_id: str, max_age: Optional[float] = None) -> Optional[Reserves]:
+        state = self._state.get(str(amm_id))
+        if state is None or state.base is None or state.quote is None:
+            return None
+        if max_age is not None and not self._connected and time.monotonic() - self._disconnected_at > max_age:
+            return None
+        with self._lock:
+            return Reserves(
+                base=max(state.base - state.pnl_coin, 0),
+                quote=max(state.quote - state.pnl_pc, 0),
+                slot=min(state.base_slot, state.quote_slot),
+                base_pnl=state.pnl_coin,
+                quote_pnl=state.pnl_pc,
+            )
+
+    async def run(self) -> None:
+        delay = self.reconnect_delay
+        while True:
+            try:
+                async with websockets.connect(self.ws_url, max_size=None) as ws:
+                    self._ws = ws
+                    self._subscriptions.clear()
+                    self._pending.clear()
+                    for pubkey in list(self._targets):
+                        await self._subscribe(ws, pubkey)
+                    if self.client is not None and self._pools:
+                        asyncio.get_running_loop().run_in_executor(None, self._resync)
+                    delay = self.reconnect_delay
+                    async for message in ws:
+                        self.handle(json.loads(message))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Reserve stream disconnected: %s", e)
+            finally:
+                self._ws = None
+                if self._connected:
+                    self._connected = False
+                    self._disconnected_at = time.monotonic()
+
+            self.reconnects += 1
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_reconnect_delay)
+
+    def start(self) -> None:
+        # Runs the stream on its own event loop thread, for use from synchronous code.
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_thread, name="reserve-stream", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._loop is None:
+            return
+        if self._task is not None:
+            self._loop.call_soon_threadsafe(self._task.cancel)
+        if self._thread is not None:
+            self._thread.join()
+        self._thread = None
+        self._loop = None
+        self._task = None
+
+    def _run_thread(self) -> None:
+        asyncio.set_event_loop(self._loop)
+        self._task = self._loop.create_task(self.run())
+        try:
+            self._loop.run_until_complete(self._task)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self._loop.close()
+
+    def _resync(self) -> None:
+        try:
+            self.seed()
+        except Exception as e:
+            logger.warning("Error resyncing reserves: %s", e)
+
+    async def _subscribe(self, ws, pubkey: str) -> None:
+        request_id = self._next_id
+        self._next_id += 1
+        self._pending[request_id] = pubkey
+        await ws.send(json.dumps({
+            "jsonrpc": "2.0",
+            "id": request_id,
+            "method": "accountSubscribe",
+            "params": [pubkey, {"encoding": "base64", "commitment": self.commitment}],
+        }))
+
+    def handle(self, message: dict) -> None:
+        # One decoded websocket message: a subscription reply or an accountNotification.
+        if "id" in message:
+            pubkey = self._pending.pop(message["id"], None)
+            if pubkey is None:
+                return
+            if "result" in message:
+                self._subscriptions[message["result"]] = pubkey
+                # Live once every target has an active subscription.
+                if not self._pending and len(self._subscriptions) >= len(self._targets):
+                    self._connected = True
+            else:
+                logger.warning("Subscription failed for %s: %s", pubkey, message.get('error'))
+            return
+
+        if message.get("method") != "accountNotification":
+            return
+        params = message["params"]
+        pubkey = self._subscriptions.get(params["subscription"])
+        if pubkey is None:
+            return
+        amm_id, kind = self._targets[pubkey]
+        state = self._state[amm_id]
+        result = params["result"]
+        slot = result["context"]["slot"]
+        data = base64.b64decode(result["value"]["data"][0])
+        if self.recorder is not None:
+            self.recorder.record(pubkey, slot, data)
+
+        with self._lock:
+            if kind == "base" and slot >= state.base_slot:
+                state.base, state.base_slot = ACCOUNT.read(data, "amount"), slot
+            elif kind == "quote" and slot >= state.quote_slot:
+                state.quote, state.quote_slot = ACCOUNT.read(data, "amount"), slot
+            elif kind == "amm" and slot >= state.amm_slot:
+                (state.pnl_coin, state.pnl_pc), state.amm_slot = AMM_PNL.unpack(data), slot
+            self.updates += 1
+            self._publish(amm_id)
+
+    def _publish(self, amm_id: str) -> None:
+        if self.shared_table is not None:
+            reserves = self.get(amm_id)
+            if reserves is not None:
+                self.shared_table.put_reserves(amm_id, reserves)
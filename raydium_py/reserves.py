@@ -0,0 +1,126 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Optional, Sequence
+from solana.rpc.commitment import Processed
+from fast_layouts import ACCOUNT, LIQUIDITY_STATE_V4
+from pool_keys import PoolKeys
+
+logger = logging.getLogger(__name__)
+
+# getMultipleAccounts accepts at most 100 pubkeys per request. Each pool contributes its
+# AMM account and base and quote vault back to back, so a chunk never splits a pool.
+#
+# Reserves are what the program swaps against: each vault's amount minus the pnl the AMM
+# has not taken yet (needTakePnlCoin/needTakePnlPc), as ReserveStream and replay.py use.
+MAX_ACCOUNTS_PER_REQUEST = 100
+ACCOUNTS_PER_POOL = 3
+AMM_PNL = LIQUIDITY_STATE_V4.select(("needTakePnlCoin", "needTakePnlPc"))
+
+@dataclass
+class Reserves:
+    base: int  # raw amount in the pool's base (coin) vault, net of pending pnl
+    quote: int  # raw amount in the pool's quote (pc) vault, net of pending pnl
+    slot: int
+    base_pnl: int = 0  # the pending pnl subtracted from each
+    quote_pnl: int = 0
+
+def vault_chunks(pools: Sequence[PoolKeys], chunk_size: int = MAX_ACCOUNTS_PER_REQUEST) -> list:
+    chunk_size -= chunk_size % ACCOUNTS_PER_POOL
+    accounts = []
+    for pool_keys in pools:
+        accounts.append(pool_keys.amm_id)
+        accounts.append(pool_keys.base_vault)
+        accounts.append(pool_keys.quote_vault)
+    return [accounts[i:i + chunk_size] for i in range(0, len(accounts), chunk_size)]
+
+def decode_reserves(pools: Sequence[PoolKeys], responses: Sequence) -> dict:
+    table = {}
+    pool_index = 0
+    for response in responses:
+        slot = response.context.slot
+        accounts = response.value
+        for i in range(0, len(accounts), ACCOUNTS_PER_POOL):
+            amm_account, base_account, quote_account = accounts[i:i + ACCOUNTS_PER_POOL]
+            pool_keys = pools[pool_index]
+            pool_index += 1
+            if amm_account is None or base_account is None or quote_account is None:
+                logger.warning("Missing AMM or vault account for pool: %s", pool_keys.amm_id)
+                continue
+            base_pnl, quote_pnl = AMM_PNL.unpack(amm_account.data)
+            base = ACCOUNT.read(base_account.data, "amount")
+            quote = ACCOUNT.read(quote_account.data, "amount")
+            table[str(pool_keys.amm_id)] = Reserves(
+                base=max(base - base_pnl, 0),
+                quote=max(quote - quote_pnl, 0),
+                slot=slot,
+                base_pnl=base_pnl,
+                quote_pnl=quote_pnl,
+            )
+    return table
+
+def fetch_reserves(client, pools: Sequence[PoolKeys], chunk_size: int = MAX_ACCOUNTS_PER_REQUEST) -> dict:
+    responses = [
+        client.get_multiple_accounts(chunk, commitment=Processed)
+        for chunk in vault_chunks(pools, chunk_size)
+    ]
+    return decode_reserves(pools, responses)
+
+async def async_fetch_reserves(async_client, pools: Sequence[PoolKeys], chunk_size: int = MAX_ACCOUNTS_PER_REQUEST) -> dict:
+    responses = await asyncio.gather(*(
+        async_client.get_multiple_accounts(chunk, commitment=Processed)
+        for chunk in vault_chunks(pools, chunk_size)
+    ))
+    return decode_reserves(pools, responses)
+
+class ReserveCache:
+    # Reserves shared by many concurrent trades on the same pools. A pool is fetched at most
+    # once per ttl seconds, and trades that miss at the same time share a single
+    # getMultipleAccounts. get() has ReserveStream's signature, so the cache can be passed
+    # to buy/sell as their reserve_stream.
+    def __init__(self, ttl: float = 1.0):
+        self.ttl = ttl
+        self.fetches = 0
+        self._entries = {}  # str(amm_id) -> (Reserves, fetched_at)
+        self._in_flight = {}  # str(amm_id) -> future resolved when its fetch finishes
+
+    def get(self, amm_id: str, max_age: Optional[float] = None) -> Optional[Reserves]:
+        entry = self._entries.get(str(amm_id))
+        if entry is None:
+            return None
+        max_age = self.ttl if max_age is None else min(self.ttl, max_age)
+        reserves, fetched_at = entry
+        return reserves if time.monotonic() - fetched_at <= max_age else None
+
+    async def async_refresh(self, async_client, pools: Sequence[PoolKeys]) -> dict:
+        # Fetches the stale pools in one go and waits for those another trade is fetching.
+        waiting, missing = set(), []
+        for pool_keys in pools:
+            key = str(pool_keys.amm_id)
+            if self.get(key) is not None:
+                continue
+            if key in self._in_flight:
+                waiting.add(self._in_flight[key])
+            else:
+                missing.append(pool_keys)
+
+        if missing:
+            future = asyncio.get_running_loop().create_future()
+            for pool_keys in missing:
+                self._in_flight[str(pool_keys.amm_id)] = future
+            try:
+                self.fetches += 1
+                table = await async_fetch_reserves(async_client, missing)
+                fetched_at = time.monotonic()
+                for key, reserves in table.items():
+                    self._entries[key] = (reserves, fetched_at)
+            finally:
+                # Waiters that still find no entry fall back to their own fetch.
+                for pool_keys in missing:
+                    self._in_flight.pop(str(pool_keys.amm_id), None)
+                future.set_result(None)
+
+        if waiting:
+            await asyncio.gather(*waiting)
+        return {str(pool_keys.amm_id): self.get(pool_keys.amm_id) for pool_keys in pools}
@@ -0,0 +1,266 @@
+import asyncio
+import json
+import logging
+import random
+import threading
+import time
+from typing import Callable, Optional
+from solders.rpc.requests import (  # type: ignore
+    SendLegacyTransaction,
+    SendRawTransaction,
+    SendVersionedTransaction,
+)
+
+logger = logging.getLogger(__name__)
+
+# What every call through an engine's client passes before it reaches the HTTP transport
+# (transport.py):
+#
+#   singleflight  a call identical (same method and params) to one already in flight waits
+#                 for that one's response instead of sending its own (sends never share);
+#                 if the caller sending it is cancelled, a waiting caller sends it instead
+#   rate limits   a token bucket for the whole endpoint (rate calls per second, burst at
+#                 once) and optional ones per method; a call that finds no token waits
+#   priority      calls only take the bucket's last tokens by priority class: sends and
+#                 confirmations may empty it, ordinary reads leave a quarter of the burst,
+#                 discovery scans half, so scans back off first when the limit is near
+#   429 retry     an HTTP 429 Too Many Requests is retried up to max_retries times, after
+#                 Retry-After if the endpoint gives one, else exponential backoff with jitter
+#
+# stats() counts calls, deduplicated calls, throttled calls and seconds spent waiting,
+# 429 responses and retries.
+
+URGENT, NORMAL, DISCOVERY = 0, 1, 2
+PRIORITIES = {
+    "sendTransaction": URGENT,
+    "getSignatureStatuses": URGENT,
+    "getLatestBlockhash": URGENT,
+    "getBlockHeight": URGENT,
+    "getProgramAccounts": DISCOVERY,
+    "getSignaturesForAddress": DISCOVERY,
+}
+HEADROOM = {URGENT: 0.0, NORMAL: 0.25, DISCOVERY: 0.5}  # share of the burst a class leaves untouched
+SENDS = (SendRawTransaction, SendVersionedTransaction, SendLegacyTransaction)
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_RETRY_BASE = 0.25  # seconds before the first retry, doubled for each one after
+DEFAULT_RETRY_MAX = 5.0
+
+def _method(raw: str) -> str:
+    return json.loads(raw)["method"]
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.burst = max(1.0, rate if burst is None else burst)
+        self.tokens = self.burst
+        self._updated = time.monotonic()
+
+    def wait_time(self, priority: int = NORMAL) -> float:
+        # Seconds until a call of this priority may take a token; 0 if it may now. Callers
+        # hold the gateway's lock.
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        needed = 1 + HEADROOM.get(priority, HEADROOM[NORMAL]) * (self.burst - 1)
+        return max(0.0, (needed - self.tokens) / self.rate)
+
+    def take(self) -> None:
+        self.tokens -= 1
+
+class _Abandoned(Exception):
+    # Set on a flight whose leader was cancelled or interrupted before it got a response.
+    pass
+
+_ABANDONED = _Abandoned()
+
+class _Flight:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class RpcGateway:
+    def __init__(
+        self,
+        rate: Optional[float] = None,
+        burst: Optional[float] = None,
+        method_rates: Optional[dict] = None,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        retry_base: float = DEFAULT_RETRY_BASE,
+        retry_max: float = DEFAULT_RETRY_MAX,
+        priorities: Optional[dict] = None,
+    ):
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self.method_buckets = {method: TokenBucket(method_rate) for method, method_rate in (method_rates or {}).items()}
+        self.max_retries = max_retries
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.priorities = {**PRIORITIES, **(priorities or {})}
+        self.calls = 0
+        self.deduplicated = 0
+        self.throttled = 0
+        self.throttle_seconds = 0.0
+        self.rate_limited = 0  # 429 responses
+        self.retried = 0
+        self._flights = {}  # request json -> _Flight, sync callers
+        self._async_flights = {}  # (loop, request json) -> future, async callers
+        self._lock = threading.Lock()
+        self._rng = random.Random()
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "deduplicated": self.deduplicated,
+            "throttled": self.throttled,
+            "throttle_seconds": round(self.throttle_seconds, 6),
+            "rate_limited": self.rate_limited,
+            "retried": self.retried,
+        }
+
+    def call(self, body, request: Callable):
+        # request(body) sends the call; returns its raw response.
+        raw = body.to_json()
+        first = True
+        while True:
+            flight, leader = self._join(raw, None, isinstance(body, SENDS), first)
+            first = False
+            if not leader:
+                flight.done.wait()
+                if flight.error is _ABANDONED:
+                    self._rejoin()
+                    continue
+                if flight.error is not None:
+                    raise flight.error
+                return flight.result
+
+            try:
+                self.acquire(_method(raw))
+                result = request(body)
+                if flight is not None:
+                    flight.result = result
+                return result
+            except Exception as e:
+                if flight is not None:
+                    flight.error = e
+                raise
+            except BaseException:
+                # Interrupted, not failed: the callers waiting on it send the call themselves.
+                if flight is not None:
+                    flight.error = _ABANDONED
+                raise
+            finally:
+                if flight is not None:
+                    with self._lock:
+                        self._flights.pop(raw, None)
+                    flight.done.set()
+
+    async def async_call(self, body, request: Callable):
+        raw = body.to_json()
+        loop = asyncio.get_running_loop()
+        first = True
+        while True:
+            future, leader = self._join(raw, loop, isinstance(body, SENDS), first)
+            first = False
+            if not leader:
+                try:
+                    return await asyncio.shield(future)
+                except _Abandoned:
+                    self._rejoin()
+                    continue
+
+            try:
+                await self.async_acquire(_method(raw))
+                result = await request(body)
+                if future is not None:
+                    future.set_result(result)
+                return result
+            except Exception as e:
+                if future is not None and not future.done():
+                    future.set_exception(e)
+                    future.exception()  # retrieved here, so a future nobody awaited is not reported
+                raise
+            except BaseException:
+                # Cancelled (e.g. this caller's timeout), not failed: the callers waiting on it
+                # send the call themselves, or join whichever of them does first.
+                if future is not None and not future.done():
+                    future.set_exception(_ABANDONED)
+                    future.exception()
+                raise
+            finally:
+                if future is not None:
+                    with self._lock:
+                        self._async_flights.pop((loop, raw), None)
+
+    def acquire(self, method: str) -> None:
+        counted = False
+        while True:
+            wait = self._try_take(method)
+            if not wait:
+                return
+            self._count_throttle(wait, not counted)
+            counted = True
+            time.sleep(wait)
+
+    async def async_acquire(self, method: str) -> None:
+        counted = False
+        while True:
+            wait = self._try_take(method)
+            if not wait:
+                return
+            self._count_throttle(wait, not counted)
+            counted = True
+            await asyncio.sleep(wait)
+
+    def retry_delay(self, attempt: int, retry_after: Optional[str] = None) -> Optional[float]:
+        # Seconds to wait before retrying a call answered with 429, or None once it has been
+        # retried max_retries times.
+        with self._lock:
+            self.rate_limited += 1
+            if attempt >= self.max_retries:
+                return None
+            self.retried += 1
+        try:
+            return min(self.retry_max, float(retry_after))
+        except (TypeError, ValueError):
+            return self._rng.uniform(0, min(self.retry_max, self.retry_base * 2 ** attempt))
+
+    def _join(self, raw: str, loop, send: bool, first: bool) -> tuple:
+        # (flight, leader): the _Flight (sync callers, loop None) or future (async callers)
+        # this call waits on, and whether this caller sends it. Sends are never shared and
+        # get (None, True).
+        flights, key = (self._flights, raw) if loop is None else (self._async_flights, (loop, raw))
+        with self._lock:
+            if first:
+                self.calls += 1
+            if send:
+                return None, True
+            flight = flights.get(key)
+            if flight is not None:
+                self.deduplicated += 1
+                return flight, False
+            flight = flights[key] = _Flight() if loop is None else loop.create_future()
+            return flight, True
+
+    def _rejoin(self) -> None:
+        # The flight a caller joined was abandoned; it was not served from it after all.
+        with self._lock:
+            self.deduplicated -= 1
+
+    def _count_throttle(self, wait: float, first: bool) -> None:
+        with self._lock:
+            self.throttled += first
+            self.throttle_seconds += wait
+
+    def _try_take(self, method: str) -> float:
+        buckets = [bucket for bucket in (self.method_buckets.get(method), self.bucket) if bucket is not None]
+        if not buckets:
+            return 0.0
+        priority = self.priorities.get(method, NORMAL)
+        with self._lock:
+            wait = max(bucket.wait_time(priority) for bucket in buckets)
+            if not wait:
+                for bucket in buckets:
+                    bucket.take()
+            return wait
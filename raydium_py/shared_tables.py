@@ -0,0 +1,283 @@
+import logging
+import os
+import struct
+import threading
+import time
+from multiprocessing import resource_tracker, shared_memory
+from typing import Iterable, Optional
+from solders.pubkey import Pubkey  # type: ignore
+from pool_keys import PUBKEY_FIELDS, RECORD, PoolKeys, pack_pool_keys, unpack_pool_keys
+from reserves import Reserves, fetch_reserves
+
+logger = logging.getLogger(__name__)
+
+np = None  # numpy, imported by reserve_arrays
+
+# Pool keys and latest reserves shared between processes, so that one feeder process fetches
+# them for every worker. The table is a block of shared memory holding fixed-size records,
+# one per pool, placed by hashing the AMM id (open addressing, records are never removed):
+#
+#   header: magic, capacity, record size, pools, writer pid, heartbeat
+#   record: seq (u64) | base, quote, slot (u64) | pool keys (pool_keys.RECORD) | padding
+#
+# There is one writer (the process that created the table) and any number of readers.
+# Writes follow a seqlock: the writer makes a record's seq odd, writes, and makes it even
+# again; a reader copies what it needs between two reads of seq and retries if they differ
+# or are odd. Readers never lock and never block the writer. This relies on the writer's
+# stores becoming visible in order, as they do on x86-64.
+#
+# get() has ReserveStream's signature, so a table can be passed to buy/sell as their
+# reserve_stream; with SHARED_POOL_TABLE set in config.py, fetch_pool_keys and get_reserves
+# read it before going to RPC. max_age applies to the writer's heartbeat, which every write
+# and heartbeat() refresh: a table is trusted while its feeder is alive, however long a
+# pool's reserves stay unchanged. run_feeder() keeps a table current from RPC polls or from
+# a ReserveStream given shared_table=.
+
+MAGIC = b"RPST\x01\x00\x00\x00"
+HEADER = struct.Struct("<8sIIIId")  # magic, capacity, record size, pools, writer pid, heartbeat
+HEADER_SIZE = 64
+POOLS = struct.Struct("<I")
+POOLS_OFFSET = 16
+HEARTBEAT = struct.Struct("<d")
+HEARTBEAT_OFFSET = 24
+SEQ = struct.Struct("<Q")
+RESERVES = struct.Struct("<QQQ")  # base, quote, slot; slot 0 = no reserves yet
+RESERVES_OFFSET = 8
+KEYS_OFFSET = 32
+AMM_ID_OFFSET = KEYS_OFFSET + RECORD.size - 32 * len(PUBKEY_FIELDS)  # amm_id is the first pubkey
+RECORD_SIZE = 512
+DEFAULT_CAPACITY = 4096
+READ_RETRIES = 100_000
+SPINS = 100  # retries between yields, for a writer descheduled in the middle of a write
+EMPTY_KEY = bytes(32)
+_ATTACH_LOCK = threading.Lock()
+
+def _load_numpy() -> None:
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            raise ImportError("reserve_arrays requires numpy") from None
+        np = numpy
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    # Attaching must not register the block with this process's resource tracker, or it
+    # would be unlinked when a reader exits.
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # Python < 3.13 always registers
+        pass
+    with _ATTACH_LOCK:
+        register = resource_tracker.register
+        resource_tracker.register = lambda name, rtype: None
+        try:
+            return shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+class SharedPoolTable:
+    def __init__(self, name: str, create: bool = False, capacity: int = DEFAULT_CAPACITY):
+        self.name = name
+        self.writer = create
+        if create:
+            self._shm = shared_memory.SharedMemory(name=name, create=True, size=HEADER_SIZE + capacity * RECORD_SIZE)
+            self._buf = self._shm.buf
+            HEADER.pack_into(self._buf, 0, MAGIC, capacity, RECORD_SIZE, 0, os.getpid(), time.time())
+        else:
+            self._shm = _attach(name)
+            self._buf = self._shm.buf
+            magic, capacity, record_size, _, _, _ = HEADER.unpack_from(self._buf, 0)
+            if magic != MAGIC or record_size != RECORD_SIZE:
+                self._shm.close()
+                raise ValueError(f"Not a shared pool table: {name}")
+        self.capacity = capacity
+        self._indices = {}  # bytes(amm_id) -> record index
+        self._decoded = {}  # record index -> (raw keys, PoolKeys)
+        self._pools = {}  # writer only: str(amm_id) -> PoolKeys
+        self._lock = threading.Lock()  # writer only, between its own threads
+
+    def __enter__(self) -> "SharedPoolTable":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return POOLS.unpack_from(self._buf, POOLS_OFFSET)[0]
+
+    @property
+    def heartbeat_age(self) -> float:
+        return time.time() - HEARTBEAT.unpack_from(self._buf, HEARTBEAT_OFFSET)[0]
+
+    def pool_keys(self, amm_id) -> Optional[PoolKeys]:
+        index = self._find(bytes(Pubkey.from_string(amm_id)) if isinstance(amm_id, str) else bytes(amm_id))
+        if index is None:
+            return None
+        raw = self._read(index, KEYS_OFFSET, KEYS_OFFSET + RECORD.size)
+        if raw is None:
+            return None
+        cached = self._decoded.get(index)
+        if cached is not None and cached[0] == raw:
+            return cached[1]
+        pool_keys = unpack_pool_keys(raw)[2]
+        self._decoded[index] = (raw, pool_keys)
+        return pool_keys
+
+    def get(self, amm_id, max_age: Optional[float] = None) -> Optional[Reserves]:
+        if max_age is not None and self.heartbeat_age > max_age:
+            return None
+        index = self._find(bytes(Pubkey.from_string(amm_id)) if isinstance(amm_id, str) else bytes(amm_id))
+        if index is None:
+            return None
+        raw = self._read(index, RESERVES_OFFSET, RESERVES_OFFSET + RESERVES.size)
+        if raw is None:
+            return None
+        base, quote, slot = RESERVES.unpack(raw)
+        return Reserves(base, quote, slot) if slot else None
+
+    def reserve_arrays(self, amm_ids: Iterable) -> tuple:
+        # (base, quote, slot) uint64 arrays aligned with amm_ids, read straight out of shared
+        # memory for the batch quote functions; slot is 0 where a pool has no reserves.
+        _load_numpy()
+        indices = [self._find(bytes(Pubkey.from_string(a)) if isinstance(a, str) else bytes(a)) for a in amm_ids]
+        found = np.array([i is not None for i in indices], dtype=bool)
+        rows = np.array([i for i in indices if i is not None], dtype=np.int64)
+        records = np.ndarray(
+            (self.capacity,), dtype=[("seq", "<u8"), ("base", "<u8"), ("quote", "<u8"), ("slot", "<u8")],
+            buffer=self._buf, offset=HEADER_SIZE, strides=(RECORD_SIZE,),
+        )
+        values = np.zeros((len(rows), 3), dtype=np.uint64)
+        pending = np.arange(len(rows))
+        for attempt in range(1, READ_RETRIES + 1):
+            if not len(pending):
+                break
+            if attempt % SPINS == 0:
+                time.sleep(0)
+            selected = records[rows[pending]]
+            again = records["seq"][rows[pending]]
+            stable = (selected["seq"] == again) & (again % 2 == 0)
+            done = pending[stable]
+            values[done, 0] = selected["base"][stable]
+            values[done, 1] = selected["quote"][stable]
+            values[done, 2] = selected["slot"][stable]
+            pending = pending[~stable]
+        if len(pending):
+            logger.warning("Shared pool table %s: %s records kept changing while read", self.name, len(pending))
+        result = np.zeros((len(indices), 3), dtype=np.uint64)
+        result[found] = values
+        return result[:, 0], result[:, 1], result[:, 2]
+
+    def put_pool_keys(self, pool_keys: PoolKeys) -> bool:
+        key = bytes(pool_keys.amm_id)
+        with self._lock:
+            index = self._insert(key)
+            if index is None:
+                logger.warning("Shared pool table %s is full, not adding %s", self.name, pool_keys.amm_id)
+                return False
+            offset = HEADER_SIZE + index * RECORD_SIZE
+            self._begin(offset)
+            self._buf[offset + KEYS_OFFSET:offset + KEYS_OFFSET + RECORD.size] = pack_pool_keys(pool_keys, time.time())
+            self._end(offset)
+            self._pools[str(pool_keys.amm_id)] = pool_keys
+            self.heartbeat()
+        return True
+
+    def put_reserves(self, amm_id, reserves: Reserves) -> bool:
+        # The pool's keys must have been put first.
+        index = self._find(bytes(Pubkey.from_string(amm_id)) if isinstance(amm_id, str) else bytes(amm_id))
+        if index is None:
+            return False
+        offset = HEADER_SIZE + index * RECORD_SIZE
+        with self._lock:
+            self._begin(offset)
+            RESERVES.pack_into(self._buf, offset + RESERVES_OFFSET, reserves.base, reserves.quote, reserves.slot)
+            self._end(offset)
+            self.heartbeat()
+        return True
+
+    def refresh(self, client) -> int:
+        # Writes the current reserves of every pool in the table; returns how many.
+        reserves = fetch_reserves(client, list(self._pools.values()))
+        for amm_id, pool_reserves in reserves.items():
+            self.put_reserves(amm_id, pool_reserves)
+        return len(reserves)
+
+    def heartbeat(self) -> None:
+        HEARTBEAT.pack_into(self._buf, HEARTBEAT_OFFSET, time.time())
+
+    def close(self) -> None:
+        if self._shm is None:
+            return
+        self._buf = None
+        self._shm.close()
+        if self.writer:
+            self._shm.unlink()
+        self._shm = None
+
+    def _find(self, key: bytes) -> Optional[int]:
+        index = self._indices.get(key)
+        if index is not None:
+            return index
+        start = int.from_bytes(key[:8], "little") % self.capacity
+        for probe in range(self.capacity):
+            index = (start + probe) % self.capacity
+            offset = HEADER_SIZE + index * RECORD_SIZE + AMM_ID_OFFSET
+            # A record's amm_id is written once, when its pool is added.
+            stored = bytes(self._buf[offset:offset + 32])
+            if stored == key:
+                self._indices[key] = index
+                return index
+            if stored == EMPTY_KEY:
+                return None
+        return None
+
+    def _insert(self, key: bytes) -> Optional[int]:
+        index = self._find(key)
+        if index is not None:
+            return index
+        start = int.from_bytes(key[:8], "little") % self.capacity
+        for probe in range(self.capacity):
+            index = (start + probe) % self.capacity
+            offset = HEADER_SIZE + index * RECORD_SIZE + AMM_ID_OFFSET
+            if self._buf[offset:offset + 32] == EMPTY_KEY:
+                self._indices[key] = index
+                POOLS.pack_into(self._buf, POOLS_OFFSET, len(self) + 1)
+                return index
+        return None
+
+    def _read(self, index: int, start: int, end: int) -> Optional[bytes]:
+        offset = HEADER_SIZE + index * RECORD_SIZE
+        buf = self._buf
+        for attempt in range(1, READ_RETRIES + 1):
+            seq = SEQ.unpack_from(buf, offset)[0]
+            if not seq & 1:
+                raw = bytes(buf[offset + start:offset + end])
+                if SEQ.unpack_from(buf, offset)[0] == seq:
+                    return raw
+            if attempt % SPINS == 0:
+                time.sleep(0)
+        logger.warning("Shared pool table %s: record %s kept changing while read", self.name, index)
+        return None
+
+    def _begin(self, offset: int) -> None:
+        SEQ.pack_into(self._buf, offset, SEQ.unpack_from(self._buf, offset)[0] + 1)
+
+    def _end(self, offset: int) -> None:
+        SEQ.pack_into(self._buf, offset, SEQ.unpack_from(self._buf, offset)[0] + 1)
+
+def run_feeder(table: SharedPoolTable, client=None, stream=None, interval: float = 1.0, stop: Optional[threading.Event] = None) -> None:
+    # Keeps a table current until stop is set: from a ReserveStream created with
+    # shared_table=table (only the heartbeat is kept here, while the stream is connected),
+    # or else by polling the table's pools' reserves over client every interval seconds.
+    stop = stop or threading.Event()
+    while not stop.is_set():
+        try:
+            if stream is not None:
+                if stream.connected:
+                    table.heartbeat()
+            else:
+                table.refresh(client)
+        except Exception as e:
+            logger.warning("Error feeding shared pool table: %s", e)
+        stop.wait(interval)
@@ -0,0 +1,201 @@
+import logging
+import os
+import struct
+import threading
+import zlib
+from typing import Iterator, Sequence
+from solana.rpc.commitment import Processed
+from solders.pubkey import Pubkey  # type: ignore
+from pool_keys import PoolKeys
+
+logger = logging.getLogger(__name__)
+
+# Append-only recording of raw account bytes with their slots, for offline replay
+# (replay.py). SnapshotRecorder buffers (slot, pubkey, data) rows and writes them out
+# flush_rows at a time as one block:
+#
+#   file:  MAGIC | block | block | ...
+#   block: header | zlib(new keys | slots | accounts | lengths | data)
+#
+# Header: tag, rows, new_keys, stored_size, crc32 of the stored payload. Accounts are
+# numbered in order of first appearance across the whole file; a block carries the 32-byte
+# keys it introduces, then its columns: slot (u64), account number (u32) and data length
+# (u32) for every row, then the rows' data back to back. Most of a vault's 165 bytes never
+# change between updates, so a block compresses to a few bytes per row.
+#
+# A crash can leave a partial last block; readers stop before it and a recorder reopening
+# the file cuts it off before appending.
+
+MAGIC = b"RSNP\x01\x00\x00\x00"
+BLOCK = struct.Struct("<4sIIII")  # tag, rows, new_keys, stored_size, crc32
+BLOCK_TAG = b"BLK1"
+COMPRESSION_LEVEL = 1
+FLUSH_ROWS = 4096
+MAX_ACCOUNTS_PER_REQUEST = 100
+
+class SnapshotBlock:
+    __slots__ = ("new_keys", "slots", "accounts", "lengths", "data")
+
+    def __init__(self, new_keys: list, slots: bytes, accounts: bytes, lengths: bytes, data: bytes):
+        self.new_keys = new_keys  # 32-byte keys, numbered after those of earlier blocks
+        self.slots = slots  # little-endian u64 column
+        self.accounts = accounts  # little-endian u32 column
+        self.lengths = lengths  # little-endian u32 column
+        self.data = data
+
+    @property
+    def rows(self) -> int:
+        return len(self.slots) // 8
+
+def read_blocks(path: str) -> Iterator[SnapshotBlock]:
+    for block, _ in _scan(path):
+        yield block
+
+def read_rows(path: str) -> Iterator[tuple]:
+    # (pubkey, slot, data) for every recorded row, in recording order.
+    keys = []
+    for block in read_blocks(path):
+        keys.extend(Pubkey.from_bytes(key) for key in block.new_keys)
+        rows = block.rows
+        slots = struct.unpack(f"<{rows}Q", block.slots)
+        accounts = struct.unpack(f"<{rows}I", block.accounts)
+        start = 0
+        for slot, number, length in zip(slots, accounts, struct.unpack(f"<{rows}I", block.lengths)):
+            yield keys[number], slot, bytes(block.data[start:start + length])
+            start += length
+
+def _scan(path: str) -> Iterator[tuple]:
+    # (block, offset just past it) for every complete block.
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"Not a snapshot file: {path}")
+        offset = len(MAGIC)
+        while True:
+            header = f.read(BLOCK.size)
+            if not header:
+                return
+            if len(header) < BLOCK.size:
+                logger.warning("Snapshot file %s ends in a partial block header", path)
+                return
+            tag, rows, new_keys, stored_size, crc = BLOCK.unpack(header)
+            payload = f.read(stored_size)
+            if tag != BLOCK_TAG or len(payload) < stored_size or zlib.crc32(payload) != crc:
+                logger.warning("Snapshot file %s ends in a partial or corrupt block at offset %s", path, offset)
+                return
+            raw = memoryview(zlib.decompress(payload))
+            keys_end = 32 * new_keys
+            slots_end = keys_end + 8 * rows
+            accounts_end = slots_end + 4 * rows
+            lengths_end = accounts_end + 4 * rows
+            offset += BLOCK.size + stored_size
+            yield SnapshotBlock(
+                [bytes(raw[i:i + 32]) for i in range(0, keys_end, 32)],
+                raw[keys_end:slots_end], raw[slots_end:accounts_end], raw[accounts_end:lengths_end], raw[lengths_end:],
+            ), offset
+
+def snapshot_accounts(pools: Sequence[PoolKeys]) -> list:
+    # What a replay of these pools needs: the AMM and market accounts (pool keys, pending
+    # pnl) and both vaults (reserves).
+    accounts = []
+    for pool_keys in pools:
+        accounts.extend((pool_keys.amm_id, pool_keys.market_id, pool_keys.base_vault, pool_keys.quote_vault))
+    return accounts
+
+class SnapshotRecorder:
+    def __init__(self, path: str, flush_rows: int = FLUSH_ROWS):
+        self.path = path
+        self.flush_rows = flush_rows
+        self.rows = 0  # recorded by this recorder
+        self.blocks = 0
+        self._keys = {}  # 32-byte key -> account number
+        self._new_keys = []
+        self._slots, self._accounts, self._lengths, self._data = [], [], [], []
+        self._lock = threading.Lock()
+        self._file = self._open()
+
+    def __enter__(self) -> "SnapshotRecorder":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def record(self, pubkey, slot: int, data: bytes) -> None:
+        key = bytes(pubkey) if not isinstance(pubkey, str) else bytes(Pubkey.from_string(pubkey))
+        with self._lock:
+            number = self._keys.get(key)
+            if number is None:
+                number = self._keys[key] = len(self._keys)
+                self._new_keys.append(key)
+            self._slots.append(slot)
+            self._accounts.append(number)
+            self._lengths.append(len(data))
+            self._data.append(bytes(data))
+            self.rows += 1
+            if len(self._slots) >= self.flush_rows:
+                self._flush()
+
+    def record_response(self, pubkeys: Sequence, response) -> None:
+        # A getMultipleAccounts response, at its context slot; missing accounts are skipped.
+        slot = response.context.slot
+        for pubkey, account in zip(pubkeys, response.value):
+            if account is not None:
+                self.record(pubkey, slot, account.data)
+
+    def snapshot(self, client, pools: Sequence[PoolKeys]) -> None:
+        # Records the current state of the pools' accounts; call it on a timer to record
+        # without a websocket, or once before a ReserveStream(recorder=...) takes over.
+        accounts = snapshot_accounts(pools)
+        for i in range(0, len(accounts), MAX_ACCOUNTS_PER_REQUEST):
+            chunk = accounts[i:i + MAX_ACCOUNTS_PER_REQUEST]
+            self.record_response(chunk, client.get_multiple_accounts(chunk, commitment=Processed))
+
+    async def async_snapshot(self, async_client, pools: Sequence[PoolKeys]) -> None:
+        accounts = snapshot_accounts(pools)
+        for i in range(0, len(accounts), MAX_ACCOUNTS_PER_REQUEST):
+            chunk = accounts[i:i + MAX_ACCOUNTS_PER_REQUEST]
+            self.record_response(chunk, await async_client.get_multiple_accounts(chunk, commitment=Processed))
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush()
+            self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is None:
+                return
+            self._flush()
+            self._file.close()
+            self._file = None
+
+    def _open(self):
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            f = open(self.path, "wb")
+            f.write(MAGIC)
+            return f
+        end = len(MAGIC)
+        for block, end in _scan(self.path):
+            for key in block.new_keys:
+                self._keys[key] = len(self._keys)
+        f = open(self.path, "r+b")
+        f.truncate(end)
+        f.seek(end)
+        return f
+
+    def _flush(self) -> None:
+        rows = len(self._slots)
+        if not rows:
+            return
+        raw = b"".join((
+            *self._new_keys,
+            struct.pack(f"<{rows}Q", *self._slots),
+            struct.pack(f"<{rows}I", *self._accounts),
+            struct.pack(f"<{rows}I", *self._lengths),
+            *self._data,
+        ))
+        payload = zlib.compress(raw, COMPRESSION_LEVEL)
+        self._file.write(BLOCK.pack(BLOCK_TAG, rows, len(self._new_keys), len(payload), zlib.crc32(payload)))
+        self._file.write(payload)
+        self.blocks += 1
+        self._new_keys = []
+        self._slots, self._accounts, self._lengths, self._data = [], [], [], []
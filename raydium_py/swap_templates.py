@@ -0,0 +1,103 @@
+import os
+import struct
+import threading
+from collections import OrderedDict
+from typing import Callable
+from solders.compute_budget import set_compute_unit_limit, set_compute_unit_price  # type: ignore
+from solders.hash import Hash  # type: ignore
+from solders.keypair import Keypair  # type: ignore
+from solders.message import MessageV0, to_bytes_versioned  # type: ignore
+from solders.pubkey import Pubkey  # type: ignore
+from fees import instruction_shape
+from pool_keys import PoolKeys
+
+# Precompiled swap transactions. For a fixed wallet, pool and pair of token accounts the
+# message [compute unit limit, compute unit price, swap] never changes shape, so it is
+# compiled once with random placeholder values; each trade copies the serialized message,
+# writes the real amounts, compute budget and blockhash over the placeholders and signs.
+# The result is byte-for-byte what MessageV0.try_compile + VersionedTransaction produce.
+
+U32 = struct.Struct("<I")
+U64 = struct.Struct("<Q")
+SWAP_AMOUNTS = struct.Struct("<QQ")
+DEFAULT_CACHE_SIZE = 1_000
+
+def _find_once(message: bytes, needle: bytes) -> int:
+    offset = message.find(needle)
+    if offset < 0 or message.find(needle, offset + 1) >= 0:
+        raise ValueError("Placeholder not unique in compiled message")
+    return offset
+
+def _placeholder(size: int) -> int:
+    # Never zero, so a placeholder cannot be mistaken for padding or the system program id.
+    return int.from_bytes(os.urandom(size), "little") | 1
+
+class SwapTemplate:
+    def __init__(
+        self,
+        payer: Keypair,
+        pool_keys: PoolKeys,
+        token_account_in: Pubkey,
+        token_account_out: Pubkey,
+        make_swap_instruction: Callable,
+    ):
+        self.payer = payer
+        unit_limit, unit_price = _placeholder(4), _placeholder(8)
+        amount_in, minimum_amount_out = _placeholder(8), _placeholder(8)
+        blockhash = Hash(os.urandom(32))
+
+        swap_instruction = make_swap_instruction(
+            amount_in, minimum_amount_out, token_account_in, token_account_out, pool_keys, payer
+        )
+        message = to_bytes_versioned(MessageV0.try_compile(
+            payer.pubkey(),
+            [set_compute_unit_limit(unit_limit), set_compute_unit_price(unit_price), swap_instruction],
+            [],
+            blockhash,
+        ))
+
+        self.message = message
+        self.shape = instruction_shape([swap_instruction])  # what the compute budget is sized by
+        self.unit_limit_offset = _find_once(message, U32.pack(unit_limit))
+        self.unit_price_offset = _find_once(message, U64.pack(unit_price))
+        self.amounts_offset = _find_once(message, SWAP_AMOUNTS.pack(amount_in, minimum_amount_out))
+        self.blockhash_offset = _find_once(message, bytes(blockhash))
+
+    def render(self, amount_in: int, minimum_amount_out: int, blockhash: Hash, unit_limit: int, unit_price: int) -> bytes:
+        # Wire-format transaction: signature count, signature, versioned message.
+        message = bytearray(self.message)
+        U32.pack_into(message, self.unit_limit_offset, unit_limit)
+        U64.pack_into(message, self.unit_price_offset, unit_price)
+        SWAP_AMOUNTS.pack_into(message, self.amounts_offset, amount_in, minimum_amount_out)
+        message[self.blockhash_offset:self.blockhash_offset + 32] = bytes(blockhash)
+        return b"\x01" + bytes(self.payer.sign_message(bytes(message))) + message
+
+class SwapTemplateCache:
+    def __init__(self, make_swap_instruction: Callable, max_size: int = DEFAULT_CACHE_SIZE):
+        self.make_swap_instruction = make_swap_instruction
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._templates = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, payer: Keypair, pool_keys: PoolKeys, token_account_in: Pubkey, token_account_out: Pubkey) -> SwapTemplate:
+        key = (str(payer.pubkey()), str(pool_keys.amm_id), str(token_account_in), str(token_account_out))
+        with self._lock:
+            template = self._templates.get(key)
+            if template is not None:
+                self._templates.move_to_end(key)
+                self.hits += 1
+                return template
+
+        template = SwapTemplate(payer, pool_keys, token_account_in, token_account_out, self.make_swap_instruction)
+        with self._lock:
+            self.misses += 1
+            self._templates[key] = template
+            if len(self._templates) > self.max_size:
+                self._templates.popitem(last=False)
+        return template
+
+    def clear(self) -> None:
+        with self._lock:
+            self._templates.clear()
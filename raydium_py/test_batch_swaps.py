@@ -0,0 +1,32 @@
+from types import SimpleNamespace
+from solders.keypair import Keypair  # type: ignore
+from solders.pubkey import Pubkey  # type: ignore
+from batch_swaps import plan_swaps
+from constants import SOL_DECIMAL, WSOL
+from raydium import calc_buy_minimum_out, calc_sell_minimum_out
+from reserves import Reserves
+from test_pool_keys import make_pool_keys
+from wallet_state import TokenAccountState
+
+def test_trades_on_one_pool_are_quoted_in_turn():
+    pool_keys = make_pool_keys()
+    pool_keys.quote_mint = WSOL
+    engine = SimpleNamespace(payer_keypair=Keypair(), wsol_account=SimpleNamespace(address=Pubkey.new_unique()))
+    pair_address = str(pool_keys.amm_id)
+    reserves = Reserves(base=10**15, quote=5 * 10**12, slot=1)
+    account = TokenAccountState(Pubkey.new_unique(), 10**13)
+    trades = [("buy", pair_address, 10, 0), ("buy", pair_address, 10, 0), ("sell", pair_address, 50, 0)]
+
+    sell, first, second = plan_swaps(
+        engine, trades, {pair_address: pool_keys}, {str(pool_keys.amm_id): reserves}, {str(pool_keys.base_mint): account}
+    )
+
+    # The sell executes first, and each buy sees the pool the swaps before it left behind.
+    sold = calc_sell_minimum_out(pool_keys, 5 * 10**12, 0, reserves)
+    assert sell.minimum_amount_out == sold
+    after_sell = Reserves(reserves.base + 5 * 10**12, reserves.quote - sold, 1)
+    amount_in = 10 * SOL_DECIMAL
+    assert first.minimum_amount_out == calc_buy_minimum_out(pool_keys, amount_in, 0, after_sell)
+    after_first = Reserves(after_sell.base - first.minimum_amount_out, after_sell.quote + amount_in, 1)
+    assert second.minimum_amount_out == calc_buy_minimum_out(pool_keys, amount_in, 0, after_first)
+    assert second.minimum_amount_out < first.minimum_amount_out
@@ -0,0 +1,41 @@
+import asyncio
+from solders.signature import Signature  # type: ignore
+from confirmation import AsyncConfirmationTracker, ConfirmationTracker
+
+class DownClient:
+    def get_signature_statuses(self, signatures):
+        raise ConnectionError("node unreachable")
+
+    def get_block_height(self, commitment=None):
+        raise ConnectionError("node unreachable")
+
+class AsyncDownClient:
+    async def get_signature_statuses(self, signatures):
+        raise ConnectionError("node unreachable")
+
+    async def get_block_height(self, commitment=None):
+        raise ConnectionError("node unreachable")
+
+def test_gives_up_when_no_poll_succeeds():
+    tracker = ConfirmationTracker(DownClient(), min_interval=0.01, max_interval=0.05, max_wait=0.2)
+    try:
+        assert tracker.track(Signature.default(), 10**9).result(5) is None
+    finally:
+        tracker.stop()
+
+def test_wait_returns_none_on_timeout():
+    tracker = ConfirmationTracker(DownClient(), min_interval=0.01, max_interval=0.05)
+    try:
+        assert tracker.wait(Signature.default(), 10**9, timeout=0.1) is None
+    finally:
+        tracker.stop()
+
+def test_async_gives_up_when_no_poll_succeeds():
+    async def main():
+        tracker = AsyncConfirmationTracker(AsyncDownClient(), min_interval=0.01, max_interval=0.05, max_wait=0.2)
+        try:
+            return await asyncio.wait_for(tracker.track(Signature.default(), 10**9), 5)
+        finally:
+            await tracker.stop()
+
+    assert asyncio.run(main()) is None
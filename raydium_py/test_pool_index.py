@@ -0,0 +1,25 @@
+import os
+import subprocess
+import sys
+from solders.pubkey import Pubkey  # type: ignore
+from pool_index import PoolIndex
+
+def test_file_is_written_on_first_add(tmp_path):
+    path = tmp_path / "pool_index.bin"
+    index = PoolIndex(str(path))
+    assert not path.exists()
+    assert index.pairs(Pubkey.new_unique()) == []
+
+    amm_id, token, quote = Pubkey.new_unique(), Pubkey.new_unique(), Pubkey.new_unique()
+    assert index.add(amm_id, token, quote)
+    assert path.exists()
+    index.close()
+
+    reopened = PoolIndex(str(path))
+    assert reopened.pairs(token, quote) == [str(amm_id)]
+    reopened.close()
+
+def test_importing_utils_writes_no_index(tmp_path):
+    env = {**os.environ, "PYTHONPATH": os.path.dirname(os.path.abspath(__file__))}
+    subprocess.run([sys.executable, "-c", "import utils"], cwd=tmp_path, env=env, check=True)
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,49 @@
+from solders.pubkey import Pubkey  # type: ignore
+from pool_keys import MAGIC, RECORD, PoolKeys, PoolKeysCache
+
+def make_pool_keys() -> PoolKeys:
+    return PoolKeys(
+        amm_id=Pubkey.new_unique(),
+        base_mint=Pubkey.new_unique(),
+        quote_mint=Pubkey.new_unique(),
+        base_decimals=6,
+        quote_decimals=9,
+        open_orders=Pubkey.new_unique(),
+        target_orders=Pubkey.new_unique(),
+        base_vault=Pubkey.new_unique(),
+        quote_vault=Pubkey.new_unique(),
+        market_id=Pubkey.new_unique(),
+        market_authority=Pubkey.new_unique(),
+        market_base_vault=Pubkey.new_unique(),
+        market_quote_vault=Pubkey.new_unique(),
+        bids=Pubkey.new_unique(),
+        asks=Pubkey.new_unique(),
+        event_queue=Pubkey.new_unique(),
+    )
+
+def test_torn_tail_is_dropped_and_later_records_stay_readable(tmp_path):
+    path = str(tmp_path / "pool_keys.bin")
+    first, second = make_pool_keys(), make_pool_keys()
+    PoolKeysCache(path=path).put(first)
+    with open(path, "ab") as f:
+        f.write(b"\x00" * (RECORD.size // 2))
+
+    cache = PoolKeysCache(path=path)
+    assert cache.get(str(first.amm_id)) == first
+    cache.put(second)
+
+    reloaded = PoolKeysCache(path=path)
+    assert reloaded.get(str(first.amm_id)) == first
+    assert reloaded.get(str(second.amm_id)) == second
+
+def test_bad_header_is_replaced(tmp_path):
+    path = tmp_path / "pool_keys.bin"
+    path.write_bytes(b"XXXX" + bytes(RECORD.size))
+    pool_keys = make_pool_keys()
+
+    cache = PoolKeysCache(path=str(path))
+    assert len(cache) == 0
+    cache.put(pool_keys)
+
+    assert path.read_bytes().startswith(MAGIC)
+    assert PoolKeysCache(path=str(path)).get(str(pool_keys.amm_id)) == pool_keys
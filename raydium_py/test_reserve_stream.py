@@ -0,0 +1,77 @@
+import base64
+import time
+from mock_rpc import MockRpcNode, MockWsNode, token_account_data
+from reserve_stream import ReserveStream
+from transport import make_client
+from utils import decode_pool_keys
+
+TOKEN_RESERVE = 10**15
+SOL_RESERVE = 5 * 10**12
+
+def wait_for(condition, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.005)
+    return True
+
+def make_pool(node: MockRpcNode):
+    pool = node.add_pool(TOKEN_RESERVE, SOL_RESERVE)
+    return pool, decode_pool_keys(pool.amm_id, pool.amm_data, pool.market_data)
+
+def notification(subscription: int, slot: int, data: bytes) -> dict:
+    value = {"data": [base64.b64encode(data).decode(), "base64"]}
+    result = {"context": {"slot": slot}, "value": value}
+    return {"method": "accountNotification", "params": {"subscription": subscription, "result": result}}
+
+def test_handle_applies_updates_in_slot_order():
+    pool, pool_keys = make_pool(MockRpcNode())
+    stream = ReserveStream("ws://unused")
+    stream.add_pool(pool_keys)
+    stream._pending = {1: str(pool_keys.base_vault), 2: str(pool_keys.quote_vault)}
+    stream.handle({"id": 1, "result": 10})
+    stream.handle({"id": 2, "result": 11})
+    assert stream.connected
+
+    stream.handle(notification(10, 5, token_account_data(pool.mint, pool.amm_id, 100)))
+    assert stream.get(pool_keys.amm_id) is None  # no quote vault yet
+    stream.handle(notification(11, 6, token_account_data(pool.mint, pool.amm_id, 200)))
+    stream.handle(notification(10, 4, token_account_data(pool.mint, pool.amm_id, 999)))  # older, ignored
+    reserves = stream.get(pool_keys.amm_id)
+    assert (reserves.base, reserves.quote, reserves.slot) == (100, 200, 5)
+    assert stream.updates == 3
+
+def test_subscribe_update_disconnect_and_resync():
+    node, ws = MockRpcNode().start(), MockWsNode().start()
+    pool, pool_keys = make_pool(node)
+    client = make_client(node.url)
+    stream = ReserveStream(ws.url, client, reconnect_delay=0.05)
+    stream.add_pool(pool_keys)
+    stream.start()
+    try:
+        # Subscribes to both vaults and seeds them from RPC.
+        assert ws.wait_subscribed(2)
+        assert wait_for(lambda: stream.connected and stream.get(pool_keys.amm_id) is not None)
+        assert stream.get(pool_keys.amm_id).base == TOKEN_RESERVE
+
+        # Notifications from the seed's slot on replace it.
+        seeded_slot = stream.get(pool_keys.amm_id).slot
+        assert ws.notify(pool_keys.base_vault, seeded_slot, token_account_data(pool.mint, pool.amm_id, 123)) == 1
+        assert wait_for(lambda: stream.get(pool_keys.amm_id).base == 123)
+
+        # A dropped connection makes reserves stale, then the stream resubscribes and
+        # re-reads the vaults it may have missed updates for.
+        node.add_token_account(pool_keys.base_vault, pool.mint, pool.amm_id, 456)
+        time.sleep(0.5)  # so the resync reads a later slot than the notification
+        ws.disconnect()
+        assert wait_for(lambda: not stream.connected)
+        assert stream.get(pool_keys.amm_id, max_age=0) is None
+        assert wait_for(lambda: stream.connected and ws.subscriptions == 2)
+        assert wait_for(lambda: stream.get(pool_keys.amm_id).base == 456)
+        assert stream.reconnects >= 1 and ws.subscribes == 4
+    finally:
+        stream.stop()
+        client._provider.close()
+        ws.stop()
+        node.stop()
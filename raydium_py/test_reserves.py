@@ -0,0 +1,38 @@
+from solana.rpc.commitment import Processed
+from constants import RAY_V4
+from layouts import LIQUIDITY_STATE_LAYOUT_V4
+from mock_rpc import MockRpcNode
+from replay import Replay
+from reserves import fetch_reserves
+from snapshots import SnapshotRecorder, snapshot_accounts
+from transport import make_client
+from utils import decode_pool_keys
+
+TOKEN_RESERVE = 10**15
+SOL_RESERVE = 5 * 10**12
+PNL_COIN = 7_000_000
+PNL_PC = 3_000
+
+def test_live_and_replayed_reserves_both_exclude_pending_pnl(tmp_path):
+    node = MockRpcNode().start()
+    pool = node.add_pool(TOKEN_RESERVE, SOL_RESERVE)
+    amm = LIQUIDITY_STATE_LAYOUT_V4.parse(pool.amm_data)
+    amm.needTakePnlCoin, amm.needTakePnlPc = PNL_COIN, PNL_PC
+    amm_data = LIQUIDITY_STATE_LAYOUT_V4.build(amm)
+    node.add_account(pool.amm_id, RAY_V4, amm_data)
+    pool_keys = decode_pool_keys(pool.amm_id, amm_data, pool.market_data)
+    client = make_client(node.url)
+    try:
+        live = fetch_reserves(client, [pool_keys])[str(pool.amm_id)]
+        assert (live.base, live.quote) == (TOKEN_RESERVE - PNL_COIN, SOL_RESERVE - PNL_PC)
+
+        path = str(tmp_path / "pool.snap")
+        with SnapshotRecorder(path) as recorder:
+            response = client.get_multiple_accounts(snapshot_accounts([pool_keys]), commitment=Processed)
+            for pubkey, account in zip(snapshot_accounts([pool_keys]), response.value):
+                recorder.record(pubkey, response.context.slot, account.data)
+        replayed = Replay(path).reserves_at(pool.amm_id, response.context.slot)
+        assert (replayed.base, replayed.quote) == (live.base, live.quote)
+    finally:
+        client._provider.close()
+        node.stop()
@@ -0,0 +1,63 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from solders.pubkey import Pubkey  # type: ignore
+from solders.rpc.requests import GetAccountInfo  # type: ignore
+from rpc_gateway import RpcGateway
+
+BODY = GetAccountInfo(Pubkey.default())
+
+def test_identical_calls_in_flight_are_sent_once():
+    gateway, sent, release = RpcGateway(), [], threading.Event()
+
+    def request(body):
+        sent.append(body)
+        release.wait()
+        return "response"
+
+    with ThreadPoolExecutor(4) as pool:
+        calls = [pool.submit(gateway.call, BODY, request) for _ in range(4)]
+        while gateway.stats()["deduplicated"] < 3:
+            time.sleep(0.001)
+        release.set()
+        assert [call.result() for call in calls] == ["response"] * 4
+    assert len(sent) == 1
+
+def test_async_leader_error_is_shared():
+    gateway = RpcGateway()
+
+    async def request(body):
+        await asyncio.sleep(0.01)
+        raise ValueError("node error")
+
+    async def run():
+        return await asyncio.gather(*(gateway.async_call(BODY, request) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(result, ValueError) for result in results)
+    assert gateway.stats()["deduplicated"] == 2
+
+def test_async_cancelled_leader_hands_the_call_over():
+    gateway, sent = RpcGateway(), []
+
+    async def request(body):
+        sent.append(body)
+        await asyncio.sleep(0.05)
+        return "response"
+
+    async def run():
+        leader = asyncio.ensure_future(gateway.async_call(BODY, request))
+        await asyncio.sleep(0.01)
+        followers = [asyncio.ensure_future(gateway.async_call(BODY, request)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await asyncio.gather(*followers)
+
+    assert asyncio.run(run()) == ["response", "response"]
+    assert len(sent) == 2  # the cancelled one, and one follower's
+    assert gateway.stats()["calls"] == 3
+    assert gateway.stats()["deduplicated"] == 1
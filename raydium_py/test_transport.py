@@ -0,0 +1,40 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from solders.pubkey import Pubkey  # type: ignore
+from mock_rpc import MockRpcNode
+from transport import make_async_client, make_client
+
+CALLS = 8
+
+def test_rejected_batches_fall_back_to_single_calls():
+    node = MockRpcNode(reject_batches=True, latency=0.01).start()
+    client = make_client(node.url, batch_window=0.05)
+    try:
+        with ThreadPoolExecutor(CALLS) as pool:
+            results = list(pool.map(lambda _: client.get_account_info(Pubkey.new_unique()).value, range(CALLS)))
+        assert results == [None] * CALLS
+        assert node.rejected_batches == 1
+        assert client._provider.batch_window is None
+        assert client.get_account_info(Pubkey.new_unique()).value is None
+        assert node.rejected_batches == 1
+    finally:
+        client._provider.close()
+        node.stop()
+
+def test_rejected_batches_fall_back_to_single_calls_async():
+    node = MockRpcNode(reject_batches=True).start()
+
+    async def run():
+        async_client = make_async_client(node.url)
+        try:
+            responses = await asyncio.gather(*(async_client.get_account_info(Pubkey.new_unique()) for _ in range(CALLS)))
+            assert [response.value for response in responses] == [None] * CALLS
+            assert async_client._provider.batch_window is None
+        finally:
+            await async_client.close()
+
+    try:
+        asyncio.run(run())
+        assert node.rejected_batches == 1
+    finally:
+        node.stop()
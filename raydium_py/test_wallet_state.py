@@ -0,0 +1,47 @@
+import struct
+from types import SimpleNamespace
+from solders.pubkey import Pubkey  # type: ignore
+from wallet_state import WalletState
+
+def token_account_data(mint: Pubkey, owner: Pubkey, amount: int) -> bytes:
+    return bytes(mint) + bytes(owner) + struct.pack("<Q", amount) + bytes(165 - 72)
+
+class FakeClient:
+    def __init__(self, owner: Pubkey):
+        self.owner = owner
+        self.accounts = {}  # address -> (mint, amount)
+        self.loads = 0
+
+    def get_token_accounts_by_owner(self, owner, opts, commitment=None):
+        self.loads += 1
+        return SimpleNamespace(value=[
+            SimpleNamespace(pubkey=address, account=SimpleNamespace(data=token_account_data(mint, self.owner, amount)))
+            for address, (mint, amount) in self.accounts.items()
+        ])
+
+    def get_account_info(self, address, commitment=None):
+        mint, amount = self.accounts[address]
+        return SimpleNamespace(value=SimpleNamespace(data=token_account_data(mint, self.owner, amount)))
+
+def test_failed_sell_rereads_the_balance():
+    owner, mint, address = Pubkey.new_unique(), Pubkey.new_unique(), Pubkey.new_unique()
+    client = FakeClient(owner)
+    client.accounts[address] = (mint, 1_000)
+    wallet = WalletState(owner)
+    assert wallet.token_account(client, mint, exact=True).amount == 1_000
+
+    client.accounts[address] = (mint, 400)  # spent elsewhere
+    wallet.settle_sell(mint, 1_000, False, False)
+    assert wallet.token_account(client, mint, exact=True).amount == 400
+    assert wallet.refreshes == 1
+
+def test_failed_create_rescans():
+    owner, mint, address = Pubkey.new_unique(), Pubkey.new_unique(), Pubkey.new_unique()
+    client = FakeClient(owner)
+    wallet = WalletState(owner)
+    assert wallet.token_account(client, mint) is None
+
+    client.accounts[address] = (mint, 5)  # created elsewhere, so our create failed
+    wallet.settle_buy(mint, address, 100, False)
+    assert wallet.token_account(client, mint).amount == 5
+    assert client.loads == 2
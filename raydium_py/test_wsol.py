@@ -0,0 +1,30 @@
+from solders.pubkey import Pubkey  # type: ignore
+from wsol import WsolAccount
+
+def test_failed_sell_that_created_the_account_creates_it_again():
+    account = WsolAccount(Pubkey.new_unique())
+    setup = account.prepare_sell()
+    assert account.creates(setup)
+    assert account.prepare_sell() == []  # assumed to exist while the first sell is in flight
+
+    account.settle_sell(0, False, account.creates(setup))
+    assert account.creates(account.prepare_sell())
+
+def test_failed_buy_that_created_the_account_creates_it_again():
+    account = WsolAccount(Pubkey.new_unique())
+    setup, top_up = account.prepare_buy(1_000)
+    assert account.creates(setup)
+
+    account.settle_buy(1_000, top_up, False, account.creates(setup))
+    assert account.needs_refresh()
+    assert account.creates(account.prepare_buy(1_000)[0])
+
+def test_confirmed_create_is_kept():
+    account = WsolAccount(Pubkey.new_unique())
+    setup = account.prepare_sell()
+    account.settle_sell(500, True, account.creates(setup))
+    assert account.prepare_sell() == []
+
+    # A failed sell that did not carry the create leaves the account alone.
+    account.settle_sell(500, False, account.creates([]))
+    assert account.prepare_sell() == []
@@ -0,0 +1,335 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+from typing import Optional
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from solana.rpc.api import Client
+from solana.rpc.async_api import AsyncClient
+from solana.rpc.providers.async_http import AsyncHTTPProvider
+from solana.rpc.providers.core import DEFAULT_TIMEOUT, _after_request_unparsed
+from solana.rpc.providers.http import HTTPProvider
+from solders.rpc.requests import (  # type: ignore
+    GetProgramAccounts,
+    SendLegacyTransaction,
+    SendRawTransaction,
+    SendVersionedTransaction,
+)
+from instrumentation import count_rpc
+
+logger = logging.getLogger(__name__)
+
+# HTTP transport for the RPC clients. solana-py's sync provider posts every call with the
+# module-level httpx.post, i.e. a fresh TCP+TLS connection per RPC; these providers keep a
+# pool of keep-alive connections per client instead.
+#
+# With a batch window, calls issued within batch_window seconds of each other (from other
+# threads, or an asyncio.gather) are coalesced into one JSON-RPC batch request, and each
+# caller gets its own entry of the response. A window of 0 adds no delay: the async client
+# still batches everything issued in the same event loop iteration, the sync client only
+# calls that race each other. None turns batching off.
+#
+# Sends and getProgramAccounts always go out on their own: a batch only returns when its
+# slowest call does. If the endpoint rejects batches (an HTTP 4xx other than 429, or a
+# response that is not a batch), batching is switched off and the calls are retried one
+# by one.
+#
+# Given a gateway (rpc_gateway.py), every call passes it first: identical calls in flight
+# are sent once, rate limits are waited out, and 429 responses are retried.
+
+DEFAULT_POOL_SIZE = 16
+DEFAULT_MAX_BATCH_SIZE = 100
+UNBATCHED = (SendRawTransaction, SendVersionedTransaction, SendLegacyTransaction, GetProgramAccounts)
+
+def make_session(pool_size: int = DEFAULT_POOL_SIZE) -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+def _batch_payload(bodies: list) -> str:
+    # Every solders request body has id 0; renumber them so responses can be matched.
+    requests_json = []
+    for index, body in enumerate(bodies):
+        request = json.loads(body.to_json())
+        request["id"] = index
+        requests_json.append(request)
+    return json.dumps(requests_json)
+
+def _split_batch(raw: str, count: int) -> Optional[list]:
+    responses = json.loads(raw)
+    if not isinstance(responses, list):
+        return None
+    by_id = {response.get("id"): response for response in responses}
+    if any(index not in by_id for index in range(count)):
+        return None
+    return [json.dumps(by_id[index]) for index in range(count)]
+
+def _rejects_batches(error: httpx.HTTPStatusError) -> bool:
+    status = error.response.status_code
+    return 400 <= status < 500 and status != httpx.codes.TOO_MANY_REQUESTS
+
+class _PendingCall:
+    __slots__ = ("body", "done", "result", "error")
+
+    def __init__(self, body):
+        self.body = body
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class PooledHTTPProvider(HTTPProvider):
+    def __init__(
+        self,
+        endpoint: Optional[str] = None,
+        extra_headers: Optional[dict] = None,
+        timeout: float = DEFAULT_TIMEOUT,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        batch_window: Optional[float] = 0,
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+        gateway=None,
+    ):
+        super().__init__(endpoint, extra_headers, timeout)
+        self.gateway = gateway
+        self.session = httpx.Client(
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+        )
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+        self.requests = 0
+        self.batches = 0
+        self._pending = []
+        self._flush_scheduled = False
+        self._full = threading.Event()
+        self._lock = threading.Lock()
+
+    def make_request_unparsed(self, body) -> str:
+        count_rpc()
+        if self.gateway is not None:
+            return self.gateway.call(body, self._request)
+        return self._request(body)
+
+    def _request(self, body) -> str:
+        if self.batch_window is None or isinstance(body, UNBATCHED):
+            return self._post(self._before_request(body))
+
+        call = _PendingCall(body)
+        with self._lock:
+            self._pending.append(call)
+            leader = not self._flush_scheduled
+            self._flush_scheduled = True
+            if len(self._pending) >= self.max_batch_size:
+                self._full.set()
+        if leader:
+            # The first caller in a window collects the others and sends for everyone.
+            self._full.wait(self.batch_window)
+            self._flush()
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def make_batch_request_unparsed(self, reqs) -> str:
+        count_rpc(len(reqs))
+        return self._post(self._before_batch_request(reqs))
+
+    def is_connected(self) -> bool:
+        try:
+            response = self.session.get(self.health_uri)
+            response.raise_for_status()
+        except (IOError, httpx.HTTPError) as err:
+            self.logger.error("Health check failed with error: %s", str(err))
+            return False
+        return response.status_code == httpx.codes.OK
+
+    def close(self) -> None:
+        self.session.close()
+
+    def _post(self, request_kwargs: dict) -> str:
+        attempt = 0
+        while True:
+            self.requests += 1
+            response = self.session.post(**request_kwargs)
+            if response.status_code == httpx.codes.TOO_MANY_REQUESTS and self.gateway is not None:
+                delay = self.gateway.retry_delay(attempt, response.headers.get("Retry-After"))
+                if delay is not None:
+                    time.sleep(delay)
+                    attempt += 1
+                    continue
+            return _after_request_unparsed(response)
+
+    def _post_batch(self, bodies: list) -> Optional[list]:
+        # The raw response of each call, or None if the endpoint rejects batch requests.
+        try:
+            raw = self._post({**self._build_common_request_kwargs(), "content": _batch_payload(bodies)})
+        except httpx.HTTPStatusError as e:
+            if not _rejects_batches(e):
+                raise
+            return None
+        return _split_batch(raw, len(bodies))
+
+    def _flush(self) -> None:
+        with self._lock:
+            calls, self._pending = self._pending, []
+            self._flush_scheduled = False
+            self._full.clear()
+
+        for start in range(0, len(calls), self.max_batch_size):
+            self._send(calls[start:start + self.max_batch_size])
+
+    def _send(self, calls: list) -> None:
+        try:
+            if len(calls) == 1:
+                calls[0].result = self._post(self._before_request(calls[0].body))
+            else:
+                self.batches += 1
+                results = self._post_batch([call.body for call in calls])
+                if results is None:
+                    logger.warning("RPC endpoint rejected a batch request; sending calls individually.")
+                    self.batch_window = None
+                    results = [self._post(self._before_request(call.body)) for call in calls]
+                for call, result in zip(calls, results):
+                    call.result = result
+        except Exception as e:
+            for call in calls:
+                call.error = e
+        finally:
+            for call in calls:
+                call.done.set()
+
+class AsyncPooledHTTPProvider(AsyncHTTPProvider):
+    def __init__(
+        self,
+        endpoint: Optional[str] = None,
+        extra_headers: Optional[dict] = None,
+        timeout: float = DEFAULT_TIMEOUT,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        batch_window: Optional[float] = 0,
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+        gateway=None,
+    ):
+        super().__init__(endpoint, extra_headers, timeout)
+        self.gateway = gateway
+        self.session = httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+        )
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+        self.requests = 0
+        self.batches = 0
+        self._pending = []
+        self._flush_handle = None
+        self._tasks = set()
+
+    async def make_request_unparsed(self, body) -> str:
+        count_rpc()
+        if self.gateway is not None:
+            return await self.gateway.async_call(body, self._request)
+        return await self._request(body)
+
+    async def _request(self, body) -> str:
+        if self.batch_window is None or isinstance(body, UNBATCHED):
+            return await self._post(self._before_request(body))
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((body, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._schedule_flush(loop, 0)
+        elif self._flush_handle is None:
+            self._schedule_flush(loop, self.batch_window)
+        return await future
+
+    async def make_batch_request_unparsed(self, reqs) -> str:
+        count_rpc(len(reqs))
+        return await self._post(self._before_batch_request(reqs))
+
+    async def _post(self, request_kwargs: dict) -> str:
+        attempt = 0
+        while True:
+            self.requests += 1
+            response = await self.session.post(**request_kwargs)
+            if response.status_code == httpx.codes.TOO_MANY_REQUESTS and self.gateway is not None:
+                delay = self.gateway.retry_delay(attempt, response.headers.get("Retry-After"))
+                if delay is not None:
+                    await asyncio.sleep(delay)
+                    attempt += 1
+                    continue
+            return _after_request_unparsed(response)
+
+    async def _post_batch(self, bodies: list) -> Optional[list]:
+        try:
+            raw = await self._post({**self._build_common_request_kwargs(), "content": _batch_payload(bodies)})
+        except httpx.HTTPStatusError as e:
+            if not _rejects_batches(e):
+                raise
+            return None
+        return _split_batch(raw, len(bodies))
+
+    def _schedule_flush(self, loop, delay: float) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+        # A zero window still coalesces everything issued in the same event loop iteration.
+        if delay > 0:
+            self._flush_handle = loop.call_later(delay, self._flush)
+        else:
+            self._flush_handle = loop.call_soon(self._flush)
+
+    def _flush(self) -> None:
+        calls, self._pending = self._pending, []
+        self._flush_handle = None
+        for start in range(0, len(calls), self.max_batch_size):
+            task = asyncio.ensure_future(self._send(calls[start:start + self.max_batch_size]))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, calls: list) -> None:
+        try:
+            if len(calls) == 1:
+                results = [await self._post(self._before_request(calls[0][0]))]
+            else:
+                self.batches += 1
+                results = await self._post_batch([b for b, _ in calls])
+                if results is None:
+                    logger.warning("RPC endpoint rejected a batch request; sending calls individually.")
+                    self.batch_window = None
+                    results = await asyncio.gather(*(self._post(self._before_request(b)) for b, _ in calls))
+            for (_, future), result in zip(calls, results):
+                if not future.done():
+                    future.set_result(result)
+        except Exception as e:
+            for _, future in calls:
+                if not future.done():
+                    future.set_exception(e)
+
+def make_client(
+    endpoint: str,
+    pool_size: int = DEFAULT_POOL_SIZE,
+    batch_window: Optional[float] = 0,
+    timeout: float = DEFAULT_TIMEOUT,
+    gateway=None,
+) -> Client:
+    client = Client(endpoint, timeout=timeout)
+    client._provider = PooledHTTPProvider(
+        endpoint, timeout=timeout, pool_size=pool_size, batch_window=batch_window, gateway=gateway,
+    )
+    return client
+
+def make_async_client(
+    endpoint: str,
+    pool_size: int = DEFAULT_POOL_SIZE,
+    batch_window: Optional[float] = 0,
+    timeout: float = DEFAULT_TIMEOUT,
+    gateway=None,
+) -> AsyncClient:
+    async_client = AsyncClient(endpoint, timeout=timeout)
+    async_client._provider = AsyncPooledHTTPProvider(
+        endpoint, timeout=timeout, pool_size=pool_size, batch_window=batch_window, gateway=gateway,
+    )
+    return async_client
@@ -1,16 +1,21 @@
-import json
+import logging
 import struct
-import time
-from dataclasses import dataclass
 from typing import Optional
-import requests
-from solana.rpc.commitment import Confirmed, Processed
-from solana.rpc.types import MemcmpOpts, TokenAccountOpts
+from solana.rpc.commitment import Processed
+from solana.rpc.types import TokenAccountOpts
 from solana.transaction import AccountMeta, Signature
 from solders.instruction import Instruction  # type: ignore
 from solders.keypair import Keypair  # type: ignore
 from solders.pubkey import Pubkey  # type: ignore
-from config import client, payer_keypair
+from config import (
+    POOL_INDEX_PATH,
+    POOL_KEYS_CACHE_PATH,
+    POOL_KEYS_CACHE_SIZE,
+    POOL_KEYS_CACHE_TTL,
+    RPC_POOL_SIZE,
+    RESERVE_STREAM_MAX_AGE,
+    SHARED_POOL_TABLE,
+)
 from constants import (
     OPEN_BOOK_PROGRAM,
     RAY_AUTHORITY_V4,
@@ -18,68 +23,128 @@ from constants import (
     TOKEN_PROGRAM_ID,
     WSOL,
 )
-from layouts import (
-    LIQUIDITY_STATE_LAYOUT_V4,
-    MARKET_STATE_LAYOUT_V3,
-    SWAP_LAYOUT,
+from engine import current_engine
+from fast_layouts import AMM_POOL_KEYS, LIQUIDITY_STATE_V4, MARKET_POOL_KEYS
+from layouts import SWAP_LAYOUT
+from pool_index import PoolIndex
+from pool_keys import PoolKeys, PoolKeysCache
+from reserves import Reserves, fetch_reserves
+from swap_templates import SwapTemplateCache
+
+logger = logging.getLogger(__name__)
+
+# Caches that do not depend on the RPC or the wallet are shared by every engine.
+pool_keys_cache = PoolKeysCache(POOL_KEYS_CACHE_SIZE, POOL_KEYS_CACHE_TTL, POOL_KEYS_CACHE_PATH)
+pool_index = PoolIndex(POOL_INDEX_PATH)
+_api_session = None
+_shared_pool_table = None
+
+# The per-engine objects that used to live here are still importable by name, resolved
+# against the active engine.
+_ENGINE_ATTRIBUTES = (
+    "client", "payer_keypair", "blockhash_provider", "cluster_constants",
+    "confirmation_tracker", "wallet_state", "wsol_account",
 )
 
-@dataclass
-class PoolKeys:
-    amm_id: Pubkey
-    base_mint: Pubkey
-    quote_mint: Pubkey
-    base_decimals: int
-    quote_decimals: int
-    open_orders: Pubkey
-    target_orders: Pubkey
-    base_vault: Pubkey
-    quote_vault: Pubkey
-    market_id: Pubkey
-    market_authority: Pubkey
-    market_base_vault: Pubkey
-    market_quote_vault: Pubkey
-    bids: Pubkey
-    asks: Pubkey
-    event_queue: Pubkey
-
-def fetch_pool_keys(pair_address: str) -> Optional[PoolKeys]:
+def __getattr__(name: str):
+    if name in _ENGINE_ATTRIBUTES:
+        return getattr(current_engine(), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def get_api_session():
+    global _api_session
+    if _api_session is None:
+        from transport import make_session
+        _api_session = make_session(RPC_POOL_SIZE)
+    return _api_session
+
+def get_shared_pool_table():
+    # The table named by SHARED_POOL_TABLE, attached on first use; None until its feeder
+    # process has created it.
+    global _shared_pool_table
+    if _shared_pool_table is None and SHARED_POOL_TABLE:
+        from shared_tables import SharedPoolTable
+        try:
+            _shared_pool_table = SharedPoolTable(SHARED_POOL_TABLE)
+        except (OSError, ValueError) as e:
+            logger.debug("Shared pool table unavailable: %s", e)
+    return _shared_pool_table
+
+def fetch_pool_keys(pair_address: str, use_cache: bool = True) -> Optional[PoolKeys]:
+    if use_cache:
+        pool_keys = pool_keys_cache.get(pair_address)
+        if pool_keys is not None:
+            return pool_keys
+
     try:
+        shared_table = get_shared_pool_table() if use_cache else None
+        if shared_table is not None:
+            pool_keys = shared_table.pool_keys(pair_address)
+            if pool_keys is not None:
+                return pool_keys
+
+        client = current_engine().client
         amm_id = Pubkey.from_string(pair_address)
         amm_data = client.get_account_info_json_parsed(amm_id, commitment=Processed).value.data
-        amm_data_decoded = LIQUIDITY_STATE_LAYOUT_V4.parse(amm_data)
-        marketId = Pubkey.from_bytes(amm_data_decoded.serumMarket)
+        marketId = Pubkey.from_bytes(LIQUIDITY_STATE_V4.read(amm_data, "serumMarket"))
         marketInfo = client.get_account_info_json_parsed(marketId, commitment=Processed).value.data
-        market_decoded = MARKET_STATE_LAYOUT_V3.parse(marketInfo)
-        vault_signer_nonce = market_decoded.vault_signer_nonce
-
-        pool_keys = PoolKeys(
-            amm_id=amm_id,
-            base_mint=Pubkey.from_bytes(market_decoded.base_mint),
-            quote_mint=Pubkey.from_bytes(market_decoded.quote_mint),
-            base_decimals=amm_data_decoded.coinDecimals,
-            quote_decimals=amm_data_decoded.pcDecimals,
-            open_orders=Pubkey.from_bytes(amm_data_decoded.ammOpenOrders),
-            target_orders=Pubkey.from_bytes(amm_data_decoded.ammTargetOrders),
-            base_vault=Pubkey.from_bytes(amm_data_decoded.poolCoinTokenAccount),
-            quote_vault=Pubkey.from_bytes(amm_data_decoded.poolPcTokenAccount),
-            market_id=marketId,
-            market_authority=Pubkey.create_program_address( 
-                [bytes(marketId), bytes_of(vault_signer_nonce)],
-                OPEN_BOOK_PROGRAM,
-            ),
-            market_base_vault=Pubkey.from_bytes(market_decoded.base_vault),
-            market_quote_vault=Pubkey.from_bytes(market_decoded.quote_vault),
-            bids=Pubkey.from_bytes(market_decoded.bids),
-            asks=Pubkey.from_bytes(market_decoded.asks),
-            event_queue=Pubkey.from_bytes(market_decoded.event_queue),
-        )
+        pool_keys = decode_pool_keys(amm_id, amm_data, marketInfo)
+        pool_index.add_pool_keys(pool_keys)
 
+        if use_cache:
+            pool_keys_cache.put(pool_keys)
         return pool_keys
     except Exception as e:
-        print(f"Error fetching pool keys: {e}")
+        logger.warning("Error fetching pool keys: %s", e)
         return None
 
+def decode_pool_keys(amm_id: Pubkey, amm_data: bytes, market_data: bytes) -> PoolKeys:
+    (
+        coin_decimals,
+        pc_decimals,
+        pool_coin_token_account,
+        pool_pc_token_account,
+        amm_open_orders,
+        serum_market,
+        amm_target_orders,
+        swap_fee_numerator,
+        swap_fee_denominator,
+    ) = AMM_POOL_KEYS.unpack(amm_data)
+    (
+        vault_signer_nonce,
+        base_mint,
+        quote_mint,
+        base_vault,
+        quote_vault,
+        bids,
+        asks,
+        event_queue,
+    ) = MARKET_POOL_KEYS.unpack(market_data)
+
+    return PoolKeys(
+        amm_id=amm_id,
+        base_mint=Pubkey.from_bytes(base_mint),
+        quote_mint=Pubkey.from_bytes(quote_mint),
+        base_decimals=coin_decimals,
+        quote_decimals=pc_decimals,
+        open_orders=Pubkey.from_bytes(amm_open_orders),
+        target_orders=Pubkey.from_bytes(amm_target_orders),
+        base_vault=Pubkey.from_bytes(pool_coin_token_account),
+        quote_vault=Pubkey.from_bytes(pool_pc_token_account),
+        market_id=Pubkey.from_bytes(serum_market),
+        market_authority=Pubkey.create_program_address( 
+            [serum_market, bytes_of(vault_signer_nonce)],
+            OPEN_BOOK_PROGRAM,
+        ),
+        market_base_vault=Pubkey.from_bytes(base_vault),
+        market_quote_vault=Pubkey.from_bytes(quote_vault),
+        bids=Pubkey.from_bytes(bids),
+        asks=Pubkey.from_bytes(asks),
+        event_queue=Pubkey.from_bytes(event_queue),
+        swap_fee_numerator=swap_fee_numerator,
+        swap_fee_denominator=swap_fee_denominator,
+    )
+
 def bytes_of(value):
     if not (0 <= value < 2**64):
         raise ValueError("Value must be in the range of a u64 (0 to 2^64 - 1).")
@@ -88,7 +153,7 @@ def bytes_of(value):
 def get_pair_address_from_api(mint):
     url = f"https://api-v3.raydium.io/pools/info/mint?mint1={mint}&poolType=all&poolSortField=default&sortType=desc&pageSize=1&page=1"
     try:
-        response = requests.get(url)
+        response = get_api_session().get(url, timeout=10)
         response.raise_for_status()
         data = response.json()
 
@@ -106,36 +171,24 @@ def get_pair_address_from_api(mint):
     except:
         return None
 
-def get_pair_address_from_rpc(token_address: str) -> str:
-    print("Getting pair address from RPC...")
-    BASE_OFFSET = 400
-    QUOTE_OFFSET = 432
-    DATA_LENGTH_FILTER = 752
-    QUOTE_MINT = "So11111111111111111111111111111111111111112"
-    RAYDIUM_PROGRAM_ID = Pubkey.from_string("675kPX9MHTjS2zt1qfr1NYHuzeLXfQM9H24wFSUt1Mp8")
-    
-    def fetch_amm_id(base_mint: str, quote_mint: str) -> str:
-        memcmp_filter_base = MemcmpOpts(offset=BASE_OFFSET, bytes=base_mint)
-        memcmp_filter_quote = MemcmpOpts(offset=QUOTE_OFFSET, bytes=quote_mint)
-        try:
-            response = client.get_program_accounts(
-                RAYDIUM_PROGRAM_ID,
-                commitment=Processed, 
-                filters=[DATA_LENGTH_FILTER, memcmp_filter_base, memcmp_filter_quote]
-            )
-            accounts = response.value
-            if accounts:
-                return str(accounts[0].pubkey)
-        except Exception as e:
-            print(f"Error fetching AMM ID: {e}")
-        return None
+def get_pair_address_from_rpc(token_address: str) -> Optional[str]:
+    pair_addresses = get_pair_addresses_from_rpc(token_address)
+    return pair_addresses[0] if pair_addresses else None
 
-    pair_address = fetch_amm_id(token_address, QUOTE_MINT)
-    
-    if not pair_address:
-        pair_address = fetch_amm_id(QUOTE_MINT, token_address)
-    
-    return pair_address
+def get_pair_addresses_from_rpc(token_address: str) -> list:
+    # Every WSOL pool for the token, token-as-base first. Served from the local pool index;
+    # the program is only scanned (for this mint alone) when the index has never seen it.
+    mint = Pubkey.from_string(token_address)
+    pair_addresses = pool_index.pairs(mint)
+    if pair_addresses:
+        return pair_addresses
+
+    logger.debug("Getting pair address from RPC...")
+    try:
+        pool_index.refresh_mint(current_engine().client, token_address)
+    except Exception as e:
+        logger.warning("Error fetching AMM ID: %s", e)
+    return pool_index.pairs(mint)
 
 def make_swap_instruction(
     amount_in: int, 
@@ -176,14 +229,17 @@ def make_swap_instruction(
         )
         return Instruction(RAY_V4, data, keys)
     except Exception as e:
-        print(f"Error occurred: {e}")
+        logger.warning("Error occurred: %s", e)
         return None
 
+swap_templates = SwapTemplateCache(make_swap_instruction)
+
 def get_token_balance(mint_str: str) -> float | None:
     try:
+        engine = current_engine()
         mint = Pubkey.from_string(mint_str)
-        response = client.get_token_accounts_by_owner_json_parsed(
-            payer_keypair.pubkey(),
+        response = engine.client.get_token_accounts_by_owner_json_parsed(
+            engine.payer_keypair.pubkey(),
             TokenAccountOpts(mint=mint),
             commitment=Processed
         )
@@ -195,75 +251,79 @@ def get_token_balance(mint_str: str) -> float | None:
                 return float(token_amount)
         return None
     except Exception as e:
-        print(f"Error fetching token balance: {e}")
+        logger.warning("Error fetching token balance: %s", e)
         return None
     
-def confirm_txn(txn_sig: Signature, max_retries: int = 20, retry_interval: int = 3) -> bool:
-    retries = 1
-    
-    while retries < max_retries:
-        try:
-            txn_res = client.get_transaction(txn_sig, encoding="json", commitment=Confirmed, max_supported_transaction_version=0)
-            txn_json = json.loads(txn_res.value.transaction.meta.to_json())
-            
-            if txn_json['err'] is None:
-                print("Transaction confirmed... try count:", retries)
-                return True
-            
-            print("Error: Transaction not confirmed. Retrying...")
-            if txn_json['err']:
-                print("Transaction failed.")
-                return False
-        except Exception as e:
-            print("Awaiting confirmation... try count:", retries)
-            retries += 1
-            time.sleep(retry_interval)
-    
-    print("Max retries reached. Transaction confirmation failed.")
-    return None
+def confirm_txn(
+    txn_sig: Signature,
+    max_retries: Optional[int] = None,
+    retry_interval: float = 3,
+    *,
+    last_valid_block_height: Optional[int] = None,
+) -> Optional[bool]:
+    # Waits max_retries * retry_interval seconds if given, else until the tracker gives up.
+    tracker = current_engine().confirmation_tracker
+    timeout = max_retries * retry_interval if max_retries is not None else 2 * tracker.max_wait
+    confirmed = tracker.wait(txn_sig, last_valid_block_height, timeout)
+    if confirmed:
+        logger.info("Transaction confirmed.")
+    elif confirmed is False:
+        logger.warning("Transaction failed.")
+    else:
+        logger.warning("Blockhash expired. Transaction confirmation failed.")
+    return confirmed
 
-def get_token_reserves(pool_keys: PoolKeys) -> tuple:
+def get_reserves(pool_keys: PoolKeys, reserve_stream=None) -> Optional[Reserves]:
     try:
-        base_vault = pool_keys.base_vault
-        quote_vault = pool_keys.quote_vault
-        base_decimal = pool_keys.base_decimals
-        quote_decimal = pool_keys.quote_decimals
-        base_mint = pool_keys.base_mint
-        quote_mint = pool_keys.quote_mint
-        
-        balances_response = client.get_multiple_accounts_json_parsed(
-            [base_vault, quote_vault], 
-            Processed
-        )
-        balances = balances_response.value
+        reserves = None
+        if reserve_stream is None:
+            reserve_stream = get_shared_pool_table()
+        if reserve_stream is not None:
+            reserves = reserve_stream.get(str(pool_keys.amm_id), RESERVE_STREAM_MAX_AGE)
+        if reserves is None:
+            reserves = fetch_reserves(current_engine().client, [pool_keys]).get(str(pool_keys.amm_id))
+        return reserves
 
-        token_account = balances[0]
-        sol_account = balances[1]
-        
-        token_account_balance = token_account.data.parsed['info']['tokenAmount']['uiAmount']
-        sol_account_balance = sol_account.data.parsed['info']['tokenAmount']['uiAmount']
+    except Exception as e:
+        logger.warning("Error occurred: %s", e)
+        return None
 
-        if token_account_balance is None or sol_account_balance is None:
-            return None, None
-        
-        # Determine the assignment of base and quote reserves based on the base mint
-        if base_mint == WSOL:
-            base_reserve = sol_account_balance  # SOL is the base
-            quote_reserve = token_account_balance  # Tokens are the quote
-            token_decimal = quote_decimal
-        else:
-            base_reserve = token_account_balance  # Tokens are the base
-            quote_reserve = sol_account_balance  # SOL is the quote
-            token_decimal = base_decimal
-
-        print(f"Base Mint: {base_mint} | Quote Mint: {quote_mint}")
-        print(f"Base Reserve: {base_reserve} | Quote Reserve: {quote_reserve} | Token Decimal: {token_decimal}")
-        return base_reserve, quote_reserve, token_decimal
+def get_token_reserves(pool_keys: PoolKeys, reserve_stream=None) -> tuple:
+    return parse_token_reserves(pool_keys, get_reserves(pool_keys, reserve_stream))
 
+def get_token_reserves_bulk(pools: list) -> dict:
+    try:
+        return fetch_reserves(current_engine().client, pools)
     except Exception as e:
-        print(f"Error occurred: {e}")
+        logger.warning("Error fetching reserves: %s", e)
+        return {}
+
+def parse_token_reserves(pool_keys: PoolKeys, reserves: Optional[Reserves]) -> tuple:
+    if reserves is None:
         return None, None, None
 
+    base_decimal = pool_keys.base_decimals
+    quote_decimal = pool_keys.quote_decimals
+    base_mint = pool_keys.base_mint
+    quote_mint = pool_keys.quote_mint
+    
+    token_account_balance = reserves.base / 10**base_decimal
+    sol_account_balance = reserves.quote / 10**quote_decimal
+    
+    # Determine the assignment of base and quote reserves based on the base mint
+    if base_mint == WSOL:
+        base_reserve = sol_account_balance  # SOL is the base
+        quote_reserve = token_account_balance  # Tokens are the quote
+        token_decimal = quote_decimal
+    else:
+        base_reserve = token_account_balance  # Tokens are the base
+        quote_reserve = sol_account_balance  # SOL is the quote
+        token_decimal = base_decimal
+
+    logger.debug("Base Mint: %s | Quote Mint: %s", base_mint, quote_mint)
+    logger.debug("Base Reserve: %s | Quote Reserve: %s | Token Decimal: %s", base_reserve, quote_reserve, token_decimal)
+    return base_reserve, quote_reserve, token_decimal
+
 def sol_for_tokens(spend_sol_amount, base_vault_balance, quote_vault_balance, swap_fee=0.25):
     effective_sol_used = spend_sol_amount - (spend_sol_amount * (swap_fee / 100))
     constant_product = base_vault_balance * quote_vault_balance
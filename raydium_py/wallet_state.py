@@ -0,0 +1,119 @@
+import threading
+from dataclasses import dataclass
+from typing import Optional
+from solana.rpc.commitment import Processed
+from solana.rpc.types import TokenAccountOpts
+from solders.pubkey import Pubkey  # type: ignore
+from spl.token.instructions import get_associated_token_address
+from constants import TOKEN_PROGRAM_ID
+from fast_layouts import TOKEN_ACCOUNT_AMOUNT
+
+# The payer's SPL token accounts, indexed by mint with raw integer balances. Everything is
+# loaded with one getTokenAccountsByOwner (program filter) call and then kept current from
+# our own swaps, so buy/sell know whether an account exists and how much to sell without
+# asking the RPC. A confirmed buy only guarantees its minimum output, so the balance is
+# marked inexact until it is re-read (one getAccountInfo, and only if a sell needs it).
+# So is the balance after a sell that failed or may not have landed.
+# update_account() takes raw account data from any other source, e.g. accountSubscribe.
+
+@dataclass
+class TokenAccountState:
+    address: Pubkey
+    amount: int
+    exact: bool = True
+
+class WalletState:
+    def __init__(self, owner: Pubkey):
+        self.owner = owner
+        self.loaded = False
+        self.loads = 0
+        self.refreshes = 0
+        self._accounts = {}  # str(mint) -> TokenAccountState
+        self._lock = threading.Lock()
+
+    def load(self, client) -> None:
+        response = client.get_token_accounts_by_owner(
+            self.owner, TokenAccountOpts(program_id=TOKEN_PROGRAM_ID), Processed
+        )
+        self._apply_snapshot(response.value)
+
+    async def async_load(self, async_client) -> None:
+        response = await async_client.get_token_accounts_by_owner(
+            self.owner, TokenAccountOpts(program_id=TOKEN_PROGRAM_ID), Processed
+        )
+        self._apply_snapshot(response.value)
+
+    def token_account(self, client, mint: Pubkey, exact: bool = False) -> Optional[TokenAccountState]:
+        if not self.loaded:
+            self.load(client)
+        state = self._accounts.get(str(mint))
+        if state is not None and exact and not state.exact:
+            self.refreshes += 1
+            account = client.get_account_info(state.address, commitment=Processed).value
+            state = self.update_account(mint, state.address, account.data if account else None)
+        return state
+
+    async def async_token_account(self, async_client, mint: Pubkey, exact: bool = False) -> Optional[TokenAccountState]:
+        if not self.loaded:
+            await self.async_load(async_client)
+        state = self._accounts.get(str(mint))
+        if state is not None and exact and not state.exact:
+            self.refreshes += 1
+            account = (await async_client.get_account_info(state.address, commitment=Processed)).value
+            state = self.update_account(mint, state.address, account.data if account else None)
+        return state
+
+    def update_account(self, mint: Pubkey, address: Pubkey, data: Optional[bytes]) -> Optional[TokenAccountState]:
+        with self._lock:
+            if data is None:
+                self._accounts.pop(str(mint), None)
+                return None
+            state = TokenAccountState(address, TOKEN_ACCOUNT_AMOUNT.unpack(data)[2])
+            self._accounts[str(mint)] = state
+            return state
+
+    def settle_buy(self, mint: Pubkey, address: Pubkey, minimum_amount_out: int, confirmed: Optional[bool]) -> None:
+        with self._lock:
+            state = self._accounts.get(str(mint))
+            if confirmed:
+                if state is None:
+                    state = self._accounts[str(mint)] = TokenAccountState(address, 0)
+                state.amount += minimum_amount_out
+                state.exact = False
+            elif confirmed is None and state is not None:
+                state.exact = False
+            elif state is None:
+                # The account may or may not have been created, or the create failed because
+                # it already existed; rescan before the next use.
+                self.loaded = False
+
+    def settle_sell(self, mint: Pubkey, amount_in: int, closed: bool, confirmed: Optional[bool]) -> None:
+        with self._lock:
+            state = self._accounts.get(str(mint))
+            if state is None:
+                return
+            if confirmed and closed:
+                del self._accounts[str(mint)]
+            elif confirmed:
+                state.amount -= amount_in
+            else:
+                # A failed sell may have failed on a balance we had wrong; re-read it.
+                state.exact = False
+                if confirmed is None and closed:
+                    self.loaded = False
+
+    def _apply_snapshot(self, accounts: list) -> None:
+        with self._lock:
+            self.loads += 1
+            self._accounts = {}
+            for keyed_account in accounts:
+                mint_bytes, _, amount = TOKEN_ACCOUNT_AMOUNT.unpack(keyed_account.account.data)
+                mint = Pubkey.from_bytes(mint_bytes)
+                current = self._accounts.get(str(mint))
+                # Several accounts can hold the same mint; prefer the ATA, then the largest.
+                if current is not None:
+                    ata = get_associated_token_address(self.owner, mint)
+                    if current.address == ata or (keyed_account.pubkey != ata and current.amount >= amount):
+                        continue
+                self._accounts[str(mint)] = TokenAccountState(keyed_account.pubkey, amount)
+            self.loaded = True
@@ -0,0 +1,128 @@
+import threading
+from typing import Optional
+from solana.rpc.commitment import Processed
+from solders.pubkey import Pubkey  # type: ignore
+from solders.system_program import TransferParams, transfer
+from spl.token.constants import ASSOCIATED_TOKEN_PROGRAM_ID
+from spl.token.instructions import (
+    CloseAccountParams,
+    SyncNativeParams,
+    close_account,
+    create_idempotent_associated_token_account,
+    get_associated_token_address,
+    sync_native,
+)
+from constants import TOKEN_PROGRAM_ID, WSOL
+from fast_layouts import ACCOUNT
+
+# Long-lived wrapped-SOL account (the wallet's WSOL ATA) for PERSISTENT_WSOL mode. Swaps
+# pay from and into it directly instead of creating, initializing and closing a seeded
+# account each time; it is only topped up (transfer + sync_native) when a buy needs more
+# than it holds, and SOL is unwrapped in one go with unwrap_wsol().
+#
+# The tracked balance is a lower bound: buys reserve their amount when their instructions
+# are built and sells add their minimum output once confirmed. The chain is only read when
+# the bound is unknown or too small for the next buy.
+#
+# The account is assumed to exist once a transaction creating it has been built. If that
+# transaction does not land, the create is rolled back with it: settle it with
+# created=True (see creates()) and the state goes back to unknown, so the next trade
+# creates the account again instead of swapping into one that is not there.
+
+class WsolAccount:
+    def __init__(self, owner: Pubkey, top_up_buffer: int = 0):
+        self.owner = owner
+        self.address = get_associated_token_address(owner, WSOL)
+        self.top_up_buffer = top_up_buffer
+        self.top_ups = 0
+        self.refreshes = 0
+        self._exists: Optional[bool] = None  # None = unknown
+        self._balance: Optional[int] = None  # lower bound on the unreserved amount, None = unknown
+        self._pending = 0  # amount_in of buys built but not yet settled
+        self._lock = threading.Lock()
+
+    @property
+    def balance(self) -> Optional[int]:
+        return self._balance
+
+    def needs_refresh(self, amount_in: int = 0) -> bool:
+        return self._exists is None or self._balance is None or self._balance < amount_in
+
+    def refresh(self, client) -> None:
+        self._apply_account(client.get_account_info(self.address, commitment=Processed).value)
+
+    async def async_refresh(self, async_client) -> None:
+        self._apply_account((await async_client.get_account_info(self.address, commitment=Processed)).value)
+
+    def prepare_buy(self, amount_in: int) -> tuple:
+        # (instructions, top_up) that leave at least amount_in lamports wrapped in the account.
+        with self._lock:
+            instructions = []
+            if not self._exists:
+                instructions.append(create_idempotent_associated_token_account(self.owner, self.owner, WSOL))
+
+            available = self._balance or 0
+            top_up = 0
+            if available < amount_in:
+                top_up = amount_in - available + self.top_up_buffer
+                self.top_ups += 1
+                instructions.append(transfer(TransferParams(from_pubkey=self.owner, to_pubkey=self.address, lamports=top_up)))
+                instructions.append(sync_native(SyncNativeParams(TOKEN_PROGRAM_ID, self.address)))
+
+            self._exists = True
+            self._balance = available + top_up - amount_in
+            self._pending += amount_in
+            return instructions, top_up
+
+    @staticmethod
+    def creates(instructions) -> bool:
+        # Whether setup instructions from prepare_buy/prepare_sell create the account.
+        return any(instruction.program_id == ASSOCIATED_TOKEN_PROGRAM_ID for instruction in instructions)
+
+    def prepare_sell(self) -> list:
+        with self._lock:
+            if self._exists:
+                return []
+            self._exists = True
+            return [create_idempotent_associated_token_account(self.owner, self.owner, WSOL)]
+
+    def settle_buy(self, amount_in: int, top_up: int, confirmed: Optional[bool], created: bool = False) -> None:
+        with self._lock:
+            self._pending -= amount_in
+            if confirmed is None or (created and not confirmed):
+                self._invalidate()
+            elif confirmed is False and self._balance is not None:
+                self._balance += amount_in - top_up
+
+    def settle_sell(self, amount_out: int, confirmed: Optional[bool], created: bool = False) -> None:
+        with self._lock:
+            if confirmed is None or (created and not confirmed):
+                self._invalidate()
+            elif confirmed and self._balance is not None:
+                self._balance += amount_out
+
+    def unwrap_instructions(self) -> list:
+        return [close_account(CloseAccountParams(TOKEN_PROGRAM_ID, self.address, self.owner, self.owner))]
+
+    def settle_unwrap(self, confirmed: Optional[bool]) -> None:
+        with self._lock:
+            if confirmed:
+                self._exists = False
+                self._balance = 0
+            elif confirmed is None:
+                self._invalidate()
+
+    def _apply_account(self, account) -> None:
+        with self._lock:
+            self.refreshes += 1
+            if account is None:
+                self._exists = False
+                self._balance = 0
+            else:
+                # Buys still in flight may not have landed yet; assume they have.
+                self._exists = True
+                self._balance = max(0, ACCOUNT.read(account.data, "amount") - self._pending)
+
+    def _invalidate(self) -> None:
+        self._exists = None
+        self._balance = None